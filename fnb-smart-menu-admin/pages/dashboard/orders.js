@@ -151,7 +151,7 @@ export default function OrdersPage() {
         const skip = (pageNum - 1) * limit;
         
         try {
-            const response = await fetch(`${apiUrl}/admin/orders/?skip=${skip}&limit=${limit}`, { 
+            const response = await fetch(`${apiUrl}/admin/orders/summary?skip=${skip}&limit=${limit}`, { 
                 headers: { 'Authorization': `Bearer ${token}` } 
             });
             if (response.status === 401) throw new Error('Token hết hạn.');
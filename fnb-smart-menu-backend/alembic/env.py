@@ -17,7 +17,8 @@ from app.models.models import Base, DATABASE_URL
 
 config = context.config
 
-if config.config_file_name is not None:
+# Chạy từ app/scripts/bootstrap.py: giữ nguyên cấu hình log của process đang chạy
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
@@ -62,7 +63,12 @@ async def run_async_migrations() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
-    asyncio.run(run_async_migrations())
+    # bootstrap.py truyền sẵn kết nối (đang chạy trong event loop) => dùng luôn, không tạo engine mới
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+    else:
+        asyncio.run(run_async_migrations())
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,47 @@
+"""consolidate order indexes
+
+Revision ID: c41d7e9a2b80
+Revises: 2ac567d4964e
+Create Date: 2026-10-18 10:05:42.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e9a2b80'
+down_revision: Union[str, Sequence[str], None] = '2ac567d4964e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mỗi lần đổi trạng thái đơn đổi cả status lẫn updated_at => không có HOT update,
+# mọi index của orders đều bị ghi lại. Sau bản này orders còn 5 index phụ, mỗi cái có 1 việc riêng:
+#   ix_orders_status_created_at  lọc theo trạng thái (bảng đơn, "đơn MOI hôm nay"). Đơn đang mở ít
+#                                => quét hết đơn của trạng thái đó rồi sắp theo id; trạng thái nhiều đơn
+#                                (HOAN_TAT) thì planner đi lùi trên khóa chính, gặp đủ trang là dừng
+#   ix_orders_table_id_id        đơn của 1 bàn (ORDER BY id DESC) + khóa ngoại tables.id
+#   ix_orders_created_at_id      lọc theo khoảng ngày không kèm trạng thái (báo cáo, tra cứu)
+#   ix_orders_updated_at_id      change feed của màn hình Bếp / Thu ngân: (updated_at, id) > cursor
+#   ix_orders_user_id            lịch sử đơn của khách + khóa ngoại users.id (ON DELETE SET NULL)
+# Bỏ:
+#   ix_orders_id                 trùng hoàn toàn với khóa chính orders_pkey
+#   ix_orders_status_id          EXPLAIN: ix_orders_status_created_at phục vụ cùng truy vấn (kể cả keyset id <)
+#   ix_orders_delivery_method_id chỉ 3 giá trị; lọc theo hình thức giao hàng hiếm khi dùng,
+#                                giá trị phổ biến thì đi lùi trên khóa chính là đủ
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_orders_id', table_name='orders')
+    op.drop_index('ix_orders_status_id', table_name='orders')
+    op.drop_index('ix_orders_delivery_method_id', table_name='orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_orders_delivery_method_id', 'orders', ['delivery_method_selected', 'id'], unique=False)
+    op.create_index('ix_orders_status_id', 'orders', ['status', 'id'], unique=False)
+    op.create_index('ix_orders_id', 'orders', ['id'], unique=False)
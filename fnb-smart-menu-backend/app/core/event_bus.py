@@ -0,0 +1,202 @@
+# Tệp: app/core/event_bus.py
+# Mục đích: Lớp pub/sub nằm dưới ConnectionManager & các cache trong bộ nhớ,
+# để chạy nhiều worker uvicorn / nhiều container backend mà không mất sự kiện.
+# - "memory"  : 1 process duy nhất (mặc định) - không gửi đi đâu cả
+# - "postgres": LISTEN/NOTIFY qua chính Postgres của app (không cần thêm Redis)
+# Chọn bằng biến môi trường EVENT_BUS=memory|postgres
+
+import asyncio
+import inspect
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+import asyncpg
+
+Handler = Callable[[dict], Union[None, Awaitable[None]]]
+
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS", "memory")
+EVENT_BUS_PG_CHANNEL = os.getenv("EVENT_BUS_PG_CHANNEL", "fnb_events")
+EVENT_BUS_KEEPALIVE = 15           # giây: kiểm tra kết nối LISTEN còn sống
+EVENT_BUS_MAX_BACKOFF = 30         # giây: chờ tối đa giữa 2 lần kết nối lại
+PG_NOTIFY_MAX_BYTES = 7900         # Postgres giới hạn payload NOTIFY < 8000 bytes
+
+# Kênh báo cache trong bộ nhớ của các worker khác phải xóa
+CATALOG_CHANGED = "catalog.changed"
+VOUCHERS_CHANGED = "vouchers.changed"
+ADMIN_EVICTED = "admin.evicted"
+# Đơn vừa được tạo/sửa => đánh thức các luồng SSE change feed
+ORDERS_CHANGED = "orders.changed"
+# Sau khi (kết nối lại) LISTEN: có thể đã lỡ NOTIFY của worker khác lúc mất kết nối
+# => tự phát các kênh này trong worker (payload rỗng = xóa toàn bộ cache tương ứng)
+RESYNC_CHANNELS = (CATALOG_CHANGED, VOUCHERS_CHANGED, ADMIN_EVICTED, ORDERS_CHANGED)
+
+
+class EventBus:
+    """Bus trong 1 process: publish chỉ gọi các handler local"""
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def _dispatch(self, channel: str, payload: dict):
+        for handler in self._handlers.get(channel, []):
+            try:
+                result = handler(payload)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ Lỗi xử lý sự kiện '{channel}': {e}")
+
+    async def publish(self, channel: str, payload: dict, local: bool = True):
+        """
+        local=True : gọi cả handler trong process này
+        local=False: người gọi đã tự xử lý local, chỉ cần báo cho các worker khác
+        """
+        self.published += 1
+        if local:
+            await self._dispatch(channel, payload)
+        self._send_remote(channel, payload)
+
+    def publish_nowait(self, channel: str, payload: dict):
+        """Dùng ở code đồng bộ: chỉ báo cho worker khác (phần local người gọi tự làm)"""
+        self.published += 1
+        self._send_remote(channel, payload)
+
+    def _send_remote(self, channel: str, payload: dict):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "node_id": self.node_id, "published": self.published, "received": self.received}
+
+
+InMemoryEventBus = EventBus
+
+
+class PostgresEventBus(EventBus):
+    """Bus nhiều worker qua Postgres LISTEN/NOTIFY (1 kết nối riêng cho mỗi worker)"""
+
+    def __init__(self, dsn: str, channel: str = EVENT_BUS_PG_CHANNEL, max_pending: int = 1000):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        # Gửi qua hàng đợi + 1 task => publish không bao giờ chặn request, giữ đúng thứ tự tin
+        self._outgoing: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.connected = False
+        self.dropped = 0
+        self.reconnects = 0
+        self.resyncs = 0
+        self.application_name = f"fnb-event-bus-{self.node_id[:8]}"
+
+    def _send_remote(self, channel: str, payload: dict):
+        envelope = json.dumps({"o": self.node_id, "c": channel, "p": payload}, default=str)
+        if len(envelope.encode()) > PG_NOTIFY_MAX_BYTES:
+            print(f"⚠️ Sự kiện '{channel}' quá lớn cho NOTIFY, chỉ xử lý trong worker này")
+            self.dropped += 1
+            return
+        try:
+            self._outgoing.put_nowait(envelope)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _on_notify(self, connection, pid, channel, data):
+        self._incoming.put_nowait(data)
+
+    async def _consume(self):
+        while True:
+            data = await self._incoming.get()
+            try:
+                envelope = json.loads(data)
+            except ValueError:
+                continue
+            if envelope.get("o") == self.node_id:
+                continue  # Tin của chính mình (Postgres gửi lại cho cả người NOTIFY)
+            self.received += 1
+            await self._dispatch(envelope.get("c"), envelope.get("p") or {})
+
+    async def _resync(self):
+        self.resyncs += 1
+        for channel in RESYNC_CHANNELS:
+            await self._dispatch(channel, {})
+
+    async def _run(self):
+        backoff = 0.5
+        # Tin đã lấy khỏi hàng đợi nhưng NOTIFY lỗi => giữ lại, gửi trước tiên khi kết nối lại
+        envelope: Optional[str] = None
+        while True:
+            conn: Optional[asyncpg.Connection] = None
+            try:
+                # application_name => biết kết nối LISTEN nào của worker nào trong pg_stat_activity
+                conn = await asyncpg.connect(self.dsn, server_settings={"application_name": self.application_name})
+                await conn.add_listener(self.channel, self._on_notify)
+                self.connected = True
+                backoff = 0.5
+                print(f"📡 Event bus đã LISTEN kênh '{self.channel}' (node {self.node_id[:8]})")
+                await self._resync()
+                while True:
+                    if envelope is None:
+                        try:
+                            envelope = await asyncio.wait_for(self._outgoing.get(), EVENT_BUS_KEEPALIVE)
+                        except asyncio.TimeoutError:
+                            await conn.execute("SELECT 1")  # Phát hiện kết nối LISTEN đã chết
+                            continue
+                    await conn.execute("SELECT pg_notify($1, $2)", self.channel, envelope)
+                    envelope = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                self.reconnects += 1
+                print(f"⚠️ Event bus mất kết nối Postgres: {e}. Thử lại sau {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, EVENT_BUS_MAX_BACKOFF)
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._consume())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "backend": "postgres",
+            "connected": self.connected,
+            "pending": self._outgoing.qsize(),
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "resyncs": self.resyncs,
+        }
+
+
+def create_event_bus(backend: str = EVENT_BUS_BACKEND) -> EventBus:
+    if backend == "postgres":
+        from app.models.models import SYNC_DATABASE_URL
+        return PostgresEventBus(SYNC_DATABASE_URL)
+    return InMemoryEventBus()
+
+
+# Tạo instance dùng chung
+event_bus = create_event_bus()
@@ -0,0 +1,275 @@
+# Tệp: app/core/metrics.py
+# Mục đích: Số liệu vận hành dạng Prometheus (endpoint /metrics), đủ nhẹ để bật thường trực.
+# - Counter / Gauge / Histogram tự viết (không cần thư viện ngoài): ghi 1 mẫu = vài phép cộng trong dict
+# - MetricsMiddleware: độ trễ theo route, số request đang xử lý, số request theo status code
+# - TimedQueuePool: đo thời gian chờ lấy kết nối từ pool DB
+# Lưu ý: số liệu nằm trong bộ nhớ của TỪNG worker => khi chạy nhiều worker, mỗi worker được scrape riêng
+# (Prometheus cộng lại theo nhãn instance), hoặc chạy 1 worker / container.
+
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.startup import startup_timer
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Đơn vị giây, đủ chi tiết quanh vùng p95 mong muốn của API (vài chục ms)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, object] = {}
+        # function: đọc giá trị lúc scrape từ số liệu sẵn có (vd. số websocket đang mở)
+        # => không tốn gì giữa 2 lần scrape. Trả về 1 số (không nhãn) hoặc dict {nhãn: giá trị}
+        self.function = function
+
+    def clear(self):
+        self._values.clear()
+
+    def samples(self) -> Iterable[Tuple[str, Labels, Sequence[str], float]]:
+        """=> (tên mẫu, giá trị nhãn, tên nhãn, giá trị)"""
+        if self.function is not None:
+            value = self.function()
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            values = self._values
+        for labels, value in values.items():
+            yield self.name, labels, self.labelnames, value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        for name, labels, labelnames, value in self.samples():
+            yield f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, labels: Labels = ()):
+        self._values[labels] = value
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def get(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()):
+        state = self._values.get(labels)
+        if state is None:
+            # [số mẫu rơi vào từng bucket (chưa cộng dồn) + bucket +Inf, tổng]
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    def samples(self):
+        labelnames = self.labelnames + ("le",)
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (_format_value(bound),), labelnames, cumulative
+            yield f"{self.name}_sum", labels, self.labelnames, total
+            yield f"{self.name}_count", labels, self.labelnames, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric đã tồn tại: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                function: Optional[Callable[[], object]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], object]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(list(metric.render()))
+            except Exception as e:
+                # 1 gauge lỗi không được làm hỏng cả lần scrape
+                print(f"⚠️ Lỗi đọc metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Tạo instance dùng chung
+metrics = MetricsRegistry()
+
+# --- HTTP ---
+http_requests_total = metrics.counter(
+    "fnb_http_requests_total", "Số request HTTP theo method, route và status code", ("method", "route", "status"))
+http_request_duration = metrics.histogram(
+    "fnb_http_request_duration_seconds", "Thời gian xử lý request HTTP theo route", ("method", "route"))
+http_requests_in_progress = metrics.gauge(
+    "fnb_http_requests_in_progress", "Số request HTTP đang xử lý")
+
+# --- KHỞI ĐỘNG ---
+metrics.gauge(
+    "fnb_startup_seconds", "Thời gian từng giai đoạn khởi động worker (first_request = cold start)", ("phase",),
+    function=lambda: {(phase,): seconds for phase, seconds in startup_timer.stats().items()},
+)
+
+# --- POOL KẾT NỐI DB ---
+db_pool_checkout_seconds = metrics.histogram(
+    "fnb_db_pool_checkout_seconds", "Thời gian chờ lấy 1 kết nối từ pool DB", buckets=POOL_WAIT_BUCKETS)
+db_pool_checkout_timeouts = metrics.counter(
+    "fnb_db_pool_checkout_timeouts_total", "Số lần chờ kết nối DB quá pool_timeout")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Pool mặc định của engine async + đo thời gian chờ (gồm cả lúc phải mở kết nối mới)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0          # số request đang đứng chờ kết nối
+        self.checkouts = 0
+        self.wait_total = 0.0     # giây
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.waiting -= 1
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            db_pool_checkout_seconds.observe(waited)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),  # âm = số kết nối còn có thể mở thêm trong pool_size
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+def register_pool_metrics(get_pool: Callable[[], TimedQueuePool]):
+    """Gauge đọc trạng thái pool lúc scrape (get_pool vì engine.dispose() sẽ thay pool mới)"""
+    metrics.gauge(
+        "fnb_db_pool_connections", "Số kết nối DB theo trạng thái", ("state",),
+        function=lambda: {
+            (state,): get_pool().stats()[state] for state in ("checked_out", "checked_in", "overflow")
+        },
+    )
+    metrics.gauge("fnb_db_pool_size", "pool_size đã cấu hình", function=lambda: get_pool().size())
+    metrics.gauge("fnb_db_pool_waiting", "Số request đang chờ lấy kết nối DB", function=lambda: get_pool().waiting)
+
+
+class MetricsMiddleware:
+    """ASGI middleware thuần: chỉ đọc status code, không bọc body => chi phí vài micro giây / request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Lỗi chưa kịp trả response => tính là 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_progress.dec()
+            # Dùng mẫu route (/admin/orders/{order_id}) thay vì path thật => số nhãn không tăng vô hạn
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(duration, (method, route))
+            http_requests_total.inc((method, route, str(status)))
+            if startup_timer.first_request is None:
+                startup_timer.request_served()
@@ -0,0 +1,27 @@
+# Tệp: app/core/pagination.py
+# Mục đích: Con trỏ phân trang "mờ" (opaque cursor) cho các danh sách lớn.
+# Client chỉ việc gửi lại nguyên chuỗi nhận được ở header X-Next-Cursor,
+# không cần biết bên trong là id hay thời gian => server đổi cách sắp xếp cũng không vỡ client.
+
+import base64
+import json
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(position: dict) -> str:
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    return position
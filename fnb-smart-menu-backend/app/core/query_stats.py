@@ -0,0 +1,108 @@
+# Tệp: app/core/query_stats.py
+# Mục đích: Đếm số câu SQL + thời gian DB của TỪNG request (phát hiện N+1, "commit rồi load lại"...).
+# - Hook sự kiện của SQLAlchemy Engine cộng dồn vào QueryStats của request hiện tại (ContextVar)
+# - Middleware gắn kết quả vào header Server-Timing / X-DB-Queries và in log khi request quá nặng
+# - track_queries(): đo 1 đoạn code bất kỳ (test, script, benchmark)
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "1") == "1"
+QUERY_COUNT_WARN = int(os.getenv("QUERY_COUNT_WARN", "25"))       # số câu SQL / request
+QUERY_TIME_WARN_MS = float(os.getenv("QUERY_TIME_WARN_MS", "500"))  # ms DB / request
+QUERY_STATS_MAX_STATEMENTS = int(os.getenv("QUERY_STATS_MAX_STATEMENTS", "200"))  # số câu SQL giữ lại để in
+
+
+class QueryStats:
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        # parent: đoạn đo lồng nhau (vd. test bao quanh 1 request) cũng được cộng dồn
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0  # giây
+        # Chỉ giữ vài trăm câu đầu (đủ để tìm N+1), count / duration vẫn đếm đủ
+        self.statements = []
+        self.max_statements = QUERY_STATS_MAX_STATEMENTS
+        self.closed = False
+
+    def record(self, statement: str, duration: float):
+        stats = self
+        while stats is not None:
+            if not stats.closed:
+                stats.count += 1
+                stats.duration += duration
+                if len(stats.statements) < stats.max_statements:
+                    stats.statements.append(statement)
+            stats = stats.parent
+
+    def close(self):
+        """Ngừng cộng dồn (các scope cha vẫn đếm tiếp)"""
+        self.closed = True
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 2)
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+# --- HOOK CHO MỌI ENGINE (app + test + script) ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and conn.info.get("query_start"):
+        stats.record(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+
+@contextmanager
+def track_queries():
+    """with track_queries() as stats: ... => stats.count, stats.duration_ms, stats.statements"""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware thuần (không bọc response) => chi phí gần như bằng 0"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    if QUERY_STATS_HEADERS:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"x-db-queries", str(stats.count).encode()))
+                        headers.append((b"server-timing", f'db;dur={stats.duration_ms};desc="{stats.count} queries"'.encode()))
+                        message["headers"] = headers
+                    # Header đã gửi => thôi đếm. Response dạng stream (SSE change feed) có thể mở cả ngày
+                    # và poll DB liên tục: không tích lũy câu SQL, không in cảnh báo 🐢 giả khi đóng
+                    stats.close()
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                if stats.count >= QUERY_COUNT_WARN or stats.duration_ms >= QUERY_TIME_WARN_MS:
+                    print(f"🐢 {scope['method']} {scope['path']}: {stats.count} câu SQL, {stats.duration_ms} ms DB")
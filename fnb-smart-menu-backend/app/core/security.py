@@ -2,15 +2,19 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from app.models import models
 from app.schemas import schemas
 from app.dependencies import get_db # <--- Dùng chung
+from app.core.event_bus import event_bus, ADMIN_EVICTED
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -27,6 +31,35 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# === BCRYPT CHẠY NGOÀI EVENT LOOP ===
+# bcrypt tốn ~100-300ms CPU mỗi lần => chạy trong thread pool riêng (bcrypt nhả GIL khi băm),
+# tránh làm đứng websocket & /menu. Số thread giới hạn CPU dùng cho bcrypt; PASSWORD_HASH_MAX_PENDING
+# giới hạn tổng số lần băm đang chạy + đang xếp hàng: hết chỗ => trả 503 ngay thay vì để login
+# dồn dập xếp hàng vô hạn (mỗi request chờ vẫn giữ 1 kết nối DB).
+# Mặc định chừa lại ít nhất 1 core cho event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, min(2, (os.cpu_count() or 1) - 1)))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+async def _run_password_task(func, *args):
+    if _password_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hệ thống đang bận, vui lòng thử lại sau",
+            headers={"Retry-After": "1"},
+        )
+    async with _password_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_task(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,7 +72,89 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/admin/token")
 
+# === CACHE ADMIN ĐÃ XÁC THỰC ===
+# Mỗi request Admin (poll đơn, sửa menu...) trước đây đều query bảng admins chỉ để xác nhận admin còn tồn tại.
+# Cache theo token trong thời gian ngắn; xóa ngay khi admin bị xóa hoặc đổi mật khẩu.
+ADMIN_PRINCIPAL_CACHE_TTL = float(os.getenv("ADMIN_PRINCIPAL_CACHE_TTL", "60"))  # giây
+ADMIN_PRINCIPAL_CACHE_MAX_SIZE = 1000
+
+class PrincipalCache:
+    def __init__(self, ttl: float = ADMIN_PRINCIPAL_CACHE_TTL, max_size: int = ADMIN_PRINCIPAL_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # Key: token, Value: (hạn dùng, schemas.Admin)
+        self._entries: Dict[str, Tuple[float, schemas.Admin]] = {}
+        # Tăng mỗi lần xóa cache => bản đọc từ DB trước lúc xóa không được ghi lại vào cache
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[schemas.Admin]:
+        entry = self._entries.get(token)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, principal: schemas.Admin, version: int):
+        """version: giá trị self.version đọc TRƯỚC khi query DB"""
+        if version != self.version:
+            return
+        self._entries.pop(token, None)
+        if len(self._entries) >= self.max_size:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[token] = (time.monotonic() + self.ttl, principal)
+
+    def evict_username(self, username: Optional[str]):
+        """Gọi khi admin bị xóa hoặc đổi mật khẩu. username=None (event bus vừa kết nối lại) => xóa hết"""
+        if username is None:
+            self.clear()
+            return
+        self.version += 1
+        for token in [t for t, (_, p) in self._entries.items() if p.username == username]:
+            del self._entries[token]
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+admin_principal_cache = PrincipalCache()
+event_bus.subscribe(ADMIN_EVICTED, lambda payload: admin_principal_cache.evict_username(payload.get("username")))
+
+# === TOKEN CHO SSE (EventSource) ===
+# EventSource của trình duyệt không gửi được header Authorization => màn hình Bếp/Thu ngân
+# xin 1 token ngắn hạn, chỉ dùng được cho luồng SSE, rồi mở
+#   new EventSource(`${apiUrl}/admin/orders/changes/stream?access_token=${token}`)
+# Token hết hạn chỉ chặn lần kết nối MỚI (luồng đang mở không bị cắt); khi EventSource báo lỗi
+# và dừng (401), client xin token mới rồi mở lại kèm ?cursor=<id sự kiện cuối> để không mất đơn.
+ORDER_STREAM_SCOPE = "orders:stream"
+ORDER_STREAM_TOKEN_TTL = int(os.getenv("ORDER_STREAM_TOKEN_TTL", "300"))  # giây
+
+def create_stream_token(username: str) -> str:
+    return create_access_token(
+        {"sub": username, "scope": ORDER_STREAM_SCOPE}, expires_delta=timedelta(seconds=ORDER_STREAM_TOKEN_TTL)
+    )
+
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/admin/token", auto_error=False)
+
 async def get_current_admin(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await _admin_from_token(token, db)
+
+async def get_stream_admin(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None, description="Token từ POST /admin/orders/changes/stream-token (cho EventSource)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Header Bearer như mọi API Admin, hoặc ?access_token= (chỉ nhận token có scope SSE)"""
+    if token:
+        return await _admin_from_token(token, db)
+    return await _admin_from_token(access_token or "", db, scope=ORDER_STREAM_SCOPE)
+
+async def _admin_from_token(token: str, db: AsyncSession, scope: Optional[str] = None):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Không thể xác thực, vui lòng đăng nhập lại",
@@ -48,16 +163,28 @@ async def get_current_admin(token: str = Depends(oauth2_scheme), db: AsyncSessio
     
     from app.crud import crud 
 
+    # Luôn giải mã JWT (rẻ, không cần DB) để kiểm tra chữ ký & hạn token
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        # Token đăng nhập không có scope; token SSE (lộ trong URL/log) không dùng được cho API khác
+        if payload.get("scope") != scope:
+            raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    
+
+    principal = admin_principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    # Admin bị xóa/đổi mật khẩu trong lúc đang query => không cache bản vừa đọc
+    version = admin_principal_cache.version
     admin = await crud.get_admin_by_username(db, username=token_data.username)
     if admin is None:
         raise credentials_exception
-    return admin
\ No newline at end of file
+    principal = schemas.Admin.model_validate(admin)
+    admin_principal_cache.put(token, principal, version)
+    return principal
@@ -0,0 +1,68 @@
+# Tệp: app/core/startup.py
+# Mục đích: Đo thời gian khởi động theo từng giai đoạn (import, mở pool DB, event bus...)
+# và "cold start": từ lúc bắt đầu import app đến khi trả xong request đầu tiên.
+# Kết quả được in ra log và có trên /metrics (fnb_startup_seconds).
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Mục tiêu cold start (ms): vượt quá thì in cảnh báo
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "2000"))
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        # Tên giai đoạn -> số giây (giữ thứ tự chạy)
+        self.phases: Dict[str, float] = {}
+        # Số giây từ lúc bắt đầu đến khi trả xong request đầu tiên
+        self.first_request: Optional[float] = None
+
+    def restart(self):
+        """Đặt lại mốc bắt đầu (bootstrap: chuẩn bị CSDL xong mới bắt đầu tính cold start của API)"""
+        self.__init__()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def mark(self, name: str):
+        """Ghi giai đoạn kéo dài từ mốc trước đến bây giờ (vd. import các module)"""
+        now = time.perf_counter()
+        self.phases[name] = now - self._last_mark
+        self._last_mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last_mark = time.perf_counter()
+            self.phases[name] = self._last_mark - start
+
+    def report(self, title: str = "Khởi động"):
+        parts = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        print(f"⏱️ {title} xong sau {self.elapsed() * 1000:.0f} ms ({parts})")
+
+    def request_served(self):
+        if self.first_request is not None:
+            return
+        self.first_request = self.elapsed()
+        elapsed_ms = self.first_request * 1000
+        if elapsed_ms > STARTUP_TARGET_MS:
+            print(f"🐢 Cold start: request đầu tiên xong sau {elapsed_ms:.0f} ms (mục tiêu {STARTUP_TARGET_MS:.0f} ms)")
+        else:
+            print(f"🚀 Cold start: request đầu tiên xong sau {elapsed_ms:.0f} ms")
+
+    def stats(self) -> dict:
+        stats = dict(self.phases)
+        if self.first_request is not None:
+            stats["first_request"] = self.first_request
+        return stats
+
+
+# Tạo instance dùng chung (bắt đầu đo ngay khi app.main import module này)
+startup_timer = StartupTimer()
@@ -1,34 +1,167 @@
 # File: websocket_manager.py
 # Mục đích: Quản lý kết nối Real-time (Admin & Đơn nhóm)
+#
+# Mỗi kết nối có 1 hàng đợi gửi (giới hạn kích thước) + 1 task riêng rút hàng đợi:
+# - broadcast chỉ việc bỏ tin vào hàng đợi => 1 máy tính bảng Wi-Fi yếu không làm chậm người khác
+# - hàng đợi đầy (client không theo kịp) hoặc gửi lỗi/quá hạn => ngắt kết nối đó, không nuốt lỗi
+# Khi chạy nhiều worker, tin được phát thêm qua event bus để socket ở worker khác cũng nhận được.
+#
+# Gộp tin theo nhóm (tùy chọn): thay vì mỗi thay đổi giỏ = 1 frame tới từng thành viên,
+# tin chờ được gom lại và gửi thành 1 frame {"type": "batch", "messages": [...]} mỗi N ms.
 
+import asyncio
+import os
 from fastapi import WebSocket
-from typing import List, Dict
-import json
+from typing import List, Dict, Optional, Tuple
+
+from app.core.event_bus import EventBus, event_bus
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))     # số tin tối đa chờ gửi / kết nối
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))          # giây cho mỗi lần send
+WS_GROUP_BATCH_TICK_MS = float(os.getenv("WS_GROUP_BATCH_TICK_MS", "0"))  # 0 = tắt gộp tin nhóm
+WS_GROUP_BATCH_MAX = int(os.getenv("WS_GROUP_BATCH_MAX", "50"))           # đủ số tin này thì gửi ngay
+
+# Mã đóng kết nối khi client không theo kịp (1013 = Try Again Later)
+WS_CLOSE_TOO_SLOW = 1013
+
+# Kênh trên event bus
+ADMIN_CHANNEL = "ws.admin"
+GROUP_CHANNEL = "ws.group"
+
+
+class _Outbox:
+    """Hàng đợi gửi + task gửi của 1 kết nối"""
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager", maxsize: int):
+        self.websocket = websocket
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_json(message), WS_SEND_TIMEOUT)
+                self.manager.messages_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Gửi lỗi hoặc quá hạn => socket chết/quá chậm
+            await self.manager._drop(self.websocket)
+
+
+class _GroupBatch:
+    """Tin chờ gửi của 1 nhóm đang bật chế độ gộp"""
+
+    def __init__(self, tick: float, max_size: int):
+        self.tick = tick
+        self.max_size = max_size
+        # (tin nhắn, socket người gửi - để không gửi lại cho chính họ)
+        self.pending: List[Tuple[dict, Optional[WebSocket]]] = []
+        self.timer: Optional[asyncio.Task] = None
+
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        send_queue_size: int = WS_SEND_QUEUE_SIZE,
+        bus: Optional[EventBus] = None,
+        group_batch_tick_ms: float = WS_GROUP_BATCH_TICK_MS,
+        group_batch_max: int = WS_GROUP_BATCH_MAX,
+    ):
         # 1. Danh sách Admin (Nhận thông báo đơn mới)
         self.active_connections: List[WebSocket] = []
-        
+
         # 2. Danh sách Nhóm đặt đơn (Key: group_id, Value: List[WebSocket])
         self.group_connections: Dict[str, List[WebSocket]] = {}
 
+        # 3. Hàng đợi gửi của từng kết nối
+        self.send_queue_size = send_queue_size
+        self._outboxes: Dict[WebSocket, _Outbox] = {}
+
+        # Số liệu theo dõi
+        self.messages_sent = 0
+        self.dropped_connections = 0
+        self.batches_flushed = 0
+
+        # Cấu hình gộp tin: mặc định cho mọi nhóm + ghi đè riêng từng nhóm (tick_ms = 0 => tắt)
+        self.group_batch_tick_ms = group_batch_tick_ms
+        self.group_batch_max = group_batch_max
+        self._group_batch_config: Dict[str, Tuple[float, int]] = {}
+        self._group_batches: Dict[str, _GroupBatch] = {}
+
+        # 4. Event bus: nhận tin do worker khác phát (None = chỉ 1 process)
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(ADMIN_CHANNEL, self._on_remote_admin)
+            bus.subscribe(GROUP_CHANNEL, self._on_remote_group)
+
+    async def _on_remote_admin(self, message: dict):
+        await self._fan_out(self.active_connections, message)
+
+    async def _on_remote_group(self, payload: dict):
+        group_id = payload.get("group_id")
+        if group_id in self.group_connections:
+            await self._deliver_group(group_id, payload.get("message"))
+
+    def _register(self, websocket: WebSocket):
+        self._outboxes[websocket] = _Outbox(websocket, self, self.send_queue_size)
+
+    def _unregister(self, websocket: WebSocket):
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox and outbox.task is not asyncio.current_task():
+            outbox.task.cancel()
+
+    def _enqueue(self, websocket: WebSocket, message: dict) -> bool:
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return False
+        try:
+            outbox.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _drop(self, websocket: WebSocket):
+        """Loại 1 kết nối không theo kịp / đã chết khỏi mọi danh sách và đóng nó"""
+        if websocket not in self._outboxes:
+            return
+        self.dropped_connections += 1
+        self.disconnect(websocket)
+        for group_id in [g for g, members in self.group_connections.items() if websocket in members]:
+            self.disconnect_group(websocket, group_id)
+        try:
+            await websocket.close(code=WS_CLOSE_TOO_SLOW)
+        except Exception:
+            pass
+
+    async def _fan_out(self, connections: List[WebSocket], message: dict, sender_socket: WebSocket = None):
+        overflowed = []
+        for connection in list(connections):
+            if sender_socket and connection == sender_socket:
+                continue
+            if not self._enqueue(connection, message):
+                overflowed.append(connection)
+        for connection in overflowed:
+            await self._drop(connection)
+
     # --- PHẦN CHO ADMIN ---
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self._register(websocket)
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+            self._unregister(websocket)
 
     async def broadcast(self, message: dict):
-        """Gửi thông báo cho tất cả Admin"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        """Gửi thông báo cho tất cả Admin (không chờ từng socket gửi xong)"""
+        await self._fan_out(self.active_connections, message)
+        if self.bus is not None:
+            await self.bus.publish(ADMIN_CHANNEL, message, local=False)
 
     # --- PHẦN CHO ĐƠN NHÓM (GROUP ORDER) ---
     async def connect_group(self, websocket: WebSocket, group_id: str):
@@ -37,6 +170,7 @@ class ConnectionManager:
         if group_id not in self.group_connections:
             self.group_connections[group_id] = []
         self.group_connections[group_id].append(websocket)
+        self._register(websocket)
         print(f"➕ User joined Group {group_id}. Total: {len(self.group_connections[group_id])}")
 
     def disconnect_group(self, websocket: WebSocket, group_id: str):
@@ -44,9 +178,18 @@ class ConnectionManager:
         if group_id in self.group_connections:
             if websocket in self.group_connections[group_id]:
                 self.group_connections[group_id].remove(websocket)
+                self._unregister(websocket)
             # Nếu nhóm trống thì xóa luôn để tiết kiệm bộ nhớ
             if not self.group_connections[group_id]:
                 del self.group_connections[group_id]
+                batch = self._group_batches.pop(group_id, None)
+                if batch and batch.timer and batch.timer is not asyncio.current_task():
+                    batch.timer.cancel()
+
+    async def send_to(self, websocket: WebSocket, message: dict):
+        """Gửi riêng cho 1 kết nối (đi qua cùng hàng đợi => đúng thứ tự với tin broadcast)"""
+        if not self._enqueue(websocket, message):
+            await self._drop(websocket)
 
     async def broadcast_group(self, group_id: str, message: dict, sender_socket: WebSocket = None):
         """
@@ -54,14 +197,77 @@ class ConnectionManager:
         Nếu truyền sender_socket, sẽ KHÔNG gửi lại cho người đó (tránh lặp món).
         """
         if group_id in self.group_connections:
-            for connection in self.group_connections[group_id]:
-                # Chỉ gửi cho người khác, không gửi lại cho người gửi (nếu có sender_socket)
-                if sender_socket and connection == sender_socket:
-                    continue
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
+            await self._deliver_group(group_id, message, sender_socket)
+        # Thành viên cùng nhóm có thể đang nối vào worker khác
+        if self.bus is not None:
+            await self.bus.publish(GROUP_CHANNEL, {"group_id": group_id, "message": message}, local=False)
+
+    # --- GỘP TIN THEO NHÓM ---
+    def set_group_batching(self, group_id: str, tick_ms: float, max_batch: Optional[int] = None):
+        """Bật/tắt (tick_ms = 0) chế độ gộp tin cho riêng 1 nhóm"""
+        self._group_batch_config[group_id] = (tick_ms, max_batch or self.group_batch_max)
+
+    def _batch_config(self, group_id: str) -> Tuple[float, int]:
+        return self._group_batch_config.get(group_id, (self.group_batch_tick_ms, self.group_batch_max))
+
+    async def _deliver_group(self, group_id: str, message: dict, sender_socket: WebSocket = None):
+        tick_ms, max_batch = self._batch_config(group_id)
+        if tick_ms <= 0:
+            await self._fan_out(self.group_connections[group_id], message, sender_socket)
+            return
+
+        batch = self._group_batches.get(group_id)
+        if batch is None:
+            batch = self._group_batches[group_id] = _GroupBatch(tick_ms / 1000, max_batch)
+        batch.tick, batch.max_size = tick_ms / 1000, max_batch  # cấu hình có thể vừa đổi
+        batch.pending.append((message, sender_socket))
+        if len(batch.pending) >= batch.max_size:
+            # Dồn quá nhiều => gửi ngay, không chờ hết nhịp
+            if batch.timer:
+                batch.timer.cancel()
+                batch.timer = None
+            await self._flush_group(group_id)
+        elif batch.timer is None:
+            # Tin đầu tiên của nhịp => hẹn giờ gửi (nhóm im lặng thì không tốn gì)
+            batch.timer = asyncio.create_task(self._flush_after_tick(group_id, batch))
+
+    async def _flush_after_tick(self, group_id: str, batch: _GroupBatch):
+        await asyncio.sleep(batch.tick)
+        batch.timer = None
+        await self._flush_group(group_id)
+
+    async def _flush_group(self, group_id: str):
+        batch = self._group_batches.get(group_id)
+        if batch is None or not batch.pending:
+            return
+        pending, batch.pending = batch.pending, []
+        self.batches_flushed += 1
+
+        overflowed = []
+        for connection in list(self.group_connections.get(group_id, [])):
+            # Mỗi người nhận 1 frame, bỏ các tin do chính họ gửi
+            messages = [message for message, sender in pending if sender is not connection]
+            if not messages:
+                continue
+            frame = messages[0] if len(messages) == 1 else {"type": "batch", "messages": messages}
+            if not self._enqueue(connection, frame):
+                overflowed.append(connection)
+        for connection in overflowed:
+            await self._drop(connection)
+
+    # --- SỐ LIỆU ---
+    def stats(self) -> dict:
+        depths = [outbox.queue.qsize() for outbox in self._outboxes.values()]
+        return {
+            "admin_connections": len(self.active_connections),
+            "groups": len(self.group_connections),
+            "group_connections": sum(len(members) for members in self.group_connections.values()),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "messages_sent": self.messages_sent,
+            "dropped_connections": self.dropped_connections,
+            "batches_flushed": self.batches_flushed,
+        }
 
 # Tạo instance dùng chung
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(bus=event_bus)
@@ -2,13 +2,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import desc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import delete, desc, insert, update, func, literal, tuple_, Integer
 from decimal import Decimal
+from datetime import datetime, timedelta
 from typing import List, Optional
 
 from app.models import models
 from app.schemas import schemas
 from app.core import security
+from app.core.event_bus import event_bus, ADMIN_EVICTED
 
 # ==========================================
 # 1. AUTH & ADMIN
@@ -19,13 +22,32 @@ async def get_admin_by_username(db: AsyncSession, username: str):
     return result.scalars().first()
 
 async def create_admin(db: AsyncSession, admin: schemas.AdminCreate):
-    hashed_password = security.get_password_hash(admin.password)
+    hashed_password = await security.get_password_hash_async(admin.password)
     db_admin = models.Admin(username=admin.username, hashed_password=hashed_password)
     db.add(db_admin)
     await db.commit()
     await db.refresh(db_admin)
     return db_admin
 
+async def update_admin_password(db: AsyncSession, db_admin: models.Admin, new_password: str):
+    # Nhận admin đã load sẵn (router vừa đọc để kiểm tra mật khẩu cũ) => không query lại
+    username = db_admin.username
+    db_admin.hashed_password = await security.get_password_hash_async(new_password)
+    await db.commit()
+    # Token cũ phải xác thực lại với DB, không dùng bản cache (ở mọi worker)
+    security.admin_principal_cache.evict_username(username)
+    event_bus.publish_nowait(ADMIN_EVICTED, {"username": username})
+    return db_admin
+
+async def delete_admin(db: AsyncSession, username: str):
+    db_admin = await get_admin_by_username(db, username)
+    if not db_admin: return None
+    await db.delete(db_admin)
+    await db.commit()
+    security.admin_principal_cache.evict_username(username)
+    event_bus.publish_nowait(ADMIN_EVICTED, {"username": username})
+    return db_admin
+
 # ==========================================
 # 2. CATEGORY
 # ==========================================
@@ -83,6 +105,47 @@ async def get_product(db: AsyncSession, product_id: int):
     result = await db.execute(stmt)
     return result.scalars().first()
 
+async def get_product_prices(db: AsyncSession, product_ids: Optional[List[int]] = None):
+    # Chỉ lấy các cột cần cho tính tiền (không load options). None = toàn bộ Catalog
+    stmt = select(
+        models.Product.id, models.Product.name,
+        models.Product.base_price, models.Product.is_out_of_stock
+    )
+    if product_ids is not None:
+        stmt = stmt.where(models.Product.id.in_(product_ids))
+    result = await db.execute(stmt)
+    return result.all()
+
+async def fix_product_display_order(db: AsyncSession) -> int:
+    """
+    Đánh số lại display_order (1..n) nếu còn sản phẩm chưa có thứ tự (= 0). Trả về số dòng đã sửa.
+    Giữ nguyên thứ tự cũ, sản phẩm chưa có thứ tự xếp cuối theo id. 1 câu UPDATE, không tải sản phẩm lên.
+    """
+    pending = await db.execute(select(models.Product.id).where(models.Product.display_order == 0).limit(1))
+    if pending.first() is None:
+        return 0
+    numbered = select(
+        models.Product.id,
+        func.row_number().over(
+            order_by=(models.Product.display_order == 0, models.Product.display_order, models.Product.id)
+        ).label("position"),
+    ).subquery()
+    result = await db.execute(
+        update(models.Product)
+        .where(models.Product.id == numbered.c.id)
+        .values(display_order=numbered.c.position)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def get_image_urls(db: AsyncSession) -> List[str]:
+    """Mọi ảnh đang được món / danh mục dùng (cho việc dọn file ảnh thừa)"""
+    stmt = select(models.Product.image_url).where(models.Product.image_url.isnot(None)).union(
+        select(models.Category.image_url).where(models.Category.image_url.isnot(None))
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
 async def create_product(db: AsyncSession, product: schemas.ProductCreate):
     # Check category tồn tại
     stmt = select(models.Category).where(models.Category.id == product.category_id)
@@ -220,6 +283,18 @@ async def get_option_values_by_ids(db: AsyncSession, value_ids: List[int]):
     result = await db.execute(stmt)
     return result.scalars().all()
 
+async def get_option_value_prices(db: AsyncSession, value_ids: Optional[List[int]] = None):
+    # Giá topping kèm tên Option cha (1 câu JOIN). None = toàn bộ Catalog
+    stmt = select(
+        models.OptionValue.id, models.OptionValue.name,
+        models.OptionValue.price_adjustment, models.OptionValue.option_id,
+        models.Option.name.label("option_name"), models.OptionValue.is_out_of_stock
+    ).join(models.Option, models.OptionValue.option_id == models.Option.id, isouter=True)
+    if value_ids is not None:
+        stmt = stmt.where(models.OptionValue.id.in_(value_ids))
+    result = await db.execute(stmt)
+    return result.all()
+
 # ==========================================
 # 5. PUBLIC MENU (ĐÃ THÊM LẠI HÀM NÀY)
 # ==========================================
@@ -256,14 +331,15 @@ async def create_table(db: AsyncSession, table: schemas.TableCreate, store_id: O
     await db.refresh(db_table)
     return db_table
 
-async def update_table_status(db: AsyncSession, table_id: int, status: models.TableStatus):
+async def update_table_status(db: AsyncSession, table_id: int, status: models.TableStatus, commit: bool = True):
     stmt = select(models.Table).where(models.Table.id == table_id)
     result = await db.execute(stmt)
     db_table = result.scalars().first()
     if db_table:
         db_table.status = status
-        await db.commit()
-        await db.refresh(db_table)
+        if commit:
+            await db.commit()
+            await db.refresh(db_table)
     return db_table
 
 # ==========================================
@@ -274,27 +350,76 @@ async def get_user_by_phone(db: AsyncSession, phone: str):
     result = await db.execute(stmt)
     return result.scalars().first()
 
-async def create_user(db: AsyncSession, user_data: dict):
+async def create_user(db: AsyncSession, user_data: dict, commit: bool = True):
     user = models.User(**user_data)
     db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    if commit:
+        await db.commit()
+        await db.refresh(user)
+    else:
+        await db.flush() # Lấy ID, commit chung với giao dịch bên ngoài
     return user
 
-async def update_user_points(db: AsyncSession, user_id: int, points_change: int, money_spent: float = 0):
-    stmt = select(models.User).where(models.User.id == user_id)
-    result = await db.execute(stmt)
+async def get_or_create_user_by_phone(db: AsyncSession, user_data: dict):
+    """
+    Tạo khách theo SĐT nếu chưa có (phone là UNIQUE).
+    INSERT ... ON CONFLICT DO NOTHING: 2 đơn cùng SĐT mới đặt cùng lúc không làm 1 đơn lỗi.
+    """
+    stmt = pg_insert(models.User).values(**user_data).on_conflict_do_nothing(
+        index_elements=[models.User.phone]
+    ).returning(models.User)
+    result = await db.execute(select(models.User).from_statement(stmt))
     user = result.scalars().first()
-    if user:
-        user.points = (user.points or 0) + points_change
-        if money_spent > 0:
-            current_spent = user.total_spent or Decimal(0)
-            user.total_spent = current_spent + Decimal(str(money_spent)) 
-            
-            user.order_count = (user.order_count or 0) + 1
-        await db.commit()
+    if user is None:
+        user = await get_user_by_phone(db, user_data["phone"])
     return user
 
+async def update_user_points(
+    db: AsyncSession, user_id: int, points_change: int, money_spent: float = 0,
+    order_id: Optional[int] = None, commit: bool = True
+):
+    """
+    Cộng/trừ điểm bằng 1 câu SQL nguyên tử (không SELECT rồi cộng trong Python => không mất cập nhật
+    khi 2 đơn cùng SĐT chạy song song), đồng thời ghi 1 dòng vào sổ điểm trong cùng câu lệnh:
+        WITH upd AS (UPDATE users ... WHERE points + change >= 0 RETURNING ...)
+        INSERT INTO points_ledger ... SELECT ... FROM upd
+    Trả về số dư mới, hoặc None nếu không tìm thấy user / không đủ điểm để trừ.
+    """
+    points = func.coalesce(models.User.points, 0)
+    values = {"points": points + points_change}
+    if money_spent > 0:
+        values["total_spent"] = func.coalesce(models.User.total_spent, 0) + Decimal(str(money_spent))
+        values["order_count"] = func.coalesce(models.User.order_count, 0) + 1
+
+    upd = update(models.User)\
+        .where(models.User.id == user_id, points + points_change >= 0)\
+        .values(**values)\
+        .returning(models.User.id, models.User.points)\
+        .cte("upd")
+    reason = models.PointsReason.TICH_DIEM if points_change >= 0 else models.PointsReason.DOI_DIEM
+    stmt = insert(models.PointsLedger).from_select(
+        ["user_id", "order_id", "change", "balance_after", "reason"],
+        select(
+            upd.c.id,
+            literal(order_id, Integer),
+            literal(points_change, Integer),
+            upd.c.points,
+            literal(reason, models.PointsLedger.reason.type),
+        ),
+    ).returning(models.PointsLedger.balance_after)
+    result = await db.execute(stmt)
+    balance = result.scalar()
+    if commit:
+        await db.commit()
+    return balance
+
+async def get_ledger_balance(db: AsyncSession, user_id: int) -> int:
+    # Đối soát: số dư tính lại từ sổ điểm (không cần quét bảng orders)
+    stmt = select(func.coalesce(func.sum(models.PointsLedger.change), 0))\
+        .where(models.PointsLedger.user_id == user_id)
+    result = await db.execute(stmt)
+    return int(result.scalar())
+
 async def get_voucher_by_code(db: AsyncSession, code: str):
     stmt = select(models.Voucher).where(models.Voucher.code == code, models.Voucher.is_active == True)
     result = await db.execute(stmt)
@@ -303,7 +428,8 @@ async def get_voucher_by_code(db: AsyncSession, code: str):
 # ==========================================
 # 8. ORDER (CLEAN VERSION)
 # ==========================================
-async def create_order_record(db: AsyncSession, order_data: schemas.OrderCreate, calculated_data: dict, user_id: Optional[int]):
+# Lưu ý: commit=False => chỉ flush, để OrderService gom cả đơn vào 1 giao dịch duy nhất
+async def create_order_record(db: AsyncSession, order_data: schemas.OrderCreate, calculated_data: dict, user_id: Optional[int], commit: bool = True):
     db_order = models.Order(
         customer_name=order_data.customer_name,
         customer_phone=order_data.customer_phone,
@@ -322,43 +448,121 @@ async def create_order_record(db: AsyncSession, order_data: schemas.OrderCreate,
         status=models.OrderStatus.MOI
     )
     db.add(db_order)
-    await db.commit()
-    await db.refresh(db_order)
+    if commit:
+        await db.commit()
+        await db.refresh(db_order)
+    else:
+        await db.flush() # Lấy ID đơn để insert chi tiết món
     return db_order
 
-async def create_order_items(db: AsyncSession, order_id: int, items_data: List[dict]):
-    for item in items_data:
-        db_item = models.OrderItem(
-            order_id=order_id,
-            product_id=item['product_id'],
-            product_name=item['product_name'],
-            quantity=item['quantity'],
-            item_price=item['final_price'],
-            item_note=item.get('note'),
-            ordered_by=item.get('ordered_by')
-        )
-        db.add(db_item)
+async def create_order_items(db: AsyncSession, order_id: int, items_data: List[dict], commit: bool = True):
+    if not items_data:
+        return
+    # 1 câu INSERT nhiều dòng cho tất cả món, RETURNING id theo đúng thứ tự đầu vào
+    item_rows = [
+        {
+            "order_id": order_id,
+            "product_id": item['product_id'],
+            "product_name": item['product_name'],
+            "quantity": item['quantity'],
+            "item_price": item['final_price'],
+            "item_note": item.get('note'),
+            "ordered_by": item.get('ordered_by'),
+        }
+        for item in items_data
+    ]
+    stmt = insert(models.OrderItem).returning(models.OrderItem.id, sort_by_parameter_order=True)
+    result = await db.execute(stmt, item_rows)
+    item_ids = result.scalars().all()
+
+    # 1 câu INSERT nhiều dòng cho toàn bộ topping của đơn
+    option_rows = [
+        {
+            "order_item_id": item_id,
+            "option_name": opt.get('option_name', 'Option'),
+            "value_name": opt['value_name'],
+            "added_price": opt['added_price'],
+        }
+        for item_id, item in zip(item_ids, items_data)
+        for opt in item.get('options_selected', [])
+    ]
+    if option_rows:
+        await db.execute(insert(models.OrderItemOption), option_rows)
+    if commit:
         await db.commit()
-        await db.refresh(db_item)
-        
-        if 'options_selected' in item:
-            for opt in item['options_selected']:
-                db_opt = models.OrderItemOption(
-                    order_item_id=db_item.id,
-                    option_name=opt.get('option_name', 'Option'),
-                    value_name=opt['value_name'],
-                    added_price=opt['added_price']
-                )
-                db.add(db_opt)
-    await db.commit()
 
-async def get_orders(db: AsyncSession, skip: int = 0, limit: int = 100):
+def _order_filters(
+    after_id: Optional[int] = None,
+    status: Optional[List[models.OrderStatus]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    table_id: Optional[int] = None,
+    delivery_method: Optional[models.DeliveryMethod] = None,
+):
+    conditions = []
+    if after_id is not None:
+        # Keyset: đơn cũ hơn đơn cuối của trang trước (dùng index, không phải bỏ qua N dòng như OFFSET)
+        conditions.append(models.Order.id < after_id)
+    if status:
+        conditions.append(models.Order.status.in_(status))
+    if created_from is not None:
+        conditions.append(models.Order.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(models.Order.created_at < created_to)
+    if table_id is not None:
+        conditions.append(models.Order.table_id == table_id)
+    if delivery_method is not None:
+        conditions.append(models.Order.delivery_method_selected == delivery_method)
+    return conditions
+
+async def get_orders(db: AsyncSession, skip: int = 0, limit: int = 100, **filters):
+    """
+    Danh sách đơn mới nhất trước. Phân trang bằng after_id (khuyên dùng) hoặc skip (cách cũ).
+    filters: after_id, status, created_from, created_to, table_id, delivery_method
+    """
+    stmt = select(models.Order).options(
+        selectinload(models.Order.items).selectinload(models.OrderItem.options_selected)
+    ).where(*_order_filters(**filters)).order_by(desc(models.Order.id)).limit(limit)
+    if skip:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def get_order_summaries(db: AsyncSession, skip: int = 0, limit: int = 100, **filters):
+    """Giống get_orders nhưng chỉ lấy các cột cho bảng đơn + số dòng món, trong 1 câu query"""
+    page = select(
+        models.Order.id, models.Order.customer_name, models.Order.total_amount,
+        models.Order.status, models.Order.created_at, models.Order.table_id,
+        models.Order.delivery_method_selected,
+    ).where(*_order_filters(**filters)).order_by(desc(models.Order.id)).limit(limit)
+    if skip:
+        page = page.offset(skip)
+    page = page.subquery()
+    # Cắt trang trước rồi mới đếm món => chỉ đếm cho `limit` đơn
+    stmt = select(page, func.count(models.OrderItem.id).label("item_count")).outerjoin(
+        models.OrderItem, models.OrderItem.order_id == page.c.id
+    ).group_by(*page.c).order_by(desc(page.c.id))
+    result = await db.execute(stmt)
+    return result.all()
+
+async def get_order_changes(db: AsyncSession, since: datetime, after_id: int, limit: int = 100, lag_seconds: float = 0):
+    """
+    Đơn được tạo/sửa sau vị trí (since, after_id), cũ trước - mới sau.
+    Bỏ qua các thay đổi mới hơn `lag_seconds`: updated_at = giờ BẮT ĐẦU giao dịch, nên giao dịch đang chạy
+    có thể commit với updated_at nhỏ hơn cursor đã trả về => chờ một chút để không bỏ sót.
+    """
     stmt = select(models.Order).options(
         selectinload(models.Order.items).selectinload(models.OrderItem.options_selected)
-    ).order_by(desc(models.Order.id)).offset(skip).limit(limit)
+    ).where(
+        tuple_(models.Order.updated_at, models.Order.id) > tuple_(literal(since), literal(after_id)),
+        models.Order.updated_at < func.clock_timestamp() - timedelta(seconds=lag_seconds),
+    ).order_by(models.Order.updated_at, models.Order.id).limit(limit)
     result = await db.execute(stmt)
     return result.scalars().all()
 
+async def get_db_time(db: AsyncSession) -> datetime:
+    return (await db.execute(select(func.clock_timestamp()))).scalar()
+
 async def get_order_details(db: AsyncSession, order_id: int):
     stmt = select(models.Order).options(
         selectinload(models.Order.items).selectinload(models.OrderItem.options_selected)
@@ -409,4 +613,41 @@ async def delete_voucher(db: AsyncSession, voucher_id: int):
     if not db_voucher: return None
     await db.delete(db_voucher)
     await db.commit()
-    return db_voucher
\ No newline at end of file
+    return db_voucher
+# ==========================================
+# 10. GROUP CART (giỏ hàng nhóm dùng chung giữa các worker)
+# ==========================================
+async def ensure_group_cart_state(db: AsyncSession, group_id: str) -> bool:
+    """Tạo dòng giỏ rỗng nếu chưa có. True nếu vừa tạo (2 worker tạo cùng lúc cũng không lỗi)"""
+    stmt = pg_insert(models.GroupCartState).values(
+        group_id=group_id, version=0, next_line_id=1, lines=[], history=[]
+    ).on_conflict_do_nothing(index_elements=[models.GroupCartState.group_id]).returning(models.GroupCartState.group_id)
+    result = await db.execute(stmt)
+    return result.scalar() is not None
+
+async def get_group_cart_state(db: AsyncSession, group_id: str, for_update: bool = False):
+    stmt = select(models.GroupCartState).where(models.GroupCartState.group_id == group_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    else:
+        # Luôn đọc bản mới nhất (worker khác vừa sửa), không lấy object cũ trong session
+        stmt = stmt.execution_options(populate_existing=True)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def delete_group_cart_state(db: AsyncSession, group_id: str, commit: bool = True):
+    await db.execute(delete(models.GroupCartState).where(models.GroupCartState.group_id == group_id))
+    if commit:
+        await db.commit()
+
+async def prune_group_cart_states(db: AsyncSession, idle_seconds: float) -> int:
+    """Xóa giỏ của các nhóm bỏ dở (không ai thao tác quá idle_seconds)"""
+    cutoff = func.now() - timedelta(seconds=idle_seconds)
+    result = await db.execute(delete(models.GroupCartState).where(models.GroupCartState.updated_at < cutoff))
+    return result.rowcount
+
+async def get_group_cart_stats(db: AsyncSession) -> dict:
+    lines = func.coalesce(func.sum(func.jsonb_array_length(models.GroupCartState.lines)), 0)
+    result = await db.execute(select(func.count(), lines).select_from(models.GroupCartState))
+    groups, total_lines = result.one()
+    return {"groups": groups, "lines": int(total_lines)}
@@ -2,28 +2,29 @@
 from dotenv import load_dotenv
 load_dotenv() 
 
+from app.core.startup import startup_timer  # Import sớm nhất => bắt đầu đo thời gian khởi động
+
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-# Import Async
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-
 from app.models import models
-from app.models.models import AsyncSessionLocal, create_tables
+from app.models.models import warm_up_pool
+from app.core.event_bus import event_bus
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.services.images import image_processor, ImmutableStaticFiles, UploadLimitMiddleware, UPLOAD_DIRECTORY, STATIC_PATH
 
 # Import các Router
-from app.routers import auth, public_menu, orders, admin_catalog, admin_store
+from app.routers import auth, public_menu, orders, admin_catalog, admin_store, metrics
+
+startup_timer.mark("import")
 
 app = FastAPI(title="FNB Smart Menu - Backend API")
 
 # Mount thư mục uploads
-UPLOAD_DIRECTORY = "uploads"
-STATIC_PATH = "/static"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
-app.mount(STATIC_PATH, StaticFiles(directory=UPLOAD_DIRECTORY), name="static")
+app.mount(STATIC_PATH, ImmutableStaticFiles(directory=UPLOAD_DIRECTORY), name="static")
 
 # Cấu hình CORS
 origins = ["*"] 
@@ -33,42 +34,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "Server-Timing"], # Cho phép trình duyệt đọc các header này
 )
+# Đếm số câu SQL + thời gian DB của từng request (header X-DB-Queries / Server-Timing)
+app.add_middleware(QueryStatsMiddleware)
+# Chặn upload quá cỡ ngay khi nhận body (kể cả upload chunked, không có Content-Length)
+app.add_middleware(UploadLimitMiddleware, paths=["/admin/upload-image"])
+# Độ trễ / status code theo route cho Prometheus (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# === KHỞI ĐỘNG (ASYNC STARTUP) ===
+# Không tạo bảng / sửa dữ liệu ở đây nữa (xem app/scripts/maintenance.py)
+# => mỗi worker khởi động nhanh, không phụ thuộc kích thước catalog, không cần driver sync.
+# STARTUP_MAINTENANCE=1: vẫn tạo bảng + sửa dữ liệu trong process như trước (tiện cho dev chạy 1 worker)
+STARTUP_MAINTENANCE = os.getenv("STARTUP_MAINTENANCE", "0") == "1"
 
-# === TỰ ĐỘNG KHỞI TẠO (ASYNC STARTUP) ===
 @app.on_event("startup")
 async def on_startup():
-    # 1. Tạo bảng (Dùng hàm sync hack trong models.py để tạo bảng ban đầu)
-    # Lưu ý: Trong thực tế nên dùng Alembic, nhưng giữ cái này cho tiện
-    try:
-        create_tables() 
-    except Exception as e:
-        print(f"⚠️ Warning creating tables: {e}")
+    if STARTUP_MAINTENANCE:
+        from app.scripts.maintenance import run_maintenance
+        with startup_timer.phase("maintenance"):
+            await run_maintenance()
+
+    # 1. Mở sẵn kết nối DB cho pool
+    with startup_timer.phase("db_pool"):
+        warmed = await warm_up_pool()
+    print(f"🔌 Đã mở sẵn {warmed} kết nối DB")
+
+    # 2. Kết nối event bus (đồng bộ websocket & cache giữa các worker)
+    with startup_timer.phase("event_bus"):
+        await event_bus.start()
+
+    startup_timer.report()
 
-    # 2. Logic tự động sửa lỗi thứ tự hiển thị (Chuyển sang Async)
-    async with AsyncSessionLocal() as db:
-        try:
-            # Dùng cú pháp select thay vì query
-            stmt = select(models.Product).where(models.Product.display_order == 0)
-            result = await db.execute(stmt)
-            zero_order_products = result.scalars().all()
-            
-            if zero_order_products:
-                print("🛠️ Đang tự động cập nhật số thứ tự sản phẩm...")
-                stmt_all = select(models.Product)
-                res_all = await db.execute(stmt_all)
-                all_products = res_all.scalars().all()
-                
-                for index, prod in enumerate(all_products):
-                    prod.display_order = index + 1
-                await db.commit()
-                print("✅ Đã xong!")
-        except Exception as e:
-            print(f"⚠️ Lỗi startup: {e}")
+@app.on_event("shutdown")
+async def on_shutdown():
+    await event_bus.stop()
+    await models.engine.dispose()  # Đóng gọn các kết nối trong pool
+    image_processor.shutdown()
 
 # === GẮN CÁC ROUTER VÀO APP ===
 app.include_router(auth.router, prefix="/admin", tags=["Authentication"])
 app.include_router(public_menu.router, tags=["Public Menu"])
 app.include_router(orders.router, tags=["Orders"]) # Prefix rỗng vì router tự định nghĩa
 app.include_router(admin_catalog.router, prefix="/admin", tags=["Admin Catalog"])
-app.include_router(admin_store.router, prefix="/admin", tags=["Admin Store"])
\ No newline at end of file
+app.include_router(admin_store.router, prefix="/admin", tags=["Admin Store"])
+app.include_router(metrics.router, tags=["Metrics"])
\ No newline at end of file
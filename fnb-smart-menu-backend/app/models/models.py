@@ -1,15 +1,18 @@
 # Tệp: app/models/models.py (ASYNC VERSION)
 import os
 import enum
+import asyncio
+from sqlalchemy import text
 from sqlalchemy import (
     Column, Integer, String, Boolean, ForeignKey, 
-    Enum as SAEnum, DateTime, func, Text, Numeric, Float, Date
+    Enum as SAEnum, DateTime, func, Text, Numeric, Float, Date, Index
 )
 from sqlalchemy.orm import relationship, DeclarativeBase
 from sqlalchemy.dialects.postgresql import JSONB
 
 # --- [ASYNC IMPORTS] ---
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.core.metrics import TimedQueuePool, register_pool_metrics
 
 # --- Cấu hình CSDL ---
 DB_USER = os.getenv("POSTGRES_USER", "postgres")
@@ -26,8 +29,54 @@ SYNC_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_N
 class Base(DeclarativeBase):
     pass
 
+# --- Cấu hình pool kết nối (mỗi worker 1 pool => tổng kết nối = số worker x (size + overflow)) ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))     # giây chờ kết nối trước khi báo lỗi
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # giây, -1 = không bao giờ đóng lại
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"    # bật khi có proxy/firewall hay cắt kết nối rảnh
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))  # số kết nối mở sẵn lúc khởi động
+# Cache prepared statement của asyncpg (mỗi kết nối). Đặt 0 nếu đi qua pgbouncer chế độ transaction
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
 # --- [ASYNC ENGINE] ---
-engine = create_async_engine(DATABASE_URL, echo=False)
+# TimedQueuePool = pool mặc định + đo thời gian chờ lấy kết nối (xem /metrics)
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,  # cache của SQLAlchemy
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,           # cache của asyncpg
+    },
+)
+register_pool_metrics(lambda: engine.sync_engine.pool)
+
+
+def pool_stats() -> dict:
+    return engine.sync_engine.pool.stats()
+
+
+async def warm_up_pool(count: int = DB_POOL_WARMUP) -> int:
+    """Mở sẵn `count` kết nối (song song) rồi trả về pool => request đầu tiên sau deploy không phải chờ kết nối"""
+    count = min(count, DB_POOL_SIZE)
+    if count <= 0:
+        return 0
+    results = await asyncio.gather(*(engine.connect() for _ in range(count)), return_exceptions=True)
+    connections = [conn for conn in results if not isinstance(conn, BaseException)]
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections))
+    errors = [e for e in results if isinstance(e, BaseException)]
+    if errors:
+        print(f"⚠️ Không mở sẵn được {len(errors)}/{count} kết nối DB: {errors[0]}")
+    return len(connections)
 
 # --- [ASYNC SESSION] ---
 AsyncSessionLocal = async_sessionmaker(
@@ -77,6 +126,11 @@ class UserRole(enum.Enum):
     STAFF = "STAFF"
     CUSTOMER = "CUSTOMER"
 
+class PointsReason(enum.Enum):
+    MO_SO = "MO_SO"         # Số dư đầu kỳ (khi bắt đầu dùng sổ điểm)
+    TICH_DIEM = "TICH_DIEM" # Cộng điểm khi hoàn tất đơn
+    DOI_DIEM = "DOI_DIEM"   # Trừ điểm khi dùng điểm giảm giá
+
 class TableStatus(enum.Enum):
     TRONG = "TRONG"         
     CO_KHACH = "CO_KHACH"   
@@ -109,7 +163,7 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=True)
     hashed_password = Column(String, nullable=True)
     full_name = Column(String)
-    phone = Column(String, index=True)
+    phone = Column(String, unique=True, index=True) # SĐT là định danh khách (tạo ngầm khi đặt đơn)
     email = Column(String, nullable=True)
     role = Column(SAEnum(UserRole), default=UserRole.CUSTOMER)
     
@@ -126,10 +180,22 @@ class User(Base):
     store = relationship("Store", back_populates="users")
     orders = relationship("Order", back_populates="user")
 
+class PointsLedger(Base):
+    # Sổ điểm chỉ ghi thêm (append-only): SUM(change) theo user luôn bằng users.points
+    __tablename__ = "points_ledger"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    change = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(SAEnum(PointsReason), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class ProductOptionAssociation(Base):
     __tablename__ = "product_option_association"
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
-    option_id = Column(Integer, ForeignKey("options.id", ondelete="CASCADE"), primary_key=True)
+    # PK (product_id, option_id) không dùng được khi tìm theo option_id => index riêng
+    option_id = Column(Integer, ForeignKey("options.id", ondelete="CASCADE"), primary_key=True, index=True)
 
 class Category(Base):
     __tablename__ = "categories"
@@ -153,7 +219,7 @@ class Product(Base):
     display_order = Column(Integer, default=0)
     is_out_of_stock = Column(Boolean, default=False)
     
-    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"))
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), index=True)
     category = relationship("Category", back_populates="products")
     
     store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), nullable=True)
@@ -181,7 +247,7 @@ class OptionValue(Base):
     name = Column(String, nullable=False)
     price_adjustment = Column(Numeric(10, 0), default=0)
     is_out_of_stock = Column(Boolean, default=False)
-    option_id = Column(Integer, ForeignKey("options.id", ondelete="CASCADE"))
+    option_id = Column(Integer, ForeignKey("options.id", ondelete="CASCADE"), index=True)
     option = relationship("Option", back_populates="values")
     recipes = relationship("Recipe", back_populates="option_value", cascade="all, delete-orphan")
 
@@ -218,13 +284,13 @@ class Table(Base):
 
 class Order(Base):
     __tablename__ = "orders"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)  # Khóa chính đã là index, không tạo thêm ix_orders_id
     customer_name = Column(String, nullable=False)
     customer_phone = Column(String, nullable=False)
     customer_address = Column(String, nullable=False)
     customer_note = Column(String)
     
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     user = relationship("User", back_populates="orders")
     
     store_id = Column(Integer, ForeignKey("stores.id", ondelete="CASCADE"), nullable=True)
@@ -249,13 +315,38 @@ class Order(Base):
     table_id = Column(Integer, ForeignKey("tables.id", ondelete="SET NULL"), nullable=True)
     table = relationship("Table", back_populates="orders")
 
+    # Mỗi lần đổi trạng thái đơn phải ghi lại mọi index có status / updated_at
+    # => giữ ít index nhất có thể (lý do từng index: alembic/versions/c41d7e9a2b80_consolidate_order_indexes.py)
+    __table_args__ = (
+        # Lọc theo trạng thái (bảng đơn, "đơn MOI hôm nay"): đơn còn mở ít => lấy hết theo index rồi sắp xếp theo id
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        # Đơn của 1 bàn + khóa ngoại tables.id (ON DELETE SET NULL)
+        Index("ix_orders_table_id_id", "table_id", "id"),
+        # Lọc theo khoảng ngày (không kèm trạng thái)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Change feed: WHERE (updated_at, id) > cursor ORDER BY updated_at, id
+        Index("ix_orders_updated_at_id", "updated_at", "id"),
+    )
+
+class GroupCartState(Base):
+    # Giỏ hàng nhóm dùng chung cho mọi worker (xem app/services/group_cart.py).
+    # Mỗi thao tác khóa dòng (SELECT ... FOR UPDATE) => version / line_id không bao giờ lệch giữa các worker
+    __tablename__ = "group_carts"
+    group_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    next_line_id = Column(Integer, nullable=False, default=1)
+    lines = Column(JSONB, nullable=False, default=list)    # [CartLine.to_dict(line_id), ...]
+    history = Column(JSONB, nullable=False, default=list)  # các delta gần nhất (để client đồng bộ lại)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     order = relationship("Order", back_populates="items")
     
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
+    # index: xóa món trong Catalog phải SET NULL ở lịch sử đơn mà không quét cả bảng
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True, index=True)
     product_name = Column(String, nullable=False)
     quantity = Column(Integer, default=1)
     
@@ -268,7 +359,7 @@ class OrderItem(Base):
 class OrderItemOption(Base):
     __tablename__ = "order_item_options"
     id = Column(Integer, primary_key=True, index=True)
-    order_item_id = Column(Integer, ForeignKey("order_items.id", ondelete="CASCADE"))
+    order_item_id = Column(Integer, ForeignKey("order_items.id", ondelete="CASCADE"), index=True)
     order_item = relationship("OrderItem", back_populates="options_selected")
     
     option_name = Column(String)
@@ -298,9 +389,7 @@ class Admin(Base):
     username = Column(String, unique=True)
     hashed_password = Column(String)
 
-# Hàm tạo bảng (Chỉ dùng cho script sync, không dùng cho App Async)
-def create_tables():
-    # Cần tạo engine sync tạm thời để tạo bảng nếu không dùng alembic
-    from sqlalchemy import create_engine
-    sync_engine = create_engine(SYNC_DATABASE_URL)
-    Base.metadata.create_all(bind=sync_engine)
\ No newline at end of file
+# Hàm tạo bảng khi không dùng Alembic (chỉ gọi từ app/scripts/maintenance.py, không chạy lúc khởi động app)
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
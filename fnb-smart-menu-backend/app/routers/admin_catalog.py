@@ -6,9 +6,20 @@ from app.crud import crud
 from app.schemas import schemas
 from app.core import security
 from app.dependencies import get_db # <--- Dùng chung
+from app.services.menu_cache import menu_cache
+from app.services.price_index import price_index
+from app.core.event_bus import event_bus, CATALOG_CHANGED
 
 router = APIRouter()
 
+def catalog_changed(result):
+    """Mọi thao tác ghi Catalog thành công đều phải gọi hàm này để Menu & bảng giá được build lại"""
+    if result:
+        menu_cache.invalidate()
+        price_index.invalidate()
+        event_bus.publish_nowait(CATALOG_CHANGED, {}) # Báo các worker khác
+    return result
+
 # --- CATEGORIES ---
 @router.get("/categories/", response_model=List[schemas.Category])
 async def read_categories(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
@@ -16,17 +27,17 @@ async def read_categories(skip: int = 0, limit: int = 100, db: AsyncSession = De
 
 @router.post("/categories/", response_model=schemas.Category)
 async def create_category(category: schemas.CategoryCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.create_category(db, category)
+    return catalog_changed(await crud.create_category(db, category))
 
 @router.put("/categories/{cat_id}", response_model=schemas.Category)
 async def update_category(cat_id: int, category: schemas.CategoryUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.update_category(db, cat_id, category)
+    return catalog_changed(await crud.update_category(db, cat_id, category))
 
 @router.delete("/categories/{cat_id}")
 async def delete_category(cat_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     result = await crud.delete_category(db, cat_id)
     if not result: raise HTTPException(status_code=404, detail="Không tìm thấy danh mục")
-    return result
+    return catalog_changed(result)
 
 # --- PRODUCTS ---
 @router.get("/products/", response_model=List[schemas.Product])
@@ -35,21 +46,21 @@ async def read_products(skip: int = 0, limit: int = 100, db: AsyncSession = Depe
 
 @router.post("/products/", response_model=schemas.Product)
 async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.create_product(db, product)
+    return catalog_changed(await crud.create_product(db, product))
 
 @router.put("/products/{prod_id}", response_model=schemas.Product)
 async def update_product(prod_id: int, product: schemas.ProductUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.update_product(db, prod_id, product)
+    return catalog_changed(await crud.update_product(db, prod_id, product))
 
 @router.delete("/products/{prod_id}")
 async def delete_product(prod_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     result = await crud.delete_product(db, prod_id)
     if not result: raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
-    return result
+    return catalog_changed(result)
 
 @router.post("/products/{prod_id}/link_options", response_model=schemas.Product)
 async def link_options(prod_id: int, link_request: schemas.ProductLinkOptionsRequest, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.link_product_to_options(db, prod_id, link_request.option_ids)
+    return catalog_changed(await crud.link_product_to_options(db, prod_id, link_request.option_ids))
 
 # --- OPTIONS ---
 @router.get("/options/", response_model=List[schemas.Option])
@@ -58,32 +69,32 @@ async def read_options(skip: int = 0, limit: int = 100, db: AsyncSession = Depen
 
 @router.post("/options/", response_model=schemas.Option)
 async def create_option(option: schemas.OptionCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.create_option(db, option)
+    return catalog_changed(await crud.create_option(db, option))
 
 @router.put("/options/{option_id}", response_model=schemas.Option)
 async def update_option(option_id: int, option: schemas.OptionUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.update_option(db, option_id, option)
     if not res: raise HTTPException(status_code=404, detail="Not Found")
-    return res
+    return catalog_changed(res)
 
 @router.delete("/options/{option_id}")
 async def delete_option(option_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.delete_option(db, option_id)
     if not res: raise HTTPException(status_code=404, detail="Not Found")
-    return res
+    return catalog_changed(res)
 
 @router.post("/options/{option_id}/values", response_model=schemas.OptionValue)
 async def create_option_value(option_id: int, value: schemas.OptionValueCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.create_option_value(db, value, option_id)
+    return catalog_changed(await crud.create_option_value(db, value, option_id))
 
 @router.put("/values/{value_id}", response_model=schemas.OptionValue)
 async def update_option_value(value_id: int, value: schemas.OptionValueUpdate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.update_option_value(db, value_id, value)
     if not res: raise HTTPException(status_code=404, detail="Not Found")
-    return res
+    return catalog_changed(res)
 
 @router.delete("/values/{value_id}")
 async def delete_option_value(value_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.delete_option_value(db, value_id)
     if not res: raise HTTPException(status_code=404, detail="Not Found")
-    return res
\ No newline at end of file
+    return catalog_changed(res)
\ No newline at end of file
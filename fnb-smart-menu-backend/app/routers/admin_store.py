@@ -2,31 +2,32 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import os
-import uuid
-import shutil
 from app.crud import crud
 from app.schemas import schemas
 from app.models import models
 from app.core import security
 from app.dependencies import get_db # <--- Dùng chung
+from app.services.menu_cache import menu_cache
+from app.services.price_index import price_index
+from app.services.voucher_cache import voucher_cache
+from app.services.group_cart import group_carts
+from app.services.images import image_processor
+from app.core.websocket import manager as ws_manager
+from app.core.event_bus import event_bus, VOUCHERS_CHANGED
 
 router = APIRouter()
 
-UPLOAD_DIRECTORY = "uploads"
+def vouchers_changed():
+    voucher_cache.clear()
+    event_bus.publish_nowait(VOUCHERS_CHANGED, {}) # Báo các worker khác
 
 # --- UPLOAD ---
-@router.post("/upload-image")
+# Dung lượng body được giới hạn ngay lúc nhận ở UploadLimitMiddleware (app/main.py),
+# dung lượng file thật vẫn được đếm lại khi ghi xuống đĩa
+@router.post("/upload-image", response_model=schemas.UploadedImage)
 async def upload_image(file: UploadFile = File(...), current_user = Depends(security.get_current_admin)):
-    try:
-        file_extension = file.filename.split(".")[-1]
-        file_name = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIRECTORY, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        return {"image_url": f"/static/{file_name}"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi: {str(e)}")
+    # image_url = bản "card" (WebP) để hiển thị trên Menu; variants = mọi kích thước / định dạng
+    return await image_processor.process_upload(file)
 
 # --- TABLES ---
 @router.get("/tables/", response_model=List[schemas.Table])
@@ -48,16 +49,34 @@ async def read_vouchers(skip: int = 0, limit: int = 100, db: AsyncSession = Depe
 
 @router.post("/vouchers/", response_model=schemas.Voucher)
 async def create_voucher(voucher: schemas.VoucherCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
-    return await crud.create_voucher(db, voucher)
+    res = await crud.create_voucher(db, voucher)
+    vouchers_changed() # Mã mới có thể đang nằm trong negative cache
+    return res
 
 @router.put("/vouchers/{voucher_id}", response_model=schemas.Voucher)
 async def update_voucher(voucher_id: int, voucher: schemas.VoucherCreate, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.update_voucher(db, voucher_id, voucher)
     if not res: raise HTTPException(status_code=404, detail="Not found")
+    vouchers_changed()
     return res
 
 @router.delete("/vouchers/{voucher_id}")
 async def delete_voucher(voucher_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
     res = await crud.delete_voucher(db, voucher_id)
     if not res: raise HTTPException(status_code=404, detail="Not found")
-    return res
\ No newline at end of file
+    vouchers_changed()
+    return res
+
+# --- CACHE (Theo dõi hiệu quả cache trong bộ nhớ của worker này) ---
+@router.get("/cache-stats")
+async def read_cache_stats(db: AsyncSession = Depends(get_db), current_user=Depends(security.get_current_admin)):
+    return {
+        "menu": {"version": menu_cache.version},
+        "price_index": price_index.stats(),
+        "vouchers": voucher_cache.stats(),
+        "admin_principals": security.admin_principal_cache.stats(),
+        "websocket": ws_manager.stats(),
+        "event_bus": event_bus.stats(),
+        "group_carts": await group_carts.stats(db),  # dùng chung mọi worker (bảng group_carts)
+        "db_pool": models.pool_stats(),
+    }
@@ -1,5 +1,5 @@
 # Tệp: app/routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import security
@@ -12,6 +12,25 @@ router = APIRouter()
 @router.post("/token", response_model=schemas.Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     admin = await crud.get_admin_by_username(db, form_data.username)
-    if not admin or not security.verify_password(form_data.password, admin.hashed_password):
+    if not admin or not await security.verify_password_async(form_data.password, admin.hashed_password):
         raise HTTPException(status_code=400, detail="Sai tài khoản hoặc mật khẩu")
-    return {"access_token": security.create_access_token(data={"sub": admin.username}), "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": security.create_access_token(data={"sub": admin.username}), "token_type": "bearer"}
+
+# --- QUẢN LÝ TÀI KHOẢN ADMIN (xóa cache xác thực ở mọi worker, xem crud.update_admin_password / delete_admin) ---
+@router.put("/me/password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(
+    data: schemas.AdminPasswordChange, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)
+):
+    admin = await crud.get_admin_by_username(db, current_user.username)
+    if not admin or not await security.verify_password_async(data.current_password, admin.hashed_password):
+        raise HTTPException(status_code=400, detail="Mật khẩu hiện tại không đúng")
+    await crud.update_admin_password(db, admin, data.new_password)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/admins/{username}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_admin(username: str, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)):
+    if username == current_user.username:
+        raise HTTPException(status_code=400, detail="Không thể tự xóa tài khoản đang đăng nhập")
+    if not await crud.delete_admin(db, username):
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
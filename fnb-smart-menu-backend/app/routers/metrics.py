@@ -0,0 +1,35 @@
+# Tệp: app/routers/metrics.py
+# Endpoint /metrics cho Prometheus. Không đi qua nginx (bị chặn ở nginx.production.conf),
+# Prometheus scrape thẳng container backend. Đặt METRICS_TOKEN nếu cổng backend lộ ra ngoài.
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Response
+from app.core.metrics import metrics, METRICS_CONTENT_TYPE
+from app.core.websocket import manager as ws_manager
+
+router = APIRouter()
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# --- WEBSOCKET (đọc từ ConnectionManager lúc scrape) ---
+metrics.gauge(
+    "fnb_ws_connections", "Số websocket đang mở", ("kind",),
+    function=lambda: {
+        ("admin",): len(ws_manager.active_connections),
+        ("group",): sum(len(members) for members in ws_manager.group_connections.values()),
+    },
+)
+metrics.gauge("fnb_ws_groups", "Số nhóm đặt đơn đang có người kết nối", function=lambda: len(ws_manager.group_connections))
+metrics.gauge("fnb_ws_queue_depth", "Tổng số tin đang chờ gửi trong hàng đợi websocket",
+              function=lambda: ws_manager.stats()["queue_depth_total"])
+metrics.counter("fnb_ws_messages_sent_total", "Số tin websocket đã gửi", function=lambda: ws_manager.messages_sent)
+metrics.counter("fnb_ws_dropped_connections_total", "Số kết nối bị ngắt vì client đọc quá chậm",
+                function=lambda: ws_manager.dropped_connections)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
@@ -1,15 +1,21 @@
 # Tệp: app/routers/orders.py
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnected, WebSocketState
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from app.schemas import schemas
 from app.models import models
+from app.models.models import AsyncSessionLocal
 from app.core import security
 from app.dependencies import get_db # <--- Dùng chung
+from app.core.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 from app.crud import crud 
 from app.services.order_service import OrderService
+from app.services.group_cart import group_carts, GroupCartError
+from app.services.order_feed import order_feed
 
 try:
     from app.core.websocket import manager
@@ -27,6 +33,7 @@ async def calculate_order(order_data: schemas.OrderCalculateRequest, db: AsyncSe
 @router.post("/orders", response_model=schemas.PublicOrderResponse, status_code=status.HTTP_201_CREATED)
 async def submit_new_order(order_data: schemas.OrderCreate, db: AsyncSession = Depends(get_db)):
     db_order = await OrderService.place_order(db, order_data)
+    order_feed.publish_change()
     
     if manager:
         msg = {
@@ -38,13 +45,97 @@ async def submit_new_order(order_data: schemas.OrderCreate, db: AsyncSession = D
             "timestamp": datetime.now().isoformat()
         }
         await manager.broadcast(msg)
+        if order_data.group_id:
+            # Báo cả nhóm: đơn đã được gửi, giỏ nhóm đã đóng
+            await manager.broadcast_group(order_data.group_id, {"type": "group_order_submitted", "order_id": db_order.id})
     
     return db_order
 
 # --- API ADMIN ---
+def order_list_filters(
+    after_id: Optional[int] = Query(None, description="Lấy các đơn có id nhỏ hơn giá trị này"),
+    cursor: Optional[str] = Query(None, description="Giá trị header X-Next-Cursor của trang trước"),
+    status: Optional[List[models.OrderStatus]] = Query(None),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    table_id: Optional[int] = None,
+    delivery_method: Optional[models.DeliveryMethod] = None,
+) -> dict:
+    """Bộ lọc + cursor dùng chung cho danh sách đơn (đầy đủ & rút gọn)"""
+    if cursor:
+        after_id = decode_cursor(cursor).get("id")
+        if not isinstance(after_id, int):
+            raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    return {
+        "after_id": after_id, "status": status, "created_from": created_from,
+        "created_to": created_to, "table_id": table_id, "delivery_method": delivery_method,
+    }
+
+def set_next_cursor(response: Response, orders, limit: int):
+    # Trang đầy => có thể còn trang sau
+    if len(orders) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": orders[-1].id})
+
 @router.get("/admin/orders/", response_model=List[schemas.OrderDetail]) 
-async def read_orders(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)):
-    return await crud.get_orders(db, skip, limit)
+async def read_orders(
+    response: Response,
+    skip: int = Query(0, ge=0, description="Cách cũ (OFFSET) - chậm dần khi bảng lớn, nên dùng cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    filters: dict = Depends(order_list_filters),
+    db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)
+):
+    orders = await crud.get_orders(db, skip=skip, limit=limit, **filters)
+    set_next_cursor(response, orders, limit)
+    return orders
+
+@router.get("/admin/orders/summary", response_model=List[schemas.AdminOrderSummary])
+async def read_order_summaries(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    filters: dict = Depends(order_list_filters),
+    db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)
+):
+    """Bảng đơn: 1 query hẹp, không tải món/topping. Chi tiết đơn lấy riêng qua /admin/orders/{order_id}"""
+    orders = await crud.get_order_summaries(db, skip=skip, limit=limit, **filters)
+    set_next_cursor(response, orders, limit)
+    return orders
+
+@router.get("/admin/orders/changes", response_model=schemas.OrderChangeFeed)
+async def read_order_changes(
+    cursor: Optional[str] = Query(None, description="Cursor của lần gọi trước; bỏ trống = bắt đầu từ bây giờ"),
+    since: Optional[datetime] = Query(None, description="Hoặc lấy thay đổi từ thời điểm này"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)
+):
+    """Change feed cho màn hình Bếp/Thu ngân: chỉ các đơn được tạo/sửa sau cursor"""
+    position = await order_feed.start_position(db, cursor, since)
+    orders, position = await order_feed.changes(db, position, limit)
+    return {"orders": orders, "cursor": order_feed.encode(position)}
+
+@router.post("/admin/orders/changes/stream-token", response_model=schemas.StreamToken)
+async def create_order_stream_token(current_user = Depends(security.get_current_admin)):
+    """Token ngắn hạn cho EventSource (không gửi được header Authorization), chỉ dùng được cho /stream"""
+    return {"access_token": security.create_stream_token(current_user.username), "expires_in": security.ORDER_STREAM_TOKEN_TTL}
+
+@router.get("/admin/orders/changes/stream")
+async def stream_order_changes(
+    request: Request,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db), current_user = Depends(security.get_stream_admin)
+):
+    """
+    Server-Sent Events của cùng change feed (trình duyệt tự gửi Last-Event-ID khi nối lại).
+    Xác thực: header Bearer, hoặc ?access_token= lấy từ POST /admin/orders/changes/stream-token
+    """
+    position = await order_feed.start_position(db, last_event_id or cursor, since)
+    return StreamingResponse(
+        order_feed.stream(db, position, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx không gom buffer
+    )
 
 @router.get("/admin/orders/{order_id}", response_model=schemas.OrderDetail)
 async def read_order_detail(order_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)):
@@ -53,18 +144,33 @@ async def read_order_detail(order_id: int, db: AsyncSession = Depends(get_db), c
 @router.put("/admin/orders/{order_id}/status", response_model=schemas.AdminOrderListResponse)
 async def update_status(order_id: int, status: models.OrderStatus, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_admin)):
     if status == models.OrderStatus.HOAN_TAT:
-        return await OrderService.complete_order(db, order_id)
+        order = await OrderService.complete_order(db, order_id)
     else:
-        return await crud.update_order_status(db, order_id, status)
+        order = await crud.update_order_status(db, order_id, status)
+    if order:
+        order_feed.publish_change()
+    return order
 
 # --- WEBSOCKET ---
+def closed_by_server(websocket: WebSocket) -> bool:
+    """
+    ConnectionManager._drop đã đóng socket (client quá chậm) => lỗi đọc/gửi sau đó là bình thường.
+    RuntimeError khác (event loop đã đóng, gửi sai trạng thái...) là bug thật, không được nuốt.
+    """
+    return websocket.application_state == WebSocketState.DISCONNECTED
+
 @router.websocket("/ws/admin/orders")
 async def websocket_admin(websocket: WebSocket):
     if manager:
         await manager.connect(websocket)
         try:
             while True: await websocket.receive_text()
-        except WebSocketDisconnect:
+        except (WebSocketDisconnect, WebSocketDisconnected):
+            pass
+        except RuntimeError:
+            if not closed_by_server(websocket):
+                raise
+        finally:
             manager.disconnect(websocket)
 
 @router.websocket("/ws/group/{group_id}")
@@ -72,8 +178,37 @@ async def websocket_group(websocket: WebSocket, group_id: str):
     if manager:
         await manager.connect_group(websocket, group_id)
         try:
+            # Người mới vào nhận ngay giỏ hiện tại, sau đó chỉ nhận delta
+            # (giỏ nằm trong CSDL: thành viên cùng nhóm có thể đang nối vào worker khác)
+            async with AsyncSessionLocal() as db:
+                snapshot = (await group_carts.get(db, group_id)).snapshot()
+            await manager.send_to(websocket, snapshot)
             while True:
                 data = await websocket.receive_json()
-                await manager.broadcast_group(group_id, data, sender_socket=websocket)
-        except WebSocketDisconnect:
-            manager.disconnect_group(websocket, group_id)
\ No newline at end of file
+                if not isinstance(data, dict):
+                    continue
+                if "op" in data:
+                    # Thao tác giỏ: server áp dụng rồi phát delta cho cả nhóm (kể cả người gửi = xác nhận)
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            delta = await group_carts.apply(db, group_id, data)
+                    except GroupCartError as e:
+                        await manager.send_to(websocket, {"type": "cart_error", "error": str(e), "version": e.version})
+                        continue
+                    await manager.broadcast_group(group_id, delta)
+                elif data.get("type") == "sync":
+                    # Client kết nối lại / thấy version nhảy cóc: chỉ gửi phần delta còn thiếu (hoặc snapshot nếu quá cũ)
+                    async with AsyncSessionLocal() as db:
+                        messages = await group_carts.sync_since(db, group_id, data.get("version"))
+                    for message in messages:
+                        await manager.send_to(websocket, message)
+                else:
+                    # Tin khác (chat, "đang chọn món"...) vẫn chuyển tiếp như cũ
+                    await manager.broadcast_group(group_id, data, sender_socket=websocket)
+        except (WebSocketDisconnect, WebSocketDisconnected):
+            pass
+        except RuntimeError:
+            if not closed_by_server(websocket):
+                raise
+        finally:
+            manager.disconnect_group(websocket, group_id)
@@ -1,13 +1,27 @@
 # Tệp: app/routers/public_menu.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from app.crud import crud
+from typing import List, Optional
 from app.schemas import schemas
 from app.dependencies import get_db # <--- QUAN TRỌNG
+from app.services.menu_cache import menu_cache, etag_matches
 
 router = APIRouter()
 
+MENU_CACHE_CONTROL = "no-cache"  # Luôn hỏi lại server, nhưng dùng ETag để nhận 304
+
 @router.get("/menu", response_model=List[schemas.PublicCategory])
-async def get_full_menu(db: AsyncSession = Depends(get_db)):
-    return await crud.get_public_menu(db)
\ No newline at end of file
+async def get_full_menu(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    # Trả thẳng bytes đã encode/nén sẵn: bỏ qua Pydantic, JSON encode và nén theo từng request
+    snapshot = await menu_cache.get(db)
+    encoding, body, etag = snapshot.select(accept_encoding)
+    headers = {"ETag": etag, "Cache-Control": MENU_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, snapshot.etags.values()):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,6 +1,6 @@
 # Tệp: schemas.py (CẬP NHẬT TÍCH ĐIỂM)
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 from app.models import models 
 from datetime import datetime, date
 from decimal import Decimal
@@ -13,11 +13,18 @@ class AdminCreate(AdminBase):
 class Admin(AdminBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
+class AdminPasswordChange(BaseModel):
+    current_password: str
+    new_password: str = Field(..., min_length=6)
 class Token(BaseModel):
     access_token: str
     token_type: str
 class TokenData(BaseModel):
     username: Optional[str] = None
+class StreamToken(BaseModel):
+    # Token ngắn hạn cho EventSource: ?access_token=... (giây hết hạn trong expires_in)
+    access_token: str
+    expires_in: int
 
 # --- Option & Product ---
 class OptionValueBase(BaseModel):
@@ -72,6 +79,10 @@ class ProductUpdate(BaseModel):
     is_out_of_stock: Optional[bool] = None
 class ProductLinkOptionsRequest(BaseModel):
     option_ids: List[int]
+class UploadedImage(BaseModel):
+    image_url: str  # Bản "card" (WebP) dùng cho Menu
+    variants: Dict[str, Dict[str, str]] = {}  # {"thumb"|"card"|"full": {"webp": url, "jpeg": url}}
+    deduplicated: bool = False  # Ảnh này đã có sẵn (cùng nội dung) => dùng lại file cũ
 class CategoryBase(BaseModel):
     name: str
     display_order: Optional[int] = 0
@@ -166,6 +177,8 @@ class OrderCreate(OrderCalculateRequest):
     payment_method: models.PaymentMethod
     table_id: Optional[int] = None
     user_id: Optional[int] = None 
+    # Đơn nhóm: món gửi lên phải khớp với giỏ nhóm server đang giữ
+    group_id: Optional[str] = None
 
 class PublicOrderResponse(BaseModel):
     id: int
@@ -224,6 +237,16 @@ class AdminOrderListResponse(BaseModel):
     table_id: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
+class AdminOrderSummary(AdminOrderListResponse):
+    # Dòng trên bảng đơn: không kèm chi tiết món (xem chi tiết qua /admin/orders/{id})
+    delivery_method_selected: models.DeliveryMethod
+    item_count: int = 0
+
+class OrderChangeFeed(BaseModel):
+    orders: List[OrderDetail]
+    # Gửi lại ở lần gọi sau (kể cả khi không có thay đổi)
+    cursor: str
+
 # --- Table & Customer ---
 class TableBase(BaseModel):
     name: str
@@ -0,0 +1,126 @@
+# Tệp: app/scripts/bootstrap.py
+# Mục đích: Khởi động container trong 1 interpreter duy nhất (thay cho entrypoint.sh cũ gồm
+# wait_for_db.py + alembic + create_admin.py + seed.py, mỗi bước 1 process Python import lại app).
+#   1. Chờ CSDL (backoff luỹ thừa: 0.1s, 0.2s, 0.4s... thay vì cố định 2s)
+#   2. Alembic upgrade head      ┐
+#   3. Tài khoản admin           ├ dùng chung 1 kết nối DB
+#   4. Dữ liệu mẫu + bảo trì     ┘
+#   5. Chạy uvicorn ngay trong event loop này (kết nối vừa dùng trả về pool, dùng lại luôn)
+#
+#   python app/scripts/bootstrap.py --host 0.0.0.0 --port 8000
+#   python app/scripts/bootstrap.py --no-serve     # chỉ chuẩn bị DB (vd. job migrate riêng)
+import argparse
+import asyncio
+import os
+import sys
+
+# Thêm đường dẫn gốc để Python tìm thấy module 'app'
+sys.path.append(os.getcwd())
+
+# app.main chỉ được import khi chạy server (xem main()) => tự nạp .env trước khi tạo engine
+from dotenv import load_dotenv
+load_dotenv()
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.startup import StartupTimer, startup_timer
+from app.crud import crud
+from app.models.models import engine
+from app.scripts.create_admin import ensure_super_admin
+from app.scripts.seed import seed_catalog
+
+BOOTSTRAP_DB_TIMEOUT = float(os.getenv("BOOTSTRAP_DB_TIMEOUT", "60"))      # giây chờ CSDL tối đa
+BOOTSTRAP_DB_MAX_DELAY = float(os.getenv("BOOTSTRAP_DB_MAX_DELAY", "2"))   # giây, trần của backoff
+BOOTSTRAP_SEED = os.getenv("BOOTSTRAP_SEED", "1") == "1"
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+
+async def wait_for_db(
+    bind: AsyncEngine = engine,
+    timeout: float = BOOTSTRAP_DB_TIMEOUT,
+    first_delay: float = 0.1,
+    max_delay: float = BOOTSTRAP_DB_MAX_DELAY,
+) -> AsyncConnection:
+    """Thử kết nối tới khi được (chờ tăng dần). Trả về kết nối để các bước sau dùng tiếp"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = first_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        connection = None
+        try:
+            connection = await bind.connect()
+            await connection.execute(text("SELECT 1"))
+            await connection.commit()
+            return connection
+        except (OSError, asyncio.TimeoutError, exc.DBAPIError) as e:
+            if connection is not None:
+                await connection.close()
+            if loop.time() + delay > deadline:
+                print(f"❌ Không thể kết nối CSDL sau {attempt} lần thử ({timeout:.0f}s): {e}")
+                raise
+            print(f"⏳ CSDL chưa sẵn sàng (lần {attempt}), thử lại sau {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def _upgrade(sync_connection):
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = sync_connection
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+async def prepare_database(seed: bool = BOOTSTRAP_SEED) -> StartupTimer:
+    timer = StartupTimer()
+    with timer.phase("wait_for_db"):
+        connection = await wait_for_db()
+    try:
+        with timer.phase("migrate"):
+            await connection.run_sync(_upgrade)
+            await connection.commit()
+        db = AsyncSession(bind=connection, expire_on_commit=False, autoflush=False)
+        try:
+            with timer.phase("admin"):
+                await ensure_super_admin(db)
+            if seed:
+                with timer.phase("seed"):
+                    await seed_catalog(db)
+            with timer.phase("maintenance"):
+                fixed = await crud.fix_product_display_order(db)
+                if fixed:
+                    print(f"✅ Đã đánh số lại thứ tự hiển thị cho {fixed} sản phẩm")
+        finally:
+            await db.close()
+    finally:
+        # Trả kết nối về pool => uvicorn dùng lại ngay khi mở sẵn pool
+        await connection.close()
+    timer.report("Chuẩn bị CSDL")
+    return timer
+
+
+async def main(args):
+    await prepare_database(seed=BOOTSTRAP_SEED and not args.no_seed)
+    if args.no_serve:
+        await engine.dispose()
+        return
+    # Import app SAU khi chuẩn bị CSDL và đo lại từ đầu => cold start của API (/metrics, cảnh báo 🐢)
+    # không cộng cả thời gian chờ DB/migrate/seed (đã báo riêng ở trên)
+    startup_timer.restart()
+    from app.main import app
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, proxy_headers=True))
+    await server.serve()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chuẩn bị CSDL rồi chạy API trong cùng 1 process")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-serve", action="store_true", help="Chỉ chuẩn bị CSDL, không chạy server")
+    parser.add_argument("--no-seed", action="store_true", help="Bỏ qua dữ liệu mẫu")
+    asyncio.run(main(parser.parse_args()))
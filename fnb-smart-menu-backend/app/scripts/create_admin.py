@@ -7,35 +7,41 @@ import sys
 sys.path.append(os.getcwd())
 
 from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.models import AsyncSessionLocal, Admin
 from app.core.security import get_password_hash
 
-async def create_super_admin():
+async def ensure_super_admin(db: AsyncSession):
+    # Dùng session có sẵn => app/scripts/bootstrap.py chạy chung 1 kết nối với các bước khác
     print("👤 Đang kiểm tra tài khoản Admin...")
+    try:
+        username = "admin"
+        password = "123"
+
+        # Kiểm tra tồn tại (Async syntax)
+        stmt = select(Admin).where(Admin.username == username)
+        result = await db.execute(stmt)
+        existing_admin = result.scalars().first()
+
+        if existing_admin:
+            print(f"⚠️ Tài khoản '{username}' đã tồn tại! Bỏ qua.")
+            return
+
+        print(f"🚀 Đang tạo tài khoản Admin mới: {username}...")
+        hashed_pw = get_password_hash(password)
+        new_admin = Admin(username=username, hashed_password=hashed_pw)
+
+        db.add(new_admin)
+        await db.commit()
+        print(f"✅ Tạo thành công! Đăng nhập bằng: {username} / {password}")
+
+    except Exception as e:
+        await db.rollback()
+        print(f"❌ Lỗi tạo admin: {e}")
+
+async def create_super_admin():
     async with AsyncSessionLocal() as db:
-        try:
-            username = "admin"
-            password = "123"
-
-            # Kiểm tra tồn tại (Async syntax)
-            stmt = select(Admin).where(Admin.username == username)
-            result = await db.execute(stmt)
-            existing_admin = result.scalars().first()
-            
-            if existing_admin:
-                print(f"⚠️ Tài khoản '{username}' đã tồn tại! Bỏ qua.")
-                return
-
-            print(f"🚀 Đang tạo tài khoản Admin mới: {username}...")
-            hashed_pw = get_password_hash(password)
-            new_admin = Admin(username=username, hashed_password=hashed_pw)
-            
-            db.add(new_admin)
-            await db.commit()
-            print(f"✅ Tạo thành công! Đăng nhập bằng: {username} / {password}")
-
-        except Exception as e:
-            print(f"❌ Lỗi tạo admin: {e}")
+        await ensure_super_admin(db)
 
 if __name__ == "__main__":
     # Chạy event loop
@@ -0,0 +1,45 @@
+# Tệp: app/scripts/gc_images.py
+# Mục đích: Xóa ảnh trong uploads/ không còn món / danh mục nào dùng
+# (ảnh cũ sau khi đổi ảnh món, món đã xóa, upload bỏ dở...).
+#   python app/scripts/gc_images.py --dry-run      # chỉ liệt kê
+#   python app/scripts/gc_images.py                # xóa thật
+#   python app/scripts/gc_images.py --min-age-hours 1
+import argparse
+import asyncio
+import os
+import sys
+
+# Thêm đường dẫn gốc để Python tìm thấy module 'app'
+sys.path.append(os.getcwd())
+
+from app.crud import crud
+from app.models.models import AsyncSessionLocal, engine
+from app.services.images import image_processor, IMAGE_GC_MIN_AGE
+
+
+async def gc_images(dry_run: bool = False, min_age: float = IMAGE_GC_MIN_AGE) -> dict:
+    async with AsyncSessionLocal() as db:
+        referenced = await crud.get_image_urls(db)
+    result = await asyncio.to_thread(image_processor.collect_garbage, referenced, min_age, dry_run)
+
+    action = "Sẽ xóa" if dry_run else "Đã xóa"
+    for name in result["removed"]:
+        print(f"  🗑️ {name}")
+    print(f"✅ {action} {len(result['removed'])} file ({result['freed_bytes'] / 1024 / 1024:.1f} MB), "
+          f"giữ lại {result['kept']} file")
+    return result
+
+
+async def main(args):
+    try:
+        await gc_images(args.dry_run, args.min_age_hours * 3600)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dọn ảnh không còn được tham chiếu")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê, không xóa")
+    parser.add_argument("--min-age-hours", type=float, default=IMAGE_GC_MIN_AGE / 3600,
+                        help="Không xóa file mới hơn mốc này (ảnh vừa upload, chưa lưu vào món)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,59 @@
+# Tệp: app/scripts/maintenance.py
+# Mục đích: Các việc bảo trì DB trước đây chạy trong MỖI lần khởi động worker (main.on_startup).
+# Chạy 1 lần khi deploy (hoặc khi cần), không chạy trong web process nữa:
+#   python app/scripts/maintenance.py                     # sửa dữ liệu (fix-display-order)
+#   python app/scripts/maintenance.py create-tables fix-display-order   # DB dev không dùng Alembic
+import argparse
+import asyncio
+import os
+import sys
+
+# Thêm đường dẫn gốc để Python tìm thấy module 'app'
+sys.path.append(os.getcwd())
+
+from app.core.startup import StartupTimer
+from app.crud import crud
+from app.models.models import AsyncSessionLocal, create_tables, engine
+
+
+async def fix_display_order():
+    async with AsyncSessionLocal() as db:
+        fixed = await crud.fix_product_display_order(db)
+    if fixed:
+        print(f"✅ Đã đánh số lại thứ tự hiển thị cho {fixed} sản phẩm")
+    else:
+        print("✅ Thứ tự hiển thị sản phẩm đã đầy đủ")
+
+
+TASKS = {
+    "create-tables": create_tables,
+    "fix-display-order": fix_display_order,
+}
+# Production tạo bảng bằng Alembic => mặc định không chạy create-tables
+DEFAULT_TASKS = ["fix-display-order"]
+
+
+async def run_maintenance(tasks=None, timer: StartupTimer = None):
+    timer = timer or StartupTimer()
+    for name in tasks or TASKS:
+        with timer.phase(name):
+            await TASKS[name]()
+    return timer
+
+
+async def main(tasks):
+    try:
+        timer = await run_maintenance(tasks)
+        timer.report("Bảo trì")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bảo trì CSDL (không chạy lúc khởi động app)")
+    parser.add_argument("tasks", nargs="*", help=f"{', '.join(TASKS)} (mặc định: {', '.join(DEFAULT_TASKS)})")
+    tasks = parser.parse_args().tasks
+    unknown = [name for name in tasks if name not in TASKS]
+    if unknown:
+        parser.error(f"Không có việc bảo trì: {', '.join(unknown)}")
+    asyncio.run(main(tasks or DEFAULT_TASKS))
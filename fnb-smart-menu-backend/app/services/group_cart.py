@@ -0,0 +1,268 @@
+# Tệp: app/services/group_cart.py
+# Mục đích: Giỏ hàng nhóm do SERVER giữ (thay vì client tự giữ cả giỏ và gửi đi gửi lại).
+# - Client chỉ gửi thao tác nhỏ: add / remove / update_qty / clear
+# - Server áp dụng, tăng version và phát "delta" (chỉ thao tác vừa xảy ra) cho cả nhóm
+# - Người vào sau nhận 1 snapshot, rồi các delta tiếp theo; mất kết nối ngắn thì xin lại delta từ version cũ
+# - Khi đặt đơn nhóm, danh sách món gửi lên được đối chiếu với giỏ của server
+# Giỏ được lưu trong bảng group_carts (không nằm trong bộ nhớ worker): thành viên của 1 nhóm
+# nối vào các worker khác nhau, POST /orders rơi vào worker bất kỳ vẫn thấy cùng 1 giỏ.
+# Mỗi thao tác khóa dòng của nhóm (SELECT ... FOR UPDATE) => version / line_id tăng tuần tự,
+# delta được phát cho thành viên ở worker khác qua event bus (ConnectionManager.broadcast_group).
+
+import os
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import crud
+
+GROUP_CART_MAX_LINES = int(os.getenv("GROUP_CART_MAX_LINES", "200"))    # số dòng món tối đa / nhóm
+GROUP_CART_MAX_QUANTITY = int(os.getenv("GROUP_CART_MAX_QUANTITY", "99"))
+GROUP_CART_HISTORY = int(os.getenv("GROUP_CART_HISTORY", "200"))        # số delta giữ lại để đồng bộ lại
+GROUP_CART_IDLE_TTL = float(os.getenv("GROUP_CART_IDLE_TTL", "7200"))   # giây không hoạt động thì xóa giỏ
+NOTE_MAX_LENGTH = 200
+
+
+class GroupCartError(ValueError):
+    """Thao tác không hợp lệ (client gửi sai) - báo lại cho đúng người gửi"""
+
+    # Version hiện tại của giỏ (GroupCartStore gắn vào) để client biết mình có đang lệch không
+    version: Optional[int] = None
+
+
+class CartLine(NamedTuple):
+    product_id: int
+    quantity: int
+    options: Tuple[int, ...]
+    note: Optional[str]
+    ordered_by: Optional[str]
+
+    def to_dict(self, line_id: int) -> dict:
+        return {
+            "line_id": line_id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "options": list(self.options),
+            "note": self.note,
+            "ordered_by": self.ordered_by,
+        }
+
+
+def _int(value, field: str) -> int:
+    # bool là int trong Python nhưng không phải giá trị hợp lệ ở đây
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise GroupCartError(f"'{field}' phải là số nguyên")
+    return value
+
+
+def _quantity(value) -> int:
+    quantity = _int(value, "quantity")
+    if quantity > GROUP_CART_MAX_QUANTITY:
+        raise GroupCartError(f"Số lượng tối đa là {GROUP_CART_MAX_QUANTITY}")
+    return quantity
+
+
+def _text(value, field: str) -> Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise GroupCartError(f"'{field}' phải là chuỗi")
+    return value[:NOTE_MAX_LENGTH]
+
+
+def _line_key(product_id: int, options: Iterable[int], note: Optional[str], ordered_by: Optional[str]):
+    return (product_id, tuple(sorted(options)), note or None, ordered_by or None)
+
+
+class GroupCart:
+    def __init__(self, group_id: str, history: int = GROUP_CART_HISTORY):
+        self.group_id = group_id
+        self.version = 0
+        # Key: line_id (server cấp), Value: CartLine
+        self.lines: Dict[int, CartLine] = {}
+        self._next_line_id = 1
+        # Các delta gần nhất (theo version tăng dần) để client kết nối lại chỉ cần xin phần thiếu
+        self._history: Deque[dict] = deque(maxlen=history)
+
+    # --- ÁP DỤNG THAO TÁC ---
+    def apply(self, command: dict) -> dict:
+        """Áp dụng 1 thao tác của client => trả về delta (đã gắn version mới) để phát cho cả nhóm"""
+        op = command.get("op")
+        if op == "add":
+            change = self._add(command)
+        elif op == "update_qty":
+            change = self._update_quantity(command)
+        elif op == "remove":
+            change = self._remove(command)
+        elif op == "clear":
+            self.lines.clear()
+            change = {"op": "clear"}
+        else:
+            raise GroupCartError(f"Thao tác không hỗ trợ: {op}")
+
+        self.version += 1
+        delta = {"type": "cart_delta", "version": self.version, **change}
+        self._history.append(delta)
+        return delta
+
+    def _add(self, command: dict) -> dict:
+        product_id = _int(command.get("product_id"), "product_id")
+        quantity = _quantity(command.get("quantity", 1))
+        if quantity < 1:
+            raise GroupCartError("Số lượng phải lớn hơn 0")
+        options = command.get("options") or []
+        if not isinstance(options, list):
+            raise GroupCartError("'options' phải là danh sách")
+        options = [_int(value_id, "options") for value_id in options]
+        note = _text(command.get("note"), "note")
+        ordered_by = _text(command.get("ordered_by"), "ordered_by")
+
+        # Cùng món + cùng topping + cùng ghi chú + cùng người gọi => gộp vào dòng cũ
+        key = _line_key(product_id, options, note, ordered_by)
+        for line_id, line in self.lines.items():
+            if _line_key(line.product_id, line.options, line.note, line.ordered_by) == key:
+                new_quantity = min(line.quantity + quantity, GROUP_CART_MAX_QUANTITY)
+                self.lines[line_id] = line._replace(quantity=new_quantity)
+                return {"op": "update_qty", "line_id": line_id, "quantity": new_quantity}
+
+        if len(self.lines) >= GROUP_CART_MAX_LINES:
+            raise GroupCartError("Giỏ hàng nhóm đã đầy")
+        line_id = self._next_line_id
+        self._next_line_id += 1
+        line = CartLine(product_id, quantity, tuple(sorted(options)), note, ordered_by)
+        self.lines[line_id] = line
+        return {"op": "add", "line": line.to_dict(line_id)}
+
+    def _line_id(self, command: dict) -> int:
+        line_id = _int(command.get("line_id"), "line_id")
+        if line_id not in self.lines:
+            raise GroupCartError(f"Không tìm thấy dòng món {line_id}")
+        return line_id
+
+    def _update_quantity(self, command: dict) -> dict:
+        line_id = self._line_id(command)
+        quantity = _quantity(command.get("quantity"))
+        if quantity <= 0:
+            del self.lines[line_id]
+            return {"op": "remove", "line_id": line_id}
+        self.lines[line_id] = self.lines[line_id]._replace(quantity=quantity)
+        return {"op": "update_qty", "line_id": line_id, "quantity": quantity}
+
+    def _remove(self, command: dict) -> dict:
+        line_id = self._line_id(command)
+        del self.lines[line_id]
+        return {"op": "remove", "line_id": line_id}
+
+    # --- LƯU / ĐỌC TỪ CSDL ---
+    @classmethod
+    def from_state(cls, state) -> "GroupCart":
+        """models.GroupCartState => GroupCart"""
+        cart = cls(state.group_id)
+        cart.version = state.version
+        cart._next_line_id = state.next_line_id
+        cart.lines = {
+            line["line_id"]: CartLine(
+                line["product_id"], line["quantity"], tuple(line["options"]), line["note"], line["ordered_by"]
+            )
+            for line in state.lines
+        }
+        cart._history.extend(state.history)
+        return cart
+
+    def save_to(self, state):
+        # Gán object mới (không sửa list tại chỗ) => SQLAlchemy nhận ra cột JSONB đã đổi
+        state.version = self.version
+        state.next_line_id = self._next_line_id
+        state.lines = [line.to_dict(line_id) for line_id, line in self.lines.items()]
+        state.history = list(self._history)
+
+    # --- ĐỒNG BỘ ---
+    def snapshot(self) -> dict:
+        return {
+            "type": "cart_snapshot",
+            "version": self.version,
+            "lines": [line.to_dict(line_id) for line_id, line in self.lines.items()],
+        }
+
+    def sync_since(self, version) -> List[dict]:
+        """
+        Client đang có giỏ ở `version` => trả về các delta còn thiếu.
+        Nếu không còn đủ lịch sử (hoặc version lạ) => trả về 1 snapshot đầy đủ.
+        """
+        if isinstance(version, int) and not isinstance(version, bool) and 0 <= version <= self.version:
+            if version == self.version:
+                return []
+            oldest = self._history[0]["version"] if self._history else self.version + 1
+            if version >= oldest - 1:
+                return [delta for delta in self._history if delta["version"] > version]
+        return [self.snapshot()]
+
+    # --- ĐỐI CHIẾU KHI ĐẶT ĐƠN ---
+    def matches(self, items: Iterable) -> bool:
+        """So sánh danh sách món gửi lên (schemas.OrderItemCreate) với giỏ hiện tại của server"""
+        def summarize(rows):
+            totals: Dict[tuple, int] = {}
+            for row in rows:
+                key = (row.product_id, tuple(sorted(row.options)))
+                totals[key] = totals.get(key, 0) + row.quantity
+            return totals
+
+        return summarize(items) == summarize(self.lines.values())
+
+
+class GroupCartStore:
+    """Đọc / sửa giỏ nhóm trong CSDL. Không giữ trạng thái trong worker => chạy bao nhiêu worker cũng được"""
+
+    def __init__(self, idle_ttl: float = GROUP_CART_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+
+    async def _ensure(self, db: AsyncSession, group_id: str):
+        if await crud.ensure_group_cart_state(db, group_id):
+            # Nhóm mới => tiện dọn luôn các nhóm bỏ dở (không ai thao tác quá TTL)
+            await crud.prune_group_cart_states(db, self.idle_ttl)
+
+    async def get(self, db: AsyncSession, group_id: str) -> GroupCart:
+        """Lấy giỏ của nhóm (tạo mới nếu chưa có)"""
+        await self._ensure(db, group_id)
+        state = await crud.get_group_cart_state(db, group_id)
+        await db.commit()
+        return GroupCart.from_state(state)
+
+    async def find(self, db: AsyncSession, group_id: str, for_update: bool = False) -> Optional[GroupCart]:
+        """
+        for_update=True: khóa giỏ tới hết giao dịch của người gọi
+        (đặt đơn: 2 lần bấm "Đặt" cùng lúc không tạo 2 đơn từ cùng 1 giỏ)
+        """
+        state = await crud.get_group_cart_state(db, group_id, for_update=for_update)
+        return GroupCart.from_state(state) if state is not None else None
+
+    async def apply(self, db: AsyncSession, group_id: str, command: dict) -> dict:
+        """Áp dụng thao tác dưới khóa dòng của nhóm rồi lưu => trả về delta để phát cho cả nhóm"""
+        await self._ensure(db, group_id)
+        state = await crud.get_group_cart_state(db, group_id, for_update=True)
+        cart = GroupCart.from_state(state)
+        try:
+            delta = cart.apply(command)
+        except GroupCartError as e:
+            # Giỏ trong CSDL chưa bị đổi (lỗi xảy ra trước save_to) => commit chỉ để nhả khóa
+            await db.commit()
+            e.version = cart.version
+            raise
+        cart.save_to(state)
+        await db.commit()
+        return delta
+
+    async def sync_since(self, db: AsyncSession, group_id: str, version) -> List[dict]:
+        return (await self.get(db, group_id)).sync_since(version)
+
+    async def discard(self, db: AsyncSession, group_id: str, commit: bool = True):
+        """Gọi khi nhóm đã đặt đơn thành công"""
+        await crud.delete_group_cart_state(db, group_id, commit=commit)
+
+    async def stats(self, db: AsyncSession) -> dict:
+        return await crud.get_group_cart_stats(db)
+
+
+# Tạo instance dùng chung
+group_carts = GroupCartStore()
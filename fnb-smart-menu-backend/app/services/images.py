@@ -0,0 +1,319 @@
+# Tệp: app/services/images.py
+# Mục đích: Xử lý ảnh upload (ảnh món, danh mục) mà không làm đứng event loop.
+# - Ghi file upload xuống đĩa theo từng khúc (chunk) trong thread, có giới hạn dung lượng
+# - Sinh các bản thu nhỏ (thumb / card / full) dạng WebP + JPEG trong process pool riêng
+#   (resize ảnh là việc nặng CPU, giữ GIL => thread không đủ)
+# - Menu chỉ tải bản "card" vài chục KB thay vì ảnh gốc vài MB chụp từ điện thoại
+# - Tên file = hash nội dung (content-addressed): cùng 1 ảnh upload 2 lần => dùng lại file cũ,
+#   URL không bao giờ đổi nội dung => cache "immutable" vĩnh viễn ở trình duyệt / nginx
+# - collect_garbage(): xóa file không còn món / danh mục nào dùng (app/scripts/gc_images.py)
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    # Lỗi do chính file ảnh (không đọc được, quá nhiều pixel...) => 400 cho client
+    INVALID_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, ValueError)
+except ImportError:
+    Image = None  # Không có Pillow => chỉ lưu ảnh gốc như trước
+    INVALID_IMAGE_ERRORS = (ValueError,)
+
+UPLOAD_DIRECTORY = "uploads"
+STATIC_PATH = "/static"
+
+IMAGE_UPLOAD_MAX_BYTES = int(float(os.getenv("IMAGE_UPLOAD_MAX_MB", "10")) * 1024 * 1024)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))  # chặn "bom giải nén"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(max(1, min(2, (os.cpu_count() or 1) - 1)))))
+IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", "8"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # phần header multipart bao quanh file
+
+# Tên bản => cạnh dài tối đa (px). Ảnh nhỏ hơn thì giữ nguyên kích thước (không phóng to)
+IMAGE_VARIANTS = {"thumb": 160, "card": 480, "full": 1280}
+# Bản dùng làm image_url mặc định của món (ảnh trên thẻ món ở Menu)
+DEFAULT_VARIANT = "card"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "gif", "bmp"}
+
+# Đổi cấu hình bản thu nhỏ => đổi key => file & URL mới (không đụng file cũ đang được cache immutable)
+VARIANT_FINGERPRINT = hashlib.sha256(
+    repr((sorted(IMAGE_VARIANTS.items()), WEBP_QUALITY, JPEG_QUALITY)).encode()
+).digest()
+CONTENT_KEY_LENGTH = 32  # ký tự hex (128 bit)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# File chưa được món/danh mục nào dùng nhưng mới hơn mốc này thì GC giữ lại
+# (admin vừa upload ảnh nhưng chưa bấm Lưu món)
+IMAGE_GC_MIN_AGE = float(os.getenv("IMAGE_GC_MIN_AGE_HOURS", "24")) * 3600
+
+
+def image_key(file_name: str) -> str:
+    """'<key>-card.webp' => '<key>': mọi bản của cùng 1 ảnh có chung key"""
+    return file_name.split(".", 1)[0].rsplit("-", 1)[0]
+
+
+def _atomic_save(image, path: str, fmt: str, **options):
+    # Ghi ra file tạm rồi đổi tên => không ai đọc được file ghi dở (URL immutable không được sai)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        image.save(temp_path, fmt, **options)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _generate_variants(source_path: str, targets: Dict[str, Dict[str, str]], max_pixels: int):
+    """Chạy trong process con: đọc ảnh gốc, ghi các bản thu nhỏ vào targets = {tên bản: {định dạng: đường dẫn}}"""
+    with Image.open(source_path) as image:
+        if image.width * image.height > max_pixels:
+            raise ValueError(f"Ảnh quá lớn ({image.width}x{image.height})")
+        # JPEG: giải mã thẳng ở độ phân giải nhỏ hơn (nhanh hơn nhiều so với giải mã full rồi thu nhỏ)
+        largest = max(IMAGE_VARIANTS.values())
+        image.draft("RGB", (largest, largest))
+        # Ảnh điện thoại hay lưu hướng xoay trong EXIF
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        # Thu nhỏ dần từ bản lớn nhất => mỗi bước resize trên ảnh đã nhỏ hơn
+        for name, size in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            _atomic_save(image, targets[name]["webp"], "WEBP", quality=WEBP_QUALITY, method=4)
+            # JPEG không có nền trong suốt => ghép lên nền trắng
+            flat = image
+            if has_alpha:
+                flat = Image.new("RGB", image.size, (255, 255, 255))
+                flat.paste(image, mask=image.getchannel("A"))
+            _atomic_save(flat, targets[name]["jpeg"], "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+
+class ImageProcessor:
+    def __init__(self, directory: str = UPLOAD_DIRECTORY, max_bytes: int = IMAGE_UPLOAD_MAX_BYTES,
+                 workers: int = IMAGE_WORKERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(IMAGE_MAX_PENDING)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Tạo khi có upload đầu tiên => worker không tốn process nào nếu không ai upload.
+        # "spawn": process con sạch, không thừa hưởng event loop / kết nối DB của process cha
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        # Pool đã hỏng (process con bị OOM-kill / crash) không dùng lại được => lần sau tạo pool mới
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def url(self, file_name: str) -> str:
+        return f"{STATIC_PATH}/{file_name}"
+
+    def _variant_files(self, key: str) -> Dict[str, Dict[str, str]]:
+        return {name: {"webp": f"{key}-{name}.webp", "jpeg": f"{key}-{name}.jpg"} for name in IMAGE_VARIANTS}
+
+    def _reuse(self, file_names: Iterable[str]) -> bool:
+        """Đã có đủ file (ảnh trùng) => chỉ cập nhật mtime để GC không xóa nhầm, không ghi lại nội dung"""
+        paths = [os.path.join(self.directory, name) for name in file_names]
+        if not all(os.path.exists(path) for path in paths):
+            return False
+        for path in paths:
+            os.utime(path)
+        return True
+
+    def _remove(self, file_names: Iterable[str]):
+        # Dọn các bản đã kịp sinh ra trước khi lỗi
+        for name in file_names:
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def save_upload(self, file: UploadFile, path: str) -> Tuple[int, str]:
+        """
+        Ghi file upload xuống đĩa theo từng chunk (I/O đĩa + hash chạy trong thread), quá max_bytes => 413.
+        => (số byte, sha256 hex của nội dung)
+        """
+        size = 0
+        hasher = hashlib.sha256()
+        output = await asyncio.to_thread(open, path, "wb")
+
+        def write(chunk: bytes):
+            output.write(chunk)
+            hasher.update(chunk)
+
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Ảnh tối đa {self.max_bytes // (1024 * 1024)} MB")
+                await asyncio.to_thread(write, chunk)
+        except BaseException:
+            await asyncio.to_thread(output.close)
+            await asyncio.to_thread(os.remove, path)
+            raise
+        await asyncio.to_thread(output.close)
+        return size, hasher.hexdigest()
+
+    async def process_upload(self, file: UploadFile) -> dict:
+        extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            raise HTTPException(status_code=400, detail="Chỉ nhận file ảnh (jpg, png, webp...)")
+        # Tên tạm (chưa biết hash) - GC cũng dọn các file tạm bị bỏ dở
+        temp_path = os.path.join(self.directory, f"upload-{uuid.uuid4().hex}.{extension}.tmp")
+        _, digest = await self.save_upload(file, temp_path)
+
+        if Image is None:
+            file_name = f"{digest[:CONTENT_KEY_LENGTH]}.{extension}"
+            deduplicated = await asyncio.to_thread(self._reuse, [file_name])
+            if deduplicated:
+                await asyncio.to_thread(os.remove, temp_path)
+            else:
+                await asyncio.to_thread(os.replace, temp_path, os.path.join(self.directory, file_name))
+            return {"image_url": self.url(file_name), "variants": {}, "deduplicated": deduplicated}
+
+        # Key = hash(ảnh gốc + cấu hình bản thu nhỏ): cùng ảnh, cùng cấu hình => cùng file
+        key = hashlib.sha256(VARIANT_FINGERPRINT + bytes.fromhex(digest)).hexdigest()[:CONTENT_KEY_LENGTH]
+        variants = self._variant_files(key)
+        file_names = [name for files in variants.values() for name in files.values()]
+        try:
+            deduplicated = await asyncio.to_thread(self._reuse, file_names)
+            if not deduplicated:
+                targets = {
+                    name: {fmt: os.path.join(self.directory, file_name) for fmt, file_name in files.items()}
+                    for name, files in variants.items()
+                }
+                async with self._slots:
+                    loop = asyncio.get_running_loop()
+                    executor = self._get_executor()
+                    try:
+                        await loop.run_in_executor(executor, _generate_variants, temp_path, targets, IMAGE_MAX_PIXELS)
+                    except BrokenProcessPool:
+                        self._discard_executor(executor)
+                        raise
+        except INVALID_IMAGE_ERRORS as e:
+            print(f"⚠️ Ảnh upload không hợp lệ: {e}")
+            await asyncio.to_thread(self._remove, file_names)
+            raise HTTPException(status_code=400, detail="File không phải ảnh hợp lệ")
+        except BrokenProcessPool:
+            print("💥 Process xử lý ảnh bị dừng đột ngột (hết RAM?), tạo lại pool cho lần upload sau")
+            await asyncio.to_thread(self._remove, file_names)
+            raise HTTPException(status_code=503, detail="Không xử lý được ảnh lúc này, vui lòng thử lại")
+        except BaseException:
+            await asyncio.to_thread(self._remove, file_names)
+            raise
+        finally:
+            # Không phục vụ ảnh gốc nữa => xóa luôn
+            await asyncio.to_thread(os.remove, temp_path)
+
+        urls = {name: {fmt: self.url(file_name) for fmt, file_name in files.items()} for name, files in variants.items()}
+        return {"image_url": urls[DEFAULT_VARIANT]["webp"], "variants": urls, "deduplicated": deduplicated}
+
+    # --- DỌN FILE KHÔNG CÒN DÙNG ---
+    def collect_garbage(self, referenced_urls: Iterable[Optional[str]], min_age: float = IMAGE_GC_MIN_AGE,
+                        dry_run: bool = False) -> dict:
+        """
+        Xóa file trong thư mục upload không thuộc ảnh nào đang được tham chiếu.
+        Giữ mọi bản (thumb/card/full, WebP/JPEG) của ảnh được dùng, và file mới hơn min_age giây.
+        """
+        marker = f"{STATIC_PATH}/"
+        keep = {
+            image_key(url.split(marker, 1)[1].rsplit("/", 1)[-1])
+            for url in referenced_urls
+            if url and marker in url
+        }
+        now = time.time()
+        removed, freed, kept = [], 0, 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            stat = entry.stat()
+            if image_key(entry.name) in keep or now - stat.st_mtime < min_age:
+                kept += 1
+                continue
+            removed.append(entry.name)
+            freed += stat.st_size
+            if not dry_run:
+                os.remove(entry.path)
+        return {"removed": removed, "freed_bytes": freed, "kept": kept}
+
+
+class UploadLimitMiddleware:
+    """
+    Giới hạn dung lượng body của các route upload NGAY khi nhận từ client.
+    FastAPI đọc hết form (spool ra file tạm) trước khi chạy dependency / handler
+    => kiểm tra ở handler là quá muộn, và không chặn được upload chunked / Content-Length giả.
+    - Content-Length vượt giới hạn => trả 413 luôn, không đọc body
+    - Đếm byte từng message http.request => vượt giới hạn giữa chừng thì dừng đọc, trả 413
+    """
+
+    def __init__(self, app, paths: Iterable[str], processor: "ImageProcessor" = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.processor = processor
+
+    def _limit(self) -> int:
+        return (self.processor or image_processor).max_bytes + UPLOAD_FORM_OVERHEAD
+
+    def _too_large(self) -> HTTPException:
+        max_mb = (self.processor or image_processor).max_bytes // (1024 * 1024)
+        return HTTPException(status_code=413, detail=f"Ảnh tối đa {max_mb} MB")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit()
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            error = self._too_large()
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI để HTTPException từ lúc đọc body đi thẳng ra ngoài => client nhận 413
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """/static khi không có nginx phía trước: tên file theo nội dung => cho trình duyệt cache vĩnh viễn"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+# Tạo instance dùng chung
+image_processor = ImageProcessor()
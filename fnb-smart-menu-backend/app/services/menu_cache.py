@@ -0,0 +1,143 @@
+# Tệp: app/services/menu_cache.py
+# Mục đích: Cache "ảnh chụp" (snapshot) của Menu công khai theo phiên bản Catalog.
+# - Menu chỉ được build lại khi Admin sửa Catalog (bump version).
+# - Snapshot giữ sẵn JSON đã encode + bản nén gzip/brotli => request chỉ việc trả bytes.
+# - Mỗi bản có ETag mạnh (hash nội dung) để trả 304 cho điện thoại đã có bản mới nhất.
+
+import asyncio
+import gzip
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.event_bus import event_bus, CATALOG_CHANGED
+from app.crud import crud
+from app.schemas import schemas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_menu_adapter = TypeAdapter(List[schemas.PublicCategory])
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Thứ tự ưu tiên khi client chấp nhận nhiều kiểu nén
+PREFERRED_ENCODINGS = ("br", "gzip", "identity")
+
+
+class MenuSnapshot:
+    def __init__(self, version: int, bodies: Dict[str, bytes], digest: str):
+        self.version = version
+        # Key: content-encoding ("identity", "gzip", "br"), Value: body đã encode sẵn
+        self.bodies = bodies
+        # Mỗi bản nén là một "representation" khác nhau => ETag riêng
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in bodies
+        }
+
+    @property
+    def etag(self) -> str:
+        return self.etags["identity"]
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes, str]:
+        """Chọn bản phù hợp với Accept-Encoding => (encoding, body, etag)"""
+        encoding = negotiate_encoding(accept_encoding, self.bodies)
+        return encoding, self.bodies[encoding], self.etags[encoding]
+
+
+def _build_bodies(body: bytes) -> Dict[str, bytes]:
+    # Chạy trong thread riêng: nén brotli mức 11 tốn CPU, không được chặn event loop
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return bodies
+
+
+class MenuCache:
+    def __init__(self):
+        # Phiên bản Catalog hiện tại (tăng mỗi lần Admin ghi dữ liệu)
+        self.version = 0
+        self._snapshot: Optional[MenuSnapshot] = None
+        # Chỉ 1 request được build lại khi cache trống (tránh dồn query lúc cao điểm)
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Gọi sau mỗi thao tác ghi Catalog thành công"""
+        self.version += 1
+        self._snapshot = None
+
+    async def get(self, db: AsyncSession) -> MenuSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+
+        async with self._lock:
+            # Kiểm tra lại: có thể request khác vừa build xong trong lúc chờ lock
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self.version:
+                return snapshot
+
+            version = self.version
+            categories = _menu_adapter.validate_python(await crud.get_public_menu(db))
+            body = _menu_adapter.dump_json(categories)
+            bodies = await asyncio.to_thread(_build_bodies, body)
+            snapshot = MenuSnapshot(version, bodies, hashlib.sha256(body).hexdigest()[:32])
+
+            # Nếu Catalog bị sửa trong lúc đang build thì không lưu bản cũ
+            if version == self.version:
+                self._snapshot = snapshot
+            return snapshot
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Đọc Accept-Encoding (có q-value) và chọn kiểu nén tốt nhất đang có sẵn"""
+    if not accept_encoding:
+        return "identity"
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            weights[token] = q
+
+    best, best_q = "identity", 0.0
+    for encoding in PREFERRED_ENCODINGS:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0 if encoding != "identity" else 0.001))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(if_none_match: Optional[str], etags) -> bool:
+    """So khớp header If-None-Match (hỗ trợ danh sách, W/ và *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in etags:
+            return True
+    return False
+
+
+# Tạo instance dùng chung
+menu_cache = MenuCache()
+# Worker khác sửa Catalog => worker này cũng phải build lại
+event_bus.subscribe(CATALOG_CHANGED, lambda payload: menu_cache.invalidate())
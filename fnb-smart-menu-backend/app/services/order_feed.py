@@ -0,0 +1,116 @@
+# Tệp: app/services/order_feed.py
+# Mục đích: Change feed của đơn hàng cho màn hình Bếp / Thu ngân.
+# - Client giữ 1 cursor (updated_at, id) và chỉ nhận các đơn được tạo/sửa sau cursor đó
+# - Bản SSE: server tự đẩy thay đổi, được đánh thức ngay khi có đơn mới/đổi trạng thái
+#   (qua event bus => cả khi thay đổi xảy ra ở worker khác), poll DB định kỳ làm lưới an toàn
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.event_bus import event_bus, ORDERS_CHANGED
+from app.core.pagination import encode_cursor, decode_cursor
+from app.crud import crud
+from app.schemas import schemas
+
+ORDER_FEED_SAFETY_LAG = float(os.getenv("ORDER_FEED_SAFETY_LAG", "1"))      # giây
+ORDER_FEED_POLL_INTERVAL = float(os.getenv("ORDER_FEED_POLL_INTERVAL", "5"))  # giây, khi không có sự kiện
+ORDER_FEED_HEARTBEAT = float(os.getenv("ORDER_FEED_HEARTBEAT", "15"))        # giây, giữ kết nối qua proxy
+ORDER_FEED_PAGE_SIZE = 100
+
+Position = Tuple[datetime, int]
+
+
+class OrderFeed:
+    def __init__(self, safety_lag: float = ORDER_FEED_SAFETY_LAG, poll_interval: float = ORDER_FEED_POLL_INTERVAL):
+        self.safety_lag = safety_lag
+        self.poll_interval = poll_interval
+        # Mỗi luồng SSE đang mở chờ trên 1 Event riêng
+        self._waiters: Set[asyncio.Event] = set()
+
+    # --- CURSOR ---
+    @staticmethod
+    def encode(position: Position) -> str:
+        return encode_cursor({"t": position[0].isoformat(), "id": position[1]})
+
+    @staticmethod
+    def decode(cursor: str) -> Position:
+        data = decode_cursor(cursor)
+        try:
+            return datetime.fromisoformat(data["t"]), int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+
+    async def start_position(self, db: AsyncSession, cursor: Optional[str], since: Optional[datetime]) -> Position:
+        if cursor:
+            return self.decode(cursor)
+        if since is not None:
+            return since, 0
+        # Không có cursor => bắt đầu từ "bây giờ" (màn hình đã tải danh sách đơn trước đó)
+        return await crud.get_db_time(db) - timedelta(seconds=self.safety_lag), 0
+
+    # --- ĐỌC THAY ĐỔI ---
+    async def changes(self, db: AsyncSession, position: Position, limit: int = ORDER_FEED_PAGE_SIZE):
+        """=> (danh sách đơn đã thay đổi, vị trí mới)"""
+        orders = await crud.get_order_changes(db, position[0], position[1], limit, self.safety_lag)
+        if orders:
+            position = (orders[-1].updated_at, orders[-1].id)
+        return orders, position
+
+    # --- ĐÁNH THỨC ---
+    def notify(self):
+        for waiter in self._waiters:
+            waiter.set()
+
+    def publish_change(self):
+        """Gọi sau khi tạo/sửa đơn: đánh thức SSE ở worker này và báo các worker khác"""
+        self.notify()
+        event_bus.publish_nowait(ORDERS_CHANGED, {})
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        position: Position,
+        is_disconnected: Callable[[], Awaitable[bool]],
+        heartbeat: float = ORDER_FEED_HEARTBEAT,
+    ) -> AsyncIterator[str]:
+        """Luồng Server-Sent Events: mỗi event = 1 lô đơn thay đổi, id = cursor để client nối lại"""
+        waiter = asyncio.Event()
+        self._waiters.add(waiter)
+        loop = asyncio.get_running_loop()
+        last_sent = loop.time()
+        try:
+            yield "retry: 3000\n\n"
+            while not await is_disconnected():
+                orders, position = await self.changes(db, position)
+                # Kết thúc giao dịch đọc => trả kết nối về pool trong lúc chờ
+                await db.commit()
+                if orders:
+                    data = [schemas.OrderDetail.model_validate(order).model_dump(mode="json") for order in orders]
+                    yield f"id: {self.encode(position)}\nevent: orders\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                    last_sent = loop.time()
+                    if len(orders) == ORDER_FEED_PAGE_SIZE:
+                        continue  # Còn tồn => đọc tiếp ngay
+                elif loop.time() - last_sent >= heartbeat:
+                    yield ": ping\n\n"
+                    last_sent = loop.time()
+
+                try:
+                    await asyncio.wait_for(waiter.wait(), min(self.poll_interval, heartbeat))
+                    waiter.clear()
+                    # Thay đổi vừa commit còn nằm trong khoảng an toàn => đợi hết rồi mới đọc
+                    await asyncio.sleep(self.safety_lag)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.discard(waiter)
+
+
+# Tạo instance dùng chung
+order_feed = OrderFeed()
+event_bus.subscribe(ORDERS_CHANGED, lambda payload: order_feed.notify())
@@ -1,4 +1,5 @@
 # Tệp: app/services/order_service.py (LOGIC NGHIỆP VỤ)
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
@@ -6,6 +7,9 @@ from datetime import datetime
 from app.crud import crud
 from app.schemas import schemas
 from app.models import models
+from app.services.price_index import price_index
+from app.services.voucher_cache import voucher_cache
+from app.services.group_cart import group_carts
 
 # Các hằng số Business Logic
 POINT_CONVERSION_RATE = 500  # 1 điểm = 500đ
@@ -21,25 +25,31 @@ class OrderService:
         order_items_prepared = [] # Lưu lại để dùng khi tạo đơn, đỡ query lại
 
         # A. Tính tiền món + Topping
+        # Lấy giá gốc từ DB (Không tin tưởng giá từ Frontend)
+        # Gom toàn bộ ID của cả giỏ và tra trong bảng giá bộ nhớ (chỉ hỏi DB khi ID chưa có)
+        product_ids = {item.product_id for item in order_data.items}
+        value_ids = {value_id for item in order_data.items for value_id in item.options}
+        products, option_values = await price_index.lookup(db, product_ids, value_ids)
+
         for item in order_data.items:
-            # Lấy giá gốc từ DB (Không tin tưởng giá từ Frontend)
-            product = await crud.get_product(db, item.product_id)
+            product = products.get(item.product_id)
             if not product: continue
             
-            unit_price = float(product.base_price)
+            unit_price = product.base_price
             selected_options = []
 
-            if item.options:
-                # Lấy giá topping từ DB
-                option_values = await crud.get_option_values_by_ids(db, item.options)
-                for val in option_values:
-                    unit_price += float(val.price_adjustment)
-                    # Lưu lại thông tin option để sau này insert vào OrderItemOption
-                    selected_options.append({
-                        "value_name": val.name,
-                        "added_price": float(val.price_adjustment),
-                        "option_id": val.option_id # Cần query thêm tên option cha nếu muốn kỹ
-                    })
+            # dict.fromkeys: bỏ ID topping trùng (giống hành vi IN (...) cũ) nhưng giữ thứ tự
+            for value_id in dict.fromkeys(item.options):
+                val = option_values.get(value_id)
+                if not val: continue
+                unit_price += val.price_adjustment
+                # Lưu lại thông tin option để sau này insert vào OrderItemOption
+                selected_options.append({
+                    "option_name": val.option_name,
+                    "value_name": val.name,
+                    "added_price": val.price_adjustment,
+                    "option_id": val.option_id
+                })
             
             line_total = unit_price * item.quantity
             sub_total += line_total
@@ -52,7 +62,7 @@ class OrderService:
                 "final_price": line_total, # Giá tổng của line này (hoặc đơn giá tùy thiết kế)
                 "note": item.note,
                 "ordered_by": item.ordered_by,
-                "options_selected": selected_options # Tạm thời chưa có option_name, sẽ fix ở crud nếu cần
+                "options_selected": selected_options
             })
 
         # B. Tính Phí Ship
@@ -61,7 +71,7 @@ class OrderService:
         # C. Tính Voucher
         discount_amount = 0
         if order_data.voucher_code:
-            voucher = await crud.get_voucher_by_code(db, order_data.voucher_code)
+            voucher = await voucher_cache.get(db, order_data.voucher_code)
             if voucher:
                 if sub_total >= float(voucher.min_order_value):
                     if voucher.type == "fixed":
@@ -103,46 +113,63 @@ class OrderService:
     # 2. LOGIC TẠO ĐƠN (Orchestrator - Nhạc trưởng)
     @staticmethod
     async def place_order(db: AsyncSession, order_in: schemas.OrderCreate):
+        # Bước 0: Đơn nhóm => đối chiếu với giỏ nhóm của server (không tin giỏ do 1 client gửi).
+        # Khóa giỏ tới khi commit: giỏ không đổi giữa lúc đối chiếu và lúc tạo đơn, 2 lần "Đặt" chỉ ra 1 đơn
+        if order_in.group_id:
+            cart = await group_carts.find(db, order_in.group_id, for_update=True)
+            if cart is None:
+                raise HTTPException(status_code=404, detail="Không tìm thấy giỏ hàng nhóm")
+            if not cart.matches(order_in.items):
+                raise HTTPException(status_code=409, detail="Giỏ hàng nhóm đã thay đổi, vui lòng kiểm tra lại")
+
         # Bước 1: Tính toán lại tất cả (Security check)
         calc_result = await OrderService.calculate_total(db, order_in)
         
-        # Bước 2: Xử lý User (CRM)
-        user = None
-        if order_in.customer_phone:
-            user = await crud.get_user_by_phone(db, order_in.customer_phone)
-            if not user:
-                # Silent Registration (Tạo user ngầm)
-                user = await crud.create_user(db, {
-                    "full_name": order_in.customer_name,
-                    "phone": order_in.customer_phone,
-                    "role": models.UserRole.CUSTOMER,
-                    "points": 0
-                })
-        
-        # Bước 3: Trừ điểm (Nếu dùng)
-        if calc_result['points_discount'] > 0 and user:
-            points_used = int(calc_result['points_discount'] / POINT_CONVERSION_RATE)
-            await crud.update_user_points(db, user.id, -points_used)
+        # Bước 2 -> 6 chạy trong 1 giao dịch duy nhất: chỉ flush ở giữa, commit 1 lần cuối cùng
+        # => 1 lần fsync cho cả đơn, lỗi giữa chừng thì rollback toàn bộ (không có đơn thiếu món)
+        try:
+            # Bước 2: Xử lý User (CRM)
+            user = None
+            if order_in.customer_phone:
+                user = await crud.get_user_by_phone(db, order_in.customer_phone)
+                if not user:
+                    # Silent Registration (Tạo user ngầm) - an toàn khi 2 đơn cùng SĐT mới đến cùng lúc
+                    user = await crud.get_or_create_user_by_phone(db, {
+                        "full_name": order_in.customer_name,
+                        "phone": order_in.customer_phone,
+                        "role": models.UserRole.CUSTOMER,
+                        "points": 0
+                    })
+            
+            # Bước 3: Lưu Đơn Hàng (Gọi CRUD thuần)
+            db_order = await crud.create_order_record(db, order_in, calc_result, user.id if user else None, commit=False)
 
-        # Bước 4: Lưu Đơn Hàng (Gọi CRUD thuần)
-        db_order = await crud.create_order_record(db, order_in, calc_result, user.id if user else None)
-        
-        # Bước 5: Lưu Chi Tiết Món
-        # Lưu ý: Ta cần map lại option_name cho đúng (vì ở bước calculate mới chỉ có value)
-        # Để đơn giản, ta sẽ để crud tự xử lý hoặc làm ở đây.
-        # Ở đây ta dùng lại data đã prepare ở bước calculate cho nhanh
-        
-        # Cần một chút xử lý để lấy option_name chuẩn cho items_prepared
-        # (Để đơn giản hóa, ta giả định CRUD sẽ handle hoặc chấp nhận thiếu option_name tạm thời)
-        # Thực tế nên query tên Option cha ở đây.
-        
-        await crud.create_order_items(db, db_order.id, calc_result['items_prepared'])
-        
-        # Bước 6: Cập nhật trạng thái Bàn
-        if order_in.table_id:
-            await crud.update_table_status(db, order_in.table_id, models.TableStatus.CO_KHACH)
+            # Bước 4: Trừ điểm (Nếu dùng) - UPDATE nguyên tử, không bao giờ để điểm âm
+            if calc_result['points_discount'] > 0 and user:
+                points_used = int(calc_result['points_discount'] / POINT_CONVERSION_RATE)
+                balance = await crud.update_user_points(db, user.id, -points_used, order_id=db_order.id, commit=False)
+                if balance is None:
+                    # Điểm vừa bị dùng ở đơn khác (cùng SĐT) => hủy cả giao dịch
+                    raise HTTPException(status_code=409, detail="Điểm tích lũy không đủ, vui lòng tính lại đơn")
+            
+            # Bước 5: Lưu Chi Tiết Món (INSERT nhiều dòng)
+            # Dùng lại data đã prepare ở bước calculate (đã có sẵn option_name) cho nhanh
+            await crud.create_order_items(db, db_order.id, calc_result['items_prepared'], commit=False)
+            
+            # Bước 6: Cập nhật trạng thái Bàn
+            if order_in.table_id:
+                await crud.update_table_status(db, order_in.table_id, models.TableStatus.CO_KHACH, commit=False)
+
+            # Bước 7: Đóng giỏ nhóm (cùng giao dịch với đơn)
+            if order_in.group_id:
+                await group_carts.discard(db, order_in.group_id, commit=False)
+
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
             
-        # Bước 7 (Tương lai): Gửi Zalo/SMS ở đây
+        # Bước 8 (Tương lai): Gửi Zalo/SMS ở đây
         # await zalo_service.send_order_notification(...)
         
         return db_order
@@ -162,6 +189,6 @@ class OrderService:
         if order.user_id:
             points_earned = int(order.total_amount / EARN_RATE)
             if points_earned > 0:
-                await crud.update_user_points(db, order.user_id, points_earned, float(order.total_amount))
+                await crud.update_user_points(db, order.user_id, points_earned, float(order.total_amount), order_id=order.id)
                 
         return order
\ No newline at end of file
@@ -0,0 +1,130 @@
+# Tệp: app/services/price_index.py
+# Mục đích: Bảng giá trong bộ nhớ cho /orders/calculate (được gọi mỗi lần giỏ hàng thay đổi).
+# - Product ID -> giá gốc, tên, hết hàng
+# - OptionValue ID -> giá cộng thêm, option cha, tên, hết hàng
+# Index được build lại khi Catalog thay đổi; ID chưa có trong index thì hỏi DB rồi bổ sung.
+
+import asyncio
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.event_bus import event_bus, CATALOG_CHANGED
+from app.crud import crud
+
+
+class ProductPrice(NamedTuple):
+    id: int
+    name: str
+    base_price: float
+    is_out_of_stock: bool
+
+
+class OptionValuePrice(NamedTuple):
+    id: int
+    name: str
+    price_adjustment: float
+    option_id: int
+    option_name: str
+    is_out_of_stock: bool
+
+
+def _product_entry(row) -> ProductPrice:
+    return ProductPrice(row.id, row.name, float(row.base_price), bool(row.is_out_of_stock))
+
+
+def _value_entry(row) -> OptionValuePrice:
+    return OptionValuePrice(
+        row.id, row.name, float(row.price_adjustment or 0), row.option_id,
+        row.option_name or "Option", bool(row.is_out_of_stock),
+    )
+
+
+class PriceIndex:
+    def __init__(self):
+        # Phiên bản Catalog mà index cần theo kịp (tăng khi Admin sửa Catalog)
+        self.version = 0
+        self._built_version = None
+        self.products: Dict[int, ProductPrice] = {}
+        self.option_values: Dict[int, OptionValuePrice] = {}
+        # Bộ đếm để theo dõi hiệu quả
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Gọi sau mỗi thao tác ghi Catalog thành công"""
+        self.version += 1
+
+    async def _ensure_built(self, db: AsyncSession):
+        if self._built_version == self.version:
+            return
+        async with self._lock:
+            if self._built_version == self.version:
+                return
+            version = self.version
+            products = {row.id: _product_entry(row) for row in await crud.get_product_prices(db)}
+            values = {row.id: _value_entry(row) for row in await crud.get_option_value_prices(db)}
+            self.products, self.option_values = products, values
+            self.rebuilds += 1
+            # Catalog bị sửa trong lúc build => lần sau build lại
+            if version == self.version:
+                self._built_version = version
+
+    async def lookup(
+        self, db: AsyncSession, product_ids: Iterable[int], value_ids: Iterable[int]
+    ) -> Tuple[Dict[int, ProductPrice], Dict[int, OptionValuePrice]]:
+        """Trả về giá của các ID yêu cầu; ID không tìm thấy (đã xóa) sẽ không có trong kết quả"""
+        product_ids, value_ids = set(product_ids), set(value_ids)
+        if not product_ids and not value_ids:
+            return {}, {}
+        await self._ensure_built(db)
+
+        missing_products = [pid for pid in product_ids if pid not in self.products]
+        missing_values = [vid for vid in value_ids if vid not in self.option_values]
+        self.hits += len(product_ids) + len(value_ids) - len(missing_products) - len(missing_values)
+
+        # Fallback: ID mới (vd. tạo ngoài Admin API) => hỏi DB và vá vào index
+        if missing_products or missing_values:
+            self.misses += len(missing_products) + len(missing_values)
+            version = self.version
+            if missing_products:
+                rows = await crud.get_product_prices(db, missing_products)
+                found = {row.id: _product_entry(row) for row in rows}
+            else:
+                found = {}
+            if missing_values:
+                rows = await crud.get_option_value_prices(db, missing_values)
+                found_values = {row.id: _value_entry(row) for row in rows}
+            else:
+                found_values = {}
+            if version == self.version:
+                self.products.update(found)
+                self.option_values.update(found_values)
+            products = {pid: self.products.get(pid) or found.get(pid) for pid in product_ids}
+            values = {vid: self.option_values.get(vid) or found_values.get(vid) for vid in value_ids}
+        else:
+            products = {pid: self.products[pid] for pid in product_ids}
+            values = {vid: self.option_values[vid] for vid in value_ids}
+
+        return (
+            {k: v for k, v in products.items() if v is not None},
+            {k: v for k, v in values.items() if v is not None},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "built_version": self._built_version,
+            "products": len(self.products),
+            "option_values": len(self.option_values),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+        }
+
+
+# Tạo instance dùng chung
+price_index = PriceIndex()
+event_bus.subscribe(CATALOG_CHANGED, lambda payload: price_index.invalidate())
@@ -0,0 +1,94 @@
+# Tệp: app/services/voucher_cache.py
+# Mục đích: Cache voucher theo mã (TTL) cho /orders/calculate.
+# - Cache cả mã KHÔNG tồn tại / hết hiệu lực (negative cache): khách gõ sai mã cũng không chạm DB.
+# - Admin tạo/sửa/xóa voucher => xóa cache ngay (worker khác nhận tin qua event bus, TTL là lưới an toàn).
+
+import os
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.event_bus import event_bus, VOUCHERS_CHANGED
+from app.crud import crud
+
+VOUCHER_CACHE_TTL = float(os.getenv("VOUCHER_CACHE_TTL", "60"))          # giây
+VOUCHER_CACHE_MAX_SIZE = int(os.getenv("VOUCHER_CACHE_MAX_SIZE", "5000"))  # số mã tối đa
+
+
+class VoucherRule(NamedTuple):
+    # Chỉ giữ các trường cần cho tính tiền (không giữ object ORM đã tách khỏi session)
+    code: str
+    type: str
+    value: float
+    min_order_value: float
+    max_discount: Optional[float]
+
+
+class VoucherCache:
+    def __init__(self, ttl: float = VOUCHER_CACHE_TTL, max_size: int = VOUCHER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # Key: mã voucher, Value: (hạn dùng, VoucherRule hoặc None nếu mã không hợp lệ)
+        self._entries: Dict[str, Tuple[float, Optional[VoucherRule]]] = {}
+        # Tăng mỗi lần clear() => kết quả query bắt đầu trước lúc xóa cache không được lưu lại
+        self.version = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Gọi sau mỗi thao tác ghi voucher thành công"""
+        self.version += 1
+        self._entries.clear()
+
+    async def get(self, db: AsyncSession, code: str) -> Optional[VoucherRule]:
+        now = time.monotonic()
+        entry = self._entries.get(code)
+        if entry is not None and entry[0] > now:
+            rule = entry[1]
+            if rule is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return rule
+
+        self.misses += 1
+        version = self.version
+        voucher = await crud.get_voucher_by_code(db, code)
+        rule = None
+        if voucher:
+            rule = VoucherRule(
+                code=voucher.code,
+                type=voucher.type,
+                value=float(voucher.value),
+                min_order_value=float(voucher.min_order_value or 0),
+                max_discount=float(voucher.max_discount) if voucher.max_discount else None,
+            )
+
+        # Admin sửa voucher trong lúc đang query => dùng kết quả cho request này nhưng không cache
+        if version != self.version:
+            return rule
+        self._entries.pop(code, None)
+        if len(self._entries) >= self.max_size:
+            # Bỏ mã cũ nhất (dict giữ thứ tự thêm vào) để giới hạn bộ nhớ khi bị spam mã rác
+            self._entries.pop(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[code] = (now + self.ttl, rule)
+        return rule
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Tạo instance dùng chung
+voucher_cache = VoucherCache()
+event_bus.subscribe(VOUCHERS_CHANGED, lambda payload: voucher_cache.clear())
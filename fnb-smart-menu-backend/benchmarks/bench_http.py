@@ -0,0 +1,233 @@
+# Tệp: benchmarks/bench_http.py
+# Mục đích: Bộ benchmark HTTP cho các endpoint nóng, lưu baseline JSON và báo hồi quy (regression).
+# Kịch bản: menu, calculate, place_order, admin_orders, admin_summary, login
+# Mỗi kịch bản ghi: số request, lỗi, throughput (req/s), p50/p95/p99 (ms).
+#
+# Cách chạy (cần Postgres local, cấu hình giống app qua biến môi trường):
+#   python benchmarks/bench_http.py --concurrency 10 --save benchmarks/baseline.json
+#   python benchmarks/bench_http.py --concurrency 10 --compare benchmarks/baseline.json   # exit 1 nếu hồi quy
+#   python benchmarks/bench_http.py --scenarios menu calculate --requests 2000
+#   python benchmarks/bench_http.py --base-url http://localhost:8000   # đo server thật (uvicorn/gunicorn)
+# Dữ liệu mẫu (tiền tố "BENCH ") được tạo lúc đầu và xóa khi kết thúc.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import delete
+
+from app.main import app
+from app.crud import crud
+from app.schemas import schemas
+from app.models import models
+from app.models.models import AsyncSessionLocal
+
+BENCH_PREFIX = "BENCH "
+BENCH_ADMIN = "bench_admin"
+BENCH_PASSWORD = "bench_password"
+
+# Số request mặc định mỗi kịch bản (login chậm có chủ đích vì bcrypt => ít hơn)
+DEFAULT_REQUESTS = {
+    "menu": 1000,
+    "calculate": 1000,
+    "place_order": 300,
+    "admin_orders": 300,
+    "admin_summary": 500,
+    "login": 40,
+}
+# So với baseline: chậm hơn / ít hơn quá ngưỡng này => hồi quy
+DEFAULT_THRESHOLD = 0.20
+
+
+async def seed(lines: int = 3):
+    async with AsyncSessionLocal() as db:
+        opt = models.Option(name=f"{BENCH_PREFIX}Size", type=models.OptionType.CHON_1)
+        opt.values = [models.OptionValue(name=f"{BENCH_PREFIX}L", price_adjustment=5000)]
+        cat = models.Category(name=f"{BENCH_PREFIX}HTTP")
+        cat.products = [
+            models.Product(name=f"{BENCH_PREFIX}Món {i}", base_price=30000, options=[opt]) for i in range(lines)
+        ]
+        table = models.Table(name=f"{BENCH_PREFIX}Bàn")
+        db.add_all([opt, cat, table])
+        await db.commit()
+        if not await crud.get_admin_by_username(db, BENCH_ADMIN):
+            await crud.create_admin(db, schemas.AdminCreate(username=BENCH_ADMIN, password=BENCH_PASSWORD))
+        return [p.id for p in cat.products], opt.values[0].id, table.id
+
+
+async def cleanup():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.Order).where(models.Order.customer_name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.User).where(models.User.full_name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Category).where(models.Category.name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Option).where(models.Option.name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Table).where(models.Table.name.startswith(BENCH_PREFIX)))
+        await db.commit()
+        await crud.delete_admin(db, BENCH_ADMIN)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: AsyncClient, send: Callable, requests: int, concurrency: int) -> dict:
+    # Làm nóng (build menu cache, price index, pool kết nối) - không tính vào kết quả
+    for _ in range(min(5, requests)):
+        await send(client)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            res = await send(client)
+            latencies.append(time.perf_counter() - start)
+            if res.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def build_scenarios(product_ids: List[int], value_id: int, table_id: int, headers: dict) -> Dict[str, Callable]:
+    items = [{"product_id": pid, "quantity": 1, "options": [value_id]} for pid in product_ids]
+    counter = 0
+
+    def order_payload():
+        nonlocal counter
+        counter += 1
+        return {
+            "customer_name": f"{BENCH_PREFIX}Khách {counter}",
+            "customer_phone": f"bench-{os.getpid()}-{counter:08d}",
+            "customer_address": "Tại quán",
+            "delivery_method": "TAI_CHO",
+            "payment_method": "TIEN_MAT",
+            "table_id": table_id,
+            "items": items,
+        }
+
+    return {
+        "menu": lambda c: c.get("/menu", headers={"Accept-Encoding": "gzip"}),
+        "calculate": lambda c: c.post("/orders/calculate", json={"items": items, "delivery_method": "TAI_CHO"}),
+        "place_order": lambda c: c.post("/orders", json=order_payload()),
+        "admin_orders": lambda c: c.get("/admin/orders/", params={"limit": 50}, headers=headers),
+        "admin_summary": lambda c: c.get("/admin/orders/summary", params={"limit": 50}, headers=headers),
+        "login": lambda c: c.post("/admin/token", data={"username": BENCH_ADMIN, "password": BENCH_PASSWORD}),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """So sánh với baseline cũ => danh sách hồi quy (rỗng = ổn)"""
+    regressions = []
+    print(f"\nSo với baseline ({baseline.get('meta', {}).get('created_at', '?')}), ngưỡng {threshold:.0%}:")
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            print(f"  {name:<14} (chưa có trong baseline)")
+            continue
+        checks = [
+            ("p95_ms", current["p95_ms"], previous["p95_ms"], current["p95_ms"] > previous["p95_ms"] * (1 + threshold)),
+            ("p99_ms", current["p99_ms"], previous["p99_ms"], current["p99_ms"] > previous["p99_ms"] * (1 + threshold)),
+            ("throughput", current["throughput"], previous["throughput"],
+             current["throughput"] < previous["throughput"] * (1 - threshold)),
+        ]
+        parts = []
+        for metric, now_value, old_value, regressed in checks:
+            change = (now_value - old_value) / old_value if old_value else 0
+            parts.append(f"{metric} {old_value} -> {now_value} ({change:+.0%}){' ⚠️' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{name}.{metric}: {old_value} -> {now_value}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}.errors: {previous.get('errors', 0)} -> {current['errors']}")
+        print(f"  {name:<14} " + ", ".join(parts))
+    return regressions
+
+
+async def main(args):
+    product_ids, value_id, table_id = await seed()
+    try:
+        transport = None if args.base_url else ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url=args.base_url or "http://bench", timeout=60) as client:
+            login = await client.post("/admin/token", data={"username": BENCH_ADMIN, "password": BENCH_PASSWORD})
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            scenarios = build_scenarios(product_ids, value_id, table_id, headers)
+
+            results = {}
+            print(f"{'scenario':<14} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for name in args.scenarios:
+                requests = args.requests or DEFAULT_REQUESTS[name]
+                result = await run_scenario(client, scenarios[name], requests, args.concurrency)
+                results[name] = result
+                print(f"{name:<14} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>9} "
+                      f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+    finally:
+        await cleanup()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "concurrency": args.concurrency,
+            "target": args.base_url or "asgi",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Đã lưu baseline: {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("concurrency") != args.concurrency:
+            print("⚠️ Baseline đo với concurrency khác, so sánh chỉ mang tính tham khảo")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Hồi quy hiệu năng:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\n✅ Không có hồi quy")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTTP các endpoint nóng")
+    parser.add_argument("--scenarios", nargs="+", choices=list(DEFAULT_REQUESTS), default=list(DEFAULT_REQUESTS))
+    parser.add_argument("--requests", type=int, default=None, help="Số request mỗi kịch bản (mặc định theo từng kịch bản)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--base-url", default=None, help="Đo server đang chạy thay vì gọi thẳng ASGI app")
+    parser.add_argument("--save", default=None, help="Ghi kết quả ra file JSON (baseline)")
+    parser.add_argument("--compare", default=None, help="So với file baseline, exit 1 nếu hồi quy")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    asyncio.run(main(parser.parse_args()))
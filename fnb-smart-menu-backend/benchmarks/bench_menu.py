@@ -0,0 +1,120 @@
+# Tệp: benchmarks/bench_menu.py
+# Mục đích: Đo requests/giây của GET /menu trước và sau khi dùng snapshot nén sẵn.
+# - "legacy": đúng logic cũ (query selectinload + Pydantic + JSON encode mỗi request)
+# - "cached": endpoint hiện tại (trả bytes đã encode/nén sẵn theo phiên bản Catalog)
+#
+# Cách chạy (cần Postgres local, cấu hình giống app qua biến môi trường):
+#   python benchmarks/bench_menu.py --requests 2000 --concurrency 20
+# Dữ liệu mẫu (tiền tố "BENCH ") được tạo lúc đầu và xóa khi kết thúc.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import Depends
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.main import app
+from app.crud import crud
+from app.schemas import schemas
+from app.models import models
+from app.models.models import AsyncSessionLocal
+from app.dependencies import get_db
+from app.services.menu_cache import menu_cache
+
+BENCH_PREFIX = "BENCH "
+
+
+# Endpoint "trước khi tối ưu" để so sánh trên cùng một app
+@app.get("/__bench/menu-legacy", response_model=List[schemas.PublicCategory], include_in_schema=False)
+async def legacy_menu(db: AsyncSession = Depends(get_db)):
+    return await crud.get_public_menu(db)
+
+
+async def seed_catalog(categories: int, products: int, options: int):
+    async with AsyncSessionLocal() as db:
+        opts = []
+        for o in range(options):
+            opt = models.Option(name=f"{BENCH_PREFIX}Option {o}", type=models.OptionType.CHON_1, display_order=o)
+            opt.values = [
+                models.OptionValue(name=f"{BENCH_PREFIX}Value {o}.{v}", price_adjustment=v * 1000)
+                for v in range(4)
+            ]
+            opts.append(opt)
+        db.add_all(opts)
+        for c in range(categories):
+            cat = models.Category(name=f"{BENCH_PREFIX}Category {c}", display_order=c)
+            cat.products = [
+                models.Product(
+                    name=f"{BENCH_PREFIX}Product {c}.{p}", description="Mô tả sản phẩm dùng cho benchmark",
+                    base_price=25000 + p * 1000, image_url=f"/static/bench-{c}-{p}.jpg", display_order=p,
+                    options=opts,
+                )
+                for p in range(products)
+            ]
+            db.add(cat)
+        await db.commit()
+
+
+async def cleanup_catalog():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.Category).where(models.Category.name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Option).where(models.Option.name.startswith(BENCH_PREFIX)))
+        await db.commit()
+
+
+async def run(client: AsyncClient, path: str, headers: dict, total: int, concurrency: int) -> float:
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            res = await client.get(path, headers=headers)
+            assert res.status_code == 200, res.status_code
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    await seed_catalog(args.categories, args.products, args.options)
+    menu_cache.invalidate()
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            scenarios = [
+                ("legacy", "/__bench/menu-legacy", {"Accept-Encoding": "identity"}),
+                ("cached identity", "/menu", {"Accept-Encoding": "identity"}),
+                ("cached gzip", "/menu", {"Accept-Encoding": "gzip"}),
+                ("cached br", "/menu", {"Accept-Encoding": "br, gzip"}),
+            ]
+            size = len((await client.get("/menu", headers={"Accept-Encoding": "identity"})).content)
+            print(f"Menu: {args.categories} danh mục x {args.products} món, {args.options} option, {size} bytes JSON")
+            for name, path, headers in scenarios:
+                await run(client, path, headers, min(50, args.requests), args.concurrency)  # warm-up
+                rps = await run(client, path, headers, args.requests, args.concurrency)
+                print(f"{name:<16} {rps:>10.1f} req/s")
+    finally:
+        await cleanup_catalog()
+        menu_cache.invalidate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GET /menu")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--products", type=int, default=12)
+    parser.add_argument("--options", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+# Tệp: benchmarks/bench_orders.py
+# Mục đích: Đo số đơn/giây của POST /orders (tính tiền + tạo user + lưu đơn + chi tiết món).
+#
+# Cách chạy (cần Postgres local, cấu hình giống app qua biến môi trường):
+#   python benchmarks/bench_orders.py --orders 500 --concurrency 10 --lines 5
+# Dữ liệu mẫu (tiền tố "BENCH ") được tạo lúc đầu và xóa khi kết thúc.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import delete
+
+from app.main import app
+from app.models import models
+from app.models.models import AsyncSessionLocal
+
+BENCH_PREFIX = "BENCH "
+
+
+async def seed_catalog(lines: int):
+    async with AsyncSessionLocal() as db:
+        opt = models.Option(name=f"{BENCH_PREFIX}Size", type=models.OptionType.CHON_1)
+        opt.values = [models.OptionValue(name=f"{BENCH_PREFIX}L", price_adjustment=5000)]
+        cat = models.Category(name=f"{BENCH_PREFIX}Orders")
+        cat.products = [
+            models.Product(name=f"{BENCH_PREFIX}Món {i}", base_price=30000, options=[opt])
+            for i in range(lines)
+        ]
+        db.add_all([opt, cat])
+        await db.commit()
+        table = models.Table(name=f"{BENCH_PREFIX}Bàn")
+        db.add(table)
+        await db.commit()
+        return [p.id for p in cat.products], opt.values[0].id, table.id
+
+
+async def cleanup():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(models.Order).where(models.Order.customer_name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.User).where(models.User.full_name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Category).where(models.Category.name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Option).where(models.Option.name.startswith(BENCH_PREFIX)))
+        await db.execute(delete(models.Table).where(models.Table.name.startswith(BENCH_PREFIX)))
+        await db.commit()
+
+
+async def main(args):
+    product_ids, value_id, table_id = await seed_catalog(args.lines)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            counter = 0
+
+            def next_payload():
+                nonlocal counter
+                counter += 1
+                return {
+                    "customer_name": f"{BENCH_PREFIX}Khách {counter}",
+                    "customer_phone": f"bench-{counter:08d}",
+                    "customer_address": "Tại quán",
+                    "delivery_method": "TAI_CHO",
+                    "payment_method": "TIEN_MAT",
+                    "table_id": table_id,
+                    "items": [
+                        {"product_id": pid, "quantity": 1, "options": [value_id]} for pid in product_ids
+                    ],
+                }
+
+            remaining = args.orders
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    res = await client.post("/orders", json=next_payload())
+                    assert res.status_code == 201, res.text
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+            print(f"{args.orders} đơn x {args.lines} món, concurrency {args.concurrency}: "
+                  f"{args.orders / elapsed:.1f} đơn/giây ({elapsed * 1000 / args.orders:.1f} ms/đơn)")
+    finally:
+        await cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark POST /orders")
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+# Tệp: benchmarks/bench_ws_group.py
+# Mục đích: So sánh số frame WebSocket phải gửi khi cả nhóm cùng sửa giỏ, có và không gộp tin.
+# - "off"  : mỗi thay đổi = 1 frame tới từng thành viên khác => ~O(n²) frame mỗi đợt
+# - "tick" : gom tin theo nhóm, mỗi thành viên nhận tối đa 1 frame mỗi nhịp
+#
+# Cách chạy (không cần DB):
+#   python benchmarks/bench_ws_group.py --members 2 5 10 20 --edits 20 --interval-ms 10 --tick-ms 50
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from app.core.websocket import ConnectionManager
+
+
+class CountingWebSocket:
+    def __init__(self):
+        self.frames = 0
+        self.messages = 0
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.frames += 1
+        self.messages += len(message["messages"]) if message.get("type") == "batch" else 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(members: int, edits: int, interval: float, tick_ms: float, max_batch: int):
+    manager = ConnectionManager(send_queue_size=100000, group_batch_tick_ms=tick_ms, group_batch_max=max_batch)
+    sockets = [CountingWebSocket() for _ in range(members)]
+    for ws in sockets:
+        await manager.connect_group(ws, "BENCH")
+
+    async def member(ws, index):
+        for seq in range(edits):
+            await manager.broadcast_group("BENCH", {"op": "update_qty", "line_id": index, "quantity": seq}, sender_socket=ws)
+            await asyncio.sleep(interval)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(member(ws, i) for i, ws in enumerate(sockets)))
+    await asyncio.sleep(tick_ms / 1000 + 0.05)  # chờ nhịp cuối + hàng đợi gửi rút hết
+    elapsed = time.perf_counter() - start
+
+    frames = sum(ws.frames for ws in sockets)
+    messages = sum(ws.messages for ws in sockets)
+    for ws in sockets:
+        manager.disconnect_group(ws, "BENCH")
+    return frames, messages, elapsed
+
+
+async def main(args):
+    print(f"{args.edits} thay đổi / người, cách nhau {args.interval_ms}ms; gộp tin: nhịp {args.tick_ms}ms, tối đa {args.max_batch} tin")
+    print(f"{'members':>8} {'frames (off)':>14} {'frames (tick)':>14} {'giảm':>8} {'tin nhận':>10}")
+    for members in args.members:
+        off, delivered_off, _ = await run(members, args.edits, args.interval_ms / 1000, 0, args.max_batch)
+        on, delivered_on, _ = await run(members, args.edits, args.interval_ms / 1000, args.tick_ms, args.max_batch)
+        assert delivered_on == delivered_off  # gộp tin không được làm mất tin
+        print(f"{members:>8} {off:>14} {on:>14} {off / max(on, 1):>7.1f}x {delivered_on:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark frame WebSocket của đơn nhóm")
+    parser.add_argument("--members", type=int, nargs="+", default=[2, 5, 10, 20])
+    parser.add_argument("--edits", type=int, default=20)
+    parser.add_argument("--interval-ms", type=float, default=10)
+    parser.add_argument("--tick-ms", type=float, default=50)
+    parser.add_argument("--max-batch", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
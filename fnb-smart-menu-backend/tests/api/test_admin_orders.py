@@ -0,0 +1,122 @@
+# Tệp: tests/api/test_admin_orders.py
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.schemas import schemas
+from tests.conftest import assert_max_queries
+
+SEED_ORDERS_SQL = """
+INSERT INTO orders (customer_name, customer_phone, customer_address, sub_total, delivery_fee, discount_amount,
+    points_discount, total_amount, status, payment_method, delivery_method_selected, table_id, created_at, updated_at)
+SELECT 'Khach ' || g, '09' || lpad(g::text, 8, '0'), 'Tai quan', 50000, 0, 0, 0, 50000,
+    (ARRAY['MOI','DA_XAC_NHAN','DANG_CHUAN_BI','DA_XONG','DANG_GIAO','HOAN_TAT','DA_HUY','TU_CHOI'])[1 + g % 8]::orderstatus,
+    'TIEN_MAT', (ARRAY['TAI_CHO','MANG_DI'])[1 + g % 2]::deliverymethod,
+    CASE WHEN g % 10 = 0 THEN CAST(:table_id AS integer) END,
+    CAST(:now AS timestamptz) - make_interval(secs => (CAST(:count AS integer) - g) * 30),
+    CAST(:now AS timestamptz) - make_interval(secs => (CAST(:count AS integer) - g) * 30)
+FROM generate_series(1, CAST(:count AS integer)) AS g
+"""
+
+
+async def seed_orders(db: AsyncSession, count: int, table_id: int, now: datetime):
+    # 1 câu INSERT ... SELECT: đơn thứ g tạo cách nhau 30 giây, đơn mới nhất = now
+    await db.execute(text(SEED_ORDERS_SQL), {"count": count, "table_id": table_id, "now": now})
+    await db.execute(text("ANALYZE orders"))
+
+
+async def fetch_all_pages(client: AsyncClient, headers: dict, params: dict):
+    pages, cursor = [], None
+    while True:
+        res = await client.get("/admin/orders/", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert res.status_code == 200
+        pages.append([order["id"] for order in res.json()])
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_with_filters(client: AsyncClient, db_session: AsyncSession, admin_headers: dict):
+    table = await crud.create_table(db_session, schemas.TableCreate(name="Bàn Test Paging"))
+    now = datetime.now(timezone.utc)
+    await seed_orders(db_session, 200, table.id, now)
+
+    params = {"status": "MOI", "delivery_method": "TAI_CHO", "limit": 7,
+              "created_from": (now - timedelta(hours=1)).isoformat()}
+    pages = await fetch_all_pages(client, admin_headers, params)
+    ids = [order_id for page in pages for order_id in page]
+    assert ids == sorted(ids, reverse=True) and len(ids) == len(set(ids))
+    # 1 giờ gần nhất (tính cả mốc) = đơn 80..200, đơn MOI là g chia hết cho 8 (g chẵn => TAI_CHO)
+    assert len(ids) == 16
+    assert all(len(page) == 7 for page in pages[:-1])
+
+    # Lọc theo bàn + nhiều trạng thái, after_id cho kết quả giống cursor
+    res = await client.get("/admin/orders/", params={"table_id": table.id, "status": ["MOI", "HOAN_TAT"], "limit": 3}, headers=admin_headers)
+    first = res.json()
+    assert [o["status"] for o in first] and all(o["table_id"] == table.id and o["status"] in ("MOI", "HOAN_TAT") for o in first)
+    res = await client.get("/admin/orders/", params={"table_id": table.id, "status": ["MOI", "HOAN_TAT"], "after_id": first[-1]["id"]}, headers=admin_headers)
+    assert all(o["id"] < first[-1]["id"] for o in res.json())
+
+    res = await client.get("/admin/orders/", params={"cursor": "không-hợp-lệ"}, headers=admin_headers)
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_order_summary_is_one_narrow_query(client: AsyncClient, db_session: AsyncSession, admin_headers: dict):
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Summary"))
+    prod = await crud.create_product(db_session, schemas.ProductCreate(name="Test Tea Summary", base_price=25000, category_id=cat.id))
+    order_ids = []
+    for lines in (3, 1):
+        res = await client.post("/orders", json={
+            "customer_name": f"Khach {lines}", "customer_phone": "0911111111", "customer_address": "Tai quan",
+            "delivery_method": "TAI_CHO", "payment_method": "TIEN_MAT",
+            "items": [{"product_id": prod.id, "quantity": 1, "options": [], "note": f"dòng {i}"} for i in range(lines)],
+        })
+        order_ids.append(res.json()["id"])
+    await client.get("/admin/orders/summary", headers=admin_headers)  # làm nóng cache xác thực admin
+
+    with assert_max_queries(1) as stats:
+        res = await client.get("/admin/orders/summary", params={"limit": 2}, headers=admin_headers)
+
+    assert res.status_code == 200
+    assert stats.count == 1 and "order_item_options" not in stats.statements[0]
+    assert res.headers["X-DB-Queries"] == "1"
+    summaries = res.json()
+    assert [o["id"] for o in summaries] == order_ids[::-1]
+    assert [o["item_count"] for o in summaries] == [1, 3]
+    assert set(summaries[0]) == {"id", "customer_name", "total_amount", "status", "created_at", "table_id",
+                                 "delivery_method_selected", "item_count"}
+    assert res.headers["X-Next-Cursor"]
+
+    # Chi tiết vẫn lấy qua endpoint riêng
+    detail = await client.get(f"/admin/orders/{order_ids[0]}", headers=admin_headers)
+    assert len(detail.json()["items"]) == 3
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_page_latency_with_one_million_orders(client: AsyncClient, db_session: AsyncSession, admin_headers: dict):
+    table = await crud.create_table(db_session, schemas.TableCreate(name="Bàn Test 1M"))
+    now = datetime.now(timezone.utc)
+    await seed_orders(db_session, 1_000_000, table.id, now)
+    newest = (await db_session.execute(text("SELECT max(id) FROM orders"))).scalar()
+
+    queries = [
+        {},                                                           # trang đầu
+        {"after_id": newest - 900_000},                               # trang rất sâu (OFFSET sẽ phải bỏ qua 900k dòng)
+        {"status": "MOI", "after_id": newest - 500_000},
+        {"table_id": table.id, "after_id": newest - 700_000},
+        {"delivery_method": "TAI_CHO", "status": ["MOI", "DA_XAC_NHAN"]},
+        {"created_from": (now - timedelta(days=1)).isoformat(), "created_to": now.isoformat()},
+    ]
+    for params in queries:
+        await client.get("/admin/orders/", params={**params, "limit": 50}, headers=admin_headers)  # làm nóng
+        start = time.perf_counter()
+        res = await client.get("/admin/orders/", params={**params, "limit": 50}, headers=admin_headers)
+        elapsed = time.perf_counter() - start
+        assert res.status_code == 200 and len(res.json()) == 50
+        assert elapsed < 0.25, f"{params}: {elapsed * 1000:.0f}ms"
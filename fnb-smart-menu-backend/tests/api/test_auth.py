@@ -4,6 +4,8 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud import crud
 from app.schemas import schemas
+from app.core.security import admin_principal_cache
+from tests.conftest import assert_max_queries
 
 @pytest.mark.asyncio
 async def test_admin_login(client: AsyncClient, db_session: AsyncSession):
@@ -36,4 +38,148 @@ async def test_admin_login_wrong_password(client: AsyncClient, db_session: Async
     )
     
     # 3. Phải trả về lỗi 400
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_admin_principal_cached_and_evicted(client: AsyncClient, db_session: AsyncSession, admin_headers):
+    await crud.create_admin(db_session, schemas.AdminCreate(username="cached_admin", password="test_password"))
+    login_res = await client.post("/admin/token", data={"username": "cached_admin", "password": "test_password"})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    # Lần đầu hỏi DB, các lần sau không tốn query nào cho xác thực
+    assert (await client.get("/admin/cache-stats", headers=headers)).status_code == 200
+    stats = (await client.get("/admin/cache-stats", headers=headers)).json()["admin_principals"]
+    assert stats["hits"] >= 1
+
+    # Admin khác xóa tài khoản => cache bị xóa theo, token cũ không còn dùng được
+    assert (await client.delete("/admin/admins/cached_admin", headers=headers)).status_code == 400  # không tự xóa
+    assert (await client.delete("/admin/admins/cached_admin", headers=admin_headers)).status_code == 204
+    response = await client.get("/admin/cache-stats", headers=headers)
+    assert response.status_code == 401
+    assert (await client.delete("/admin/admins/cached_admin", headers=admin_headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_admin_deleted_during_auth_lookup_is_not_cached(
+    client: AsyncClient, db_session: AsyncSession, admin_headers, monkeypatch
+):
+    await crud.create_admin(db_session, schemas.AdminCreate(username="racing_admin", password="test_password"))
+    login_res = await client.post("/admin/token", data={"username": "racing_admin", "password": "test_password"})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    # Request xác thực vừa đọc xong bảng admins thì admin khác xóa tài khoản (commit + xóa cache)
+    get_admin = crud.get_admin_by_username
+    deleted = []
+
+    async def get_admin_then_delete(db, username):
+        admin = await get_admin(db, username)
+        if username == "racing_admin" and not deleted:
+            deleted.append(username)
+            monkeypatch.setattr(crud, "get_admin_by_username", get_admin)
+            await crud.delete_admin(db_session, username)
+        return admin
+
+    monkeypatch.setattr(crud, "get_admin_by_username", get_admin_then_delete)
+    assert (await client.get("/admin/cache-stats", headers=headers)).status_code == 200
+    assert deleted == ["racing_admin"]
+
+    # Bản đọc trước lúc xóa không được ghi vào cache => token cũ bị chặn ngay, không đợi hết TTL
+    assert (await client.get("/admin/cache-stats", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_change_password_evicts_cached_principal(client: AsyncClient, admin_headers):
+    assert (await client.get("/admin/cache-stats", headers=admin_headers)).status_code == 200
+    token = admin_headers["Authorization"].split(" ", 1)[1]
+    assert admin_principal_cache.get(token) is not None
+
+    wrong = {"current_password": "nope", "new_password": "new_password"}
+    assert (await client.put("/admin/me/password", json=wrong, headers=admin_headers)).status_code == 400
+    data = {"current_password": "fixture_password", "new_password": "new_password"}
+    with assert_max_queries(2):  # đọc admin 1 lần + UPDATE
+        assert (await client.put("/admin/me/password", json=data, headers=admin_headers)).status_code == 204
+    assert admin_principal_cache.get(token) is None
+
+    res = await client.post("/admin/token", data={"username": "fixture_admin", "password": "new_password"})
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_rejected_when_password_queue_full(client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    import asyncio
+    from app.core import security
+
+    await crud.create_admin(db_session, schemas.AdminCreate(username="busy_admin", password="test_password"))
+    monkeypatch.setattr(security, "_password_slots", asyncio.Semaphore(1))
+    form = {"username": "busy_admin", "password": "test_password"}
+
+    # Hết chỗ trong hàng đợi bcrypt => trả 503 ngay, không xếp hàng thêm
+    async with security._password_slots:
+        response = await client.post("/admin/token", data=form)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    assert (await client.post("/admin/token", data=form)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_menu_latency_flat_during_login_burst():
+    # Test này cần nhiều request chạy song song thật sự => mỗi request 1 session riêng (không dùng db_session chung)
+    import asyncio
+    import time
+    from httpx import ASGITransport
+    from app.main import app
+    from app.dependencies import get_db
+    from app.models import models
+    from sqlalchemy import delete
+    from app.core import security
+    from tests.conftest import TestingSessionLocal
+
+    async def per_request_db():
+        async with TestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = per_request_db
+    async with TestingSessionLocal() as db:
+        await crud.create_admin(db, schemas.AdminCreate(username="latency_admin", password="test_password"))
+
+    def p99(samples):
+        return sorted(samples)[int(len(samples) * 0.99) - 1]
+
+    async def menu_latencies(client, count, interval=0.005):
+        # Gửi theo lịch cố định, đo từ thời điểm lẽ ra phải gửi => thấy cả lúc event loop bị chặn
+        start = time.perf_counter()
+        samples = []
+        for i in range(count):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            assert (await client.get("/menu")).status_code == 200
+            samples.append(time.perf_counter() - scheduled)
+        return samples
+
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            await c.get("/menu")  # Làm nóng cache Menu
+            baseline = await menu_latencies(c, 100)
+
+            logins = [
+                c.post("/admin/token", data={"username": "latency_admin", "password": "test_password"})
+                for _ in range(8)
+            ]
+            during, *login_results = await asyncio.gather(menu_latencies(c, 100), *logins)
+            assert all(r.status_code == 200 for r in login_results)
+
+        # Nếu bcrypt chạy trên event loop, mỗi lần login chặn /menu trọn 1 lần băm (~100-300ms).
+        # Chạy trong thread pool thì /menu chỉ chậm đi vì chia CPU (máy 1 core), không bị chặn hẳn.
+        start = time.perf_counter()
+        security.verify_password("test_password", security.get_password_hash("test_password"))
+        bcrypt_cost = (time.perf_counter() - start) / 2
+        assert p99(during) < p99(baseline) + bcrypt_cost / 2
+    finally:
+        app.dependency_overrides.clear()
+        async with TestingSessionLocal() as db:
+            await db.execute(delete(models.Admin).where(models.Admin.username == "latency_admin"))
+            await db.commit()
@@ -1,6 +1,9 @@
 # Tệp: tests/api/test_menu.py
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.schemas import schemas
 
 # Đánh dấu đây là test Async
 @pytest.mark.asyncio
@@ -16,4 +19,51 @@ async def test_read_menu_public(client: AsyncClient):
     assert isinstance(data, list)
     
     # (Optional) Nếu bạn đã seed data, danh sách không được rỗng
-    # assert len(data) > 0
\ No newline at end of file
+    # assert len(data) > 0
+
+@pytest.mark.asyncio
+async def test_menu_etag_not_modified(client: AsyncClient):
+    # 1. Lần đầu: nhận body + ETag
+    response = await client.get("/menu")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    # 2. Lần sau gửi kèm If-None-Match: chỉ nhận 304, không có body
+    cached = await client.get("/menu", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_menu_rebuilt_after_catalog_write(client: AsyncClient, db_session: AsyncSession):
+    await crud.create_admin(db_session, schemas.AdminCreate(username="menu_cache_admin", password="123"))
+    login_res = await client.post("/admin/token", data={"username": "menu_cache_admin", "password": "123"})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    first = await client.get("/menu")
+    etag = first.headers["etag"]
+
+    # Admin thêm danh mục => phiên bản Catalog tăng => ETag cũ hết hiệu lực
+    res = await client.post("/admin/categories/", json={"name": "Danh Mục Cache"}, headers=headers)
+    assert res.status_code == 200
+
+    second = await client.get("/menu", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+    assert any(cat["name"] == "Danh Mục Cache" for cat in second.json())
+
+
+@pytest.mark.asyncio
+async def test_menu_precompressed_bodies(client: AsyncClient):
+    plain = await client.get("/menu", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    # Body gzip được nén sẵn trong snapshot, giải nén ra phải giống hệt bản gốc
+    gzipped = await client.get("/menu", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    assert gzipped.json() == plain.json()
+
+    # Mỗi kiểu nén có ETag riêng
+    assert gzipped.headers["etag"] != plain.headers["etag"]
@@ -0,0 +1,118 @@
+# Tệp: tests/api/test_order_calculate.py
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.schemas import schemas
+from app.services.price_index import price_index
+from app.services.voucher_cache import voucher_cache
+from tests.conftest import assert_max_queries
+
+
+async def _seed_cart_catalog(db_session: AsyncSession, size: int):
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Calc"))
+    opt = await crud.create_option(db_session, schemas.OptionCreate(name="Size Calc", type="CHON_1"))
+    val = await crud.create_option_value(db_session, schemas.OptionValueCreate(name="L", price_adjustment=5000), opt.id)
+    products = []
+    for i in range(size):
+        products.append(await crud.create_product(db_session, schemas.ProductCreate(
+            name=f"Test Calc {i}", base_price=20000, category_id=cat.id
+        )))
+    return products, val
+
+
+async def _calculate(client: AsyncClient, items: list, max_queries: int = 10):
+    payload = {"delivery_method": "TAI_CHO", "items": items}
+    with assert_max_queries(max_queries) as stats:
+        response = await client.post("/orders/calculate", json=payload)
+    assert response.status_code == 200
+    return response.json(), stats.count
+
+
+@pytest.mark.asyncio
+async def test_calculate_query_count_independent_of_cart_size(client: AsyncClient, db_session: AsyncSession):
+    products, val = await _seed_cart_catalog(db_session, 10)
+
+    def cart(size: int):
+        return [{"product_id": p.id, "quantity": 1, "options": [val.id]} for p in products[:size]]
+
+    # Lần đầu: build bảng giá (toàn bộ Catalog) với số query cố định
+    _, build_queries = await _calculate(client, cart(1))
+    assert build_queries <= 2
+
+    small, small_queries = await _calculate(client, cart(1))
+    large, large_queries = await _calculate(client, cart(10))
+
+    assert small["sub_total"] == 25000
+    assert large["sub_total"] == 250000
+    # Bảng giá đã nóng: giỏ 1 món hay 10 món đều không chạm Postgres
+    assert small_queries == large_queries == 0
+
+
+@pytest.mark.asyncio
+async def test_calculate_price_index_falls_back_on_miss(client: AsyncClient, db_session: AsyncSession):
+    products, val = await _seed_cart_catalog(db_session, 1)
+    await _calculate(client, [{"product_id": products[0].id, "quantity": 1, "options": []}])
+
+    # Món mới tạo thẳng qua CRUD (không qua Admin API) => chưa có trong index
+    cat_id = products[0].category_id
+    new_prod = await crud.create_product(db_session, schemas.ProductCreate(
+        name="Test Calc Miss", base_price=40000, category_id=cat_id
+    ))
+    misses_before = price_index.misses
+
+    data, queries = await _calculate(client, [{"product_id": new_prod.id, "quantity": 2, "options": [val.id]}])
+    assert data["sub_total"] == 90000
+    assert queries == 1
+    assert price_index.misses == misses_before + 1
+
+    # Lần sau đã được vá vào index
+    _, queries = await _calculate(client, [{"product_id": new_prod.id, "quantity": 1, "options": []}])
+    assert queries == 0
+
+
+@pytest.mark.asyncio
+async def test_voucher_cache_negative_and_invalidation(client: AsyncClient, db_session: AsyncSession):
+    products, _ = await _seed_cart_catalog(db_session, 1)
+    await crud.create_admin(db_session, schemas.AdminCreate(username="voucher_cache_admin", password="123"))
+    login_res = await client.post("/admin/token", data={"username": "voucher_cache_admin", "password": "123"})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    payload = {
+        "delivery_method": "TAI_CHO",
+        "voucher_code": "GIAM10K_CACHE",
+        "items": [{"product_id": products[0].id, "quantity": 1, "options": []}],
+    }
+    # Mã chưa tồn tại: lần 2 lấy từ negative cache
+    first = await client.post("/orders/calculate", json=payload)
+    assert first.json()["discount_amount"] == 0
+    await client.post("/orders/calculate", json=payload)
+    assert voucher_cache.negative_hits == 1
+
+    # Admin tạo mã => cache bị xóa ngay, lần tính sau áp dụng được giảm giá
+    res = await client.post("/admin/vouchers/", json={"code": "GIAM10K_CACHE", "type": "fixed", "value": 10000}, headers=headers)
+    assert res.status_code == 200
+    second = await client.post("/orders/calculate", json=payload)
+    assert second.json()["discount_amount"] == 10000
+
+
+@pytest.mark.asyncio
+async def test_voucher_cache_skips_result_read_before_clear(db_session: AsyncSession, monkeypatch):
+    # Admin tạo mã (commit + clear()) đúng lúc 1 request đang query mã đó
+    get_voucher = crud.get_voucher_by_code
+
+    async def get_voucher_then_create(db, code):
+        voucher = await get_voucher(db, code)
+        await crud.create_voucher(db_session, schemas.VoucherCreate(code=code, type="fixed", value=5000))
+        voucher_cache.clear()
+        return voucher
+
+    monkeypatch.setattr(crud, "get_voucher_by_code", get_voucher_then_create)
+    negative_hits = voucher_cache.negative_hits
+    assert await voucher_cache.get(db_session, "RACE5K") is None
+    monkeypatch.setattr(crud, "get_voucher_by_code", get_voucher)
+
+    # Kết quả "không tồn tại" đọc trước lúc clear() không bị negative-cache => lần sau thấy mã mới
+    rule = await voucher_cache.get(db_session, "RACE5K")
+    assert rule is not None and rule.value == 5000
+    assert voucher_cache.negative_hits == negative_hits
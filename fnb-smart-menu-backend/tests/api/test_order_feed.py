@@ -0,0 +1,117 @@
+# Tệp: tests/api/test_order_feed.py
+import asyncio
+import json
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.schemas import schemas
+from app.services.order_feed import order_feed
+
+
+@pytest.fixture
+def no_safety_lag(monkeypatch):
+    # Mọi thay đổi trong test nằm chung 1 giao dịch => không cần chờ giao dịch khác commit
+    monkeypatch.setattr(order_feed, "safety_lag", 0)
+
+
+async def place_order(client: AsyncClient, product_id: int, name: str) -> int:
+    res = await client.post("/orders", json={
+        "customer_name": name, "customer_phone": "0922222222", "customer_address": "Tai quan",
+        "delivery_method": "TAI_CHO", "payment_method": "TIEN_MAT",
+        "items": [{"product_id": product_id, "quantity": 1, "options": []}],
+    })
+    return res.json()["id"]
+
+
+async def touch(db: AsyncSession, order_id: int):
+    # Cả test chạy trong 1 giao dịch nên now() không đổi => giả lập giao dịch sau bằng clock_timestamp()
+    await db.execute(text("UPDATE orders SET updated_at = clock_timestamp() WHERE id = :id"), {"id": order_id})
+
+
+@pytest.mark.asyncio
+async def test_change_feed_returns_only_deltas(client: AsyncClient, db_session: AsyncSession, admin_headers: dict, no_safety_lag):
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Feed"))
+    prod = await crud.create_product(db_session, schemas.ProductCreate(name="Test Tea Feed", base_price=20000, category_id=cat.id))
+
+    res = await client.get("/admin/orders/changes", headers=admin_headers)
+    assert res.json()["orders"] == []
+    cursor = res.json()["cursor"]
+
+    first = await place_order(client, prod.id, "Feed 1")
+    second = await place_order(client, prod.id, "Feed 2")
+    await touch(db_session, first)
+    await touch(db_session, second)
+
+    res = await client.get("/admin/orders/changes", params={"cursor": cursor, "limit": 1}, headers=admin_headers)
+    assert [o["id"] for o in res.json()["orders"]] == [first]
+    res = await client.get("/admin/orders/changes", params={"cursor": res.json()["cursor"]}, headers=admin_headers)
+    assert [o["id"] for o in res.json()["orders"]] == [second]
+    assert len(res.json()["orders"][0]["items"]) == 1
+    cursor = res.json()["cursor"]
+
+    # Không có gì mới => rỗng, cursor giữ nguyên
+    res = await client.get("/admin/orders/changes", params={"cursor": cursor}, headers=admin_headers)
+    assert res.json() == {"orders": [], "cursor": cursor}
+
+    # Đổi trạng thái đơn cũ => chỉ đơn đó xuất hiện
+    await client.put(f"/admin/orders/{first}/status", params={"status": "DANG_CHUAN_BI"}, headers=admin_headers)
+    await touch(db_session, first)
+    res = await client.get("/admin/orders/changes", params={"cursor": cursor}, headers=admin_headers)
+    assert [(o["id"], o["status"]) for o in res.json()["orders"]] == [(first, "DANG_CHUAN_BI")]
+
+    res = await client.get("/admin/orders/changes", params={"cursor": "abc"}, headers=admin_headers)
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_change_stream_wakes_on_new_order(client: AsyncClient, db_session: AsyncSession, no_safety_lag, monkeypatch):
+    monkeypatch.setattr(order_feed, "poll_interval", 10)
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Stream"))
+    prod = await crud.create_product(db_session, schemas.ProductCreate(name="Test Tea Stream", base_price=20000, category_id=cat.id))
+
+    async def connected():
+        return False
+
+    position = await order_feed.start_position(db_session, None, None)
+    stream = order_feed.stream(db_session, position, connected)
+    try:
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        next_event = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert not next_event.done()  # chưa có thay đổi => đang chờ
+
+        order_id = await place_order(client, prod.id, "Stream 1")  # POST /orders tự đánh thức stream
+        await touch(db_session, order_id)
+        event = await asyncio.wait_for(next_event, 2)  # không phải chờ hết poll_interval 10s
+        lines = event.strip().split("\n")
+        assert lines[0].startswith("id: ") and lines[1] == "event: orders"
+        assert [o["id"] for o in json.loads(lines[2][len("data: "):])] == [order_id]
+        # id của event là cursor dùng được cho API thường (Last-Event-ID)
+        assert order_feed.decode(lines[0][len("id: "):])[1] == order_id
+    finally:
+        await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_event_source_authenticates_with_stream_token(client: AsyncClient, admin_headers, monkeypatch):
+    async def one_event(db, position, is_disconnected):
+        yield "retry: 3000\n\n"
+
+    monkeypatch.setattr(order_feed, "stream", one_event)
+    res = await client.post("/admin/orders/changes/stream-token", headers=admin_headers)
+    assert res.status_code == 200 and res.json()["expires_in"] > 0
+    stream_token = res.json()["access_token"]
+
+    # EventSource không gửi được header => token đi theo query string
+    res = await client.get(f"/admin/orders/changes/stream?access_token={stream_token}")
+    assert res.status_code == 200 and res.text == "retry: 3000\n\n"
+    assert (await client.get("/admin/orders/changes/stream", headers=admin_headers)).status_code == 200
+    assert (await client.get("/admin/orders/changes/stream")).status_code == 401
+
+    # Token SSE không dùng được cho API khác, token đăng nhập không được đặt trong URL
+    stream_headers = {"Authorization": f"Bearer {stream_token}"}
+    assert (await client.get("/admin/orders/", headers=stream_headers)).status_code == 401
+    login_token = admin_headers["Authorization"].split(" ", 1)[1]
+    assert (await client.get(f"/admin/orders/changes/stream?access_token={login_token}")).status_code == 401
@@ -79,4 +79,83 @@ async def test_full_order_process(client: AsyncClient, db_session: AsyncSession)
     user = result.scalars().first()
     
     assert user is not None
-    assert user.points == 6
\ No newline at end of file
+    assert user.points == 6
+
+    # Sổ điểm ghi lại đúng giao dịch tích điểm => đối soát khớp số dư
+    assert await crud.get_ledger_balance(db_session, user.id) == 6
+
+    # Trừ quá số điểm đang có: UPDATE không khớp dòng nào, số dư giữ nguyên
+    assert await crud.update_user_points(db_session, user.id, -100) is None
+    assert await crud.update_user_points(db_session, user.id, -4) == 2
+    assert await crud.get_ledger_balance(db_session, user.id) == 2
+
+@pytest.mark.asyncio
+async def test_order_items_bulk_saved(client: AsyncClient, db_session: AsyncSession):
+    # Đơn nhiều món + topping: toàn bộ chi tiết phải được lưu đúng món (INSERT nhiều dòng)
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Bulk"))
+    opt = await crud.create_option(db_session, schemas.OptionCreate(name="Kích cỡ", type="CHON_1"))
+    size_l = await crud.create_option_value(db_session, schemas.OptionValueCreate(name="Size L", price_adjustment=5000), opt.id)
+    tea = await crud.create_product(db_session, schemas.ProductCreate(name="Test Tea Bulk", base_price=30000, category_id=cat.id))
+    coffee = await crud.create_product(db_session, schemas.ProductCreate(name="Test Coffee Bulk", base_price=20000, category_id=cat.id))
+
+    response = await client.post("/orders", json={
+        "customer_name": "Khach Test Bulk",
+        "customer_phone": "0977777777",
+        "customer_address": "Tại quán",
+        "delivery_method": "TAI_CHO",
+        "payment_method": "TIEN_MAT",
+        "items": [
+            {"product_id": tea.id, "quantity": 1, "options": [size_l.id]},
+            {"product_id": coffee.id, "quantity": 2, "options": []},
+        ]
+    })
+    assert response.status_code == 201
+
+    order = await crud.get_order_details(db_session, response.json()["id"])
+    items = {item.product_name: item for item in order.items}
+    assert float(items["Test Tea Bulk"].item_price) == 35000
+    assert [(o.option_name, o.value_name) for o in items["Test Tea Bulk"].options_selected] == [("Kích cỡ", "Size L")]
+    assert float(items["Test Coffee Bulk"].item_price) == 40000
+    assert items["Test Coffee Bulk"].options_selected == []
+
+
+@pytest.mark.asyncio
+async def test_group_order_validated_against_server_cart(client: AsyncClient, db_session: AsyncSession):
+    from app.services.group_cart import group_carts
+
+    cat = await crud.create_category(db_session, schemas.CategoryCreate(name="Test Cat Group"))
+    prod = await crud.create_product(db_session, schemas.ProductCreate(
+        name="Test Tea Group", base_price=20000, category_id=cat.id
+    ))
+    await group_carts.apply(db_session, "table-7", {"op": "add", "product_id": prod.id, "quantity": 2, "ordered_by": "An"})
+
+    order_payload = {
+        "customer_name": "Nhom Test",
+        "customer_phone": "0977777777",
+        "customer_address": "Tai quan",
+        "delivery_method": "TAI_CHO",
+        "payment_method": "TIEN_MAT",
+        "group_id": "table-7",
+        "items": [{"product_id": prod.id, "quantity": 3, "options": []}]
+    }
+    # Client gửi giỏ lệch với server => từ chối
+    response = await client.post("/orders", json=order_payload)
+    assert response.status_code == 409
+
+    order_payload["items"][0]["quantity"] = 2
+    response = await client.post("/orders", json=order_payload)
+    assert response.status_code == 201
+    assert response.json()["total_amount"] == 40000
+    # Giỏ nhóm đã đóng sau khi đặt đơn
+    assert await group_carts.find(db_session, "table-7") is None
+    response = await client.post("/orders", json=order_payload)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_silent_registration_is_idempotent_per_phone(db_session: AsyncSession):
+    data = {"full_name": "Khach Moi", "phone": "0966666666", "role": models.UserRole.CUSTOMER, "points": 0}
+    first = await crud.get_or_create_user_by_phone(db_session, data)
+    # Lần 2 đụng UNIQUE(phone) => ON CONFLICT DO NOTHING rồi trả về khách đã có, không lỗi
+    second = await crud.get_or_create_user_by_phone(db_session, {**data, "full_name": "Ten Khac"})
+    assert first.id == second.id and second.full_name == "Khach Moi"
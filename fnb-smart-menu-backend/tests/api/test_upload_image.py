@@ -0,0 +1,199 @@
+# Tệp: tests/api/test_upload_image.py
+import io
+import os
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from httpx import AsyncClient
+from PIL import Image
+from app.services.images import image_processor
+
+
+def make_image(size=(2000, 1000), mode="RGB", fmt="JPEG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 80, 20, 128)[: len(mode)]).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_processor, "directory", str(tmp_path))
+    return tmp_path
+
+
+def local_path(upload_dir, url: str) -> str:
+    return os.path.join(upload_dir, url.rsplit("/", 1)[-1])
+
+
+@pytest.mark.asyncio
+async def test_upload_generates_small_variants(client: AsyncClient, admin_headers, upload_dir):
+    files = {"file": ("photo.jpg", make_image(), "image/jpeg")}
+    res = await client.post("/admin/upload-image", files=files, headers=admin_headers)
+    assert res.status_code == 200
+    data = res.json()
+
+    assert set(data["variants"]) == {"thumb", "card", "full"}
+    assert data["image_url"] == data["variants"]["card"]["webp"]
+    for name, longest in (("thumb", 160), ("card", 480), ("full", 1280)):
+        for fmt, pil_format in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            with Image.open(local_path(upload_dir, data["variants"][name][fmt])) as image:
+                assert image.format == pil_format and max(image.size) == longest
+    # Ảnh gốc không được giữ lại: chỉ còn 3 bản x 2 định dạng
+    assert len(os.listdir(upload_dir)) == 6
+
+
+@pytest.mark.asyncio
+async def test_upload_keeps_transparency_in_webp(client: AsyncClient, admin_headers, upload_dir):
+    files = {"file": ("logo.png", make_image((300, 300), "RGBA", "PNG"), "image/png")}
+    res = await client.post("/admin/upload-image", files=files, headers=admin_headers)
+    assert res.status_code == 200
+    card = res.json()["variants"]["card"]
+    with Image.open(local_path(upload_dir, card["webp"])) as image:
+        assert image.mode == "RGBA" and image.size == (300, 300)  # không phóng to ảnh nhỏ
+    with Image.open(local_path(upload_dir, card["jpeg"])) as image:
+        assert image.mode == "RGB"
+
+
+@pytest.mark.asyncio
+async def test_upload_rejects_oversized_file_while_streaming(client: AsyncClient, admin_headers, upload_dir, monkeypatch):
+    monkeypatch.setattr(image_processor, "max_bytes", 1000)
+    files = {"file": ("photo.jpg", make_image(), "image/jpeg")}
+    res = await client.post("/admin/upload-image", files=files, headers=admin_headers)
+    assert res.status_code == 413
+    assert os.listdir(upload_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_rejects_non_images(client: AsyncClient, admin_headers, upload_dir):
+    res = await client.post(
+        "/admin/upload-image", files={"file": ("photo.jpg", b"not an image", "image/jpeg")}, headers=admin_headers
+    )
+    assert res.status_code == 400
+    res = await client.post(
+        "/admin/upload-image", files={"file": ("script.sh", b"echo hi", "text/plain")}, headers=admin_headers
+    )
+    assert res.status_code == 400
+    assert os.listdir(upload_dir) == []
+
+
+class BrokenExecutor(Executor):
+    """Giống pool có process con vừa bị OOM-kill"""
+
+    def __init__(self):
+        self.closed = False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_broken_worker_pool_is_replaced(client: AsyncClient, admin_headers, upload_dir, monkeypatch):
+    broken = BrokenExecutor()
+    monkeypatch.setattr(image_processor, "_executor", broken)
+    files = {"file": ("photo.jpg", make_image((600, 400)), "image/jpeg")}
+    res = await client.post("/admin/upload-image", files=files, headers=admin_headers)
+    assert res.status_code == 503
+    assert broken.closed and image_processor._executor is None
+    assert os.listdir(upload_dir) == []
+
+    # Lần upload sau dùng pool mới, không bị kẹt lỗi mãi
+    res = await client.post("/admin/upload-image", files=files, headers=admin_headers)
+    assert res.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_reuses_existing_files(client: AsyncClient, admin_headers, upload_dir):
+    photo = make_image()
+    first = (await client.post("/admin/upload-image", files={"file": ("a.jpg", photo, "image/jpeg")}, headers=admin_headers)).json()
+    card_path = local_path(upload_dir, first["image_url"])
+    inode = os.stat(card_path).st_ino
+
+    second = (await client.post("/admin/upload-image", files={"file": ("b.jpg", photo, "image/jpeg")}, headers=admin_headers)).json()
+    assert second["deduplicated"] is True and first["deduplicated"] is False
+    assert second["variants"] == first["variants"]
+    assert os.stat(card_path).st_ino == inode  # không ghi lại file
+    assert len(os.listdir(upload_dir)) == 6
+
+    other = (await client.post(
+        "/admin/upload-image", files={"file": ("c.jpg", make_image((1000, 1000)), "image/jpeg")}, headers=admin_headers
+    )).json()
+    assert other["image_url"] != first["image_url"]
+
+
+@pytest.mark.asyncio
+async def test_gc_removes_only_unreferenced_old_files(client: AsyncClient, admin_headers, upload_dir):
+    async def upload(size):
+        files = {"file": ("photo.jpg", make_image(size), "image/jpeg")}
+        return (await client.post("/admin/upload-image", files=files, headers=admin_headers)).json()
+
+    used, unused = await upload((800, 600)), await upload((600, 800))
+    leftover = upload_dir / "upload-abandoned.jpg.tmp"
+    leftover.write_bytes(b"x")
+    # Các file "cũ" 2 ngày
+    for name in os.listdir(upload_dir):
+        os.utime(upload_dir / name, (0, 0))
+    fresh = await upload((500, 500))
+
+    result = image_processor.collect_garbage(["https://api.example.com" + used["image_url"], "🍵", None])
+    remaining = set(os.listdir(upload_dir))
+    assert len(result["removed"]) == 7 and result["kept"] == 12
+    assert {url.rsplit("/", 1)[-1] for variant in used["variants"].values() for url in variant.values()} <= remaining
+    assert {url.rsplit("/", 1)[-1] for variant in fresh["variants"].values() for url in variant.values()} <= remaining
+    assert not any(url.rsplit("/", 1)[-1] in remaining for variant in unused["variants"].values() for url in variant.values())
+
+
+@pytest.mark.asyncio
+async def test_static_images_are_served_immutable(client: AsyncClient):
+    path = os.path.join("uploads", "test-immutable-card.webp")
+    with open(path, "wb") as f:
+        f.write(b"RIFF")
+    try:
+        res = await client.get("/static/test-immutable-card.webp")
+    finally:
+        os.remove(path)
+    assert res.status_code == 200
+    assert res.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+
+def multipart_chunks(payload: bytes, chunk_size: int, sent: list):
+    boundary = "fnb-test-boundary"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"photo.jpg\"\r\n"
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    body = head + payload + f"\r\n--{boundary}--\r\n".encode()
+
+    async def stream():
+        for start in range(0, len(body), chunk_size):
+            sent.append(start)
+            yield body[start:start + chunk_size]
+
+    return stream(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+@pytest.mark.asyncio
+async def test_upload_limit_applies_to_chunked_body(client: AsyncClient, admin_headers, upload_dir, monkeypatch):
+    monkeypatch.setattr(image_processor, "max_bytes", 1000)
+    sent = []
+    # Không có Content-Length (chunked) => phải đếm byte lúc nhận, không đợi FastAPI đọc hết form
+    stream, headers = multipart_chunks(os.urandom(1024 * 1024), 16 * 1024, sent)
+    res = await client.post("/admin/upload-image", content=stream, headers={**admin_headers, **headers})
+    assert res.status_code == 413
+    assert len(sent) <= 6  # dừng đọc ngay sau khi vượt ~65 KB, không nhận cả 1 MB
+    assert os.listdir(upload_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_limit_rejects_large_content_length_without_reading(client: AsyncClient, admin_headers, monkeypatch):
+    monkeypatch.setattr(image_processor, "max_bytes", 1000)
+    sent = []
+    stream, headers = multipart_chunks(os.urandom(256 * 1024), 16 * 1024, sent)
+    headers["Content-Length"] = str(256 * 1024 + 200)
+    res = await client.post("/admin/upload-image", content=stream, headers={**admin_headers, **headers})
+    assert res.status_code == 413
+    assert sent == []
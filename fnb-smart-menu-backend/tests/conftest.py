@@ -1,5 +1,6 @@
 # Tệp: tests/conftest.py
 import pytest
+from contextlib import contextmanager
 from typing import AsyncGenerator
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -9,7 +10,14 @@ from sqlalchemy.pool import NullPool
 # Import App và Dependency
 from app.main import app
 from app.dependencies import get_db
+from app.crud import crud
+from app.schemas import schemas
 from app.models.models import DATABASE_URL
+from app.services.menu_cache import menu_cache
+from app.services.price_index import price_index
+from app.services.voucher_cache import voucher_cache
+from app.core.security import admin_principal_cache
+from app.core.query_stats import track_queries
 
 # 1. Cấu hình Database Test
 TEST_DATABASE_URL = DATABASE_URL 
@@ -34,6 +42,25 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
     await transaction.rollback()
     await connection.close()
 
+# Cache trong bộ nhớ sống xuyên suốt process, nhưng dữ liệu test bị rollback sau mỗi test
+# => Xóa cache trước mỗi test để không dính dữ liệu của test trước
+@pytest.fixture(autouse=True)
+def reset_caches():
+    menu_cache.invalidate()
+    price_index.invalidate()
+    voucher_cache.clear()
+    admin_principal_cache.clear()
+    yield
+
+# Helper: fail nếu đoạn code bên trong chạy quá `limit` câu SQL (in kèm các câu SQL để dễ tìm N+1)
+@contextmanager
+def assert_max_queries(limit: int):
+    with track_queries() as stats:
+        yield stats
+    assert stats.count <= limit, f"{stats.count} câu SQL (tối đa {limit}):\n" + "\n".join(
+        statement[:200] for statement in stats.statements
+    )
+
 # 3. Fixture Client
 @pytest.fixture(scope="function")
 async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
@@ -46,4 +73,11 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
         yield c
     
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+# 4. Fixture Admin đã đăng nhập (cho các API /admin/...)
+@pytest.fixture(scope="function")
+async def admin_headers(client: AsyncClient, db_session: AsyncSession) -> dict:
+    await crud.create_admin(db_session, schemas.AdminCreate(username="fixture_admin", password="fixture_password"))
+    res = await client.post("/admin/token", data={"username": "fixture_admin", "password": "fixture_password"})
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
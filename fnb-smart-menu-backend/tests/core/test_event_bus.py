@@ -0,0 +1,92 @@
+# Tệp: tests/core/test_event_bus.py
+import asyncio
+import uuid
+import asyncpg
+import pytest
+from app.core import event_bus as event_bus_module
+from app.core.event_bus import PostgresEventBus, CATALOG_CHANGED, VOUCHERS_CHANGED
+from app.core.websocket import ConnectionManager
+from app.models.models import SYNC_DATABASE_URL
+from tests.core.test_websocket_manager import FakeWebSocket
+
+
+async def wait_until(predicate, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_socket_on_other_worker():
+    # 2 bus = 2 worker, dùng kênh riêng để không lẫn với app đang chạy
+    channel = f"test_{uuid.uuid4().hex[:8]}"
+    bus_a, bus_b = PostgresEventBus(SYNC_DATABASE_URL, channel), PostgresEventBus(SYNC_DATABASE_URL, channel)
+    worker_a, worker_b = ConnectionManager(bus=bus_a), ConnectionManager(bus=bus_b)
+    await bus_a.start()
+    await bus_b.start()
+    try:
+        assert await wait_until(lambda: bus_a.connected and bus_b.connected)
+
+        admin_a, admin_b = FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect(admin_a)
+        await worker_b.connect(admin_b)
+        member_a, member_b = FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect_group(member_a, "G1")
+        await worker_b.connect_group(member_b, "G1")
+
+        await worker_a.broadcast({"type": "new_order", "order_id": 7})
+        await worker_a.broadcast_group("G1", {"type": "add_item", "item": "Trà đào"}, sender_socket=member_a)
+
+        assert await wait_until(lambda: admin_b.received and member_b.received)
+        assert admin_b.received == [{"type": "new_order", "order_id": 7}]
+        assert member_b.received == [{"type": "add_item", "item": "Trà đào"}]
+        # Worker gửi không nhận lại tin của chính mình (không bị trùng)
+        await asyncio.sleep(0.2)
+        assert admin_a.received == [{"type": "new_order", "order_id": 7}]
+        assert member_a.received == []
+        assert bus_a.received == 0 and bus_b.received == 2
+    finally:
+        await bus_a.stop()
+        await bus_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resends_failed_event_and_resyncs_caches(monkeypatch):
+    monkeypatch.setattr(event_bus_module, "EVENT_BUS_KEEPALIVE", 0.5)
+    channel = f"test_{uuid.uuid4().hex[:8]}"
+    bus_a, bus_b = PostgresEventBus(SYNC_DATABASE_URL, channel), PostgresEventBus(SYNC_DATABASE_URL, channel)
+    seen_a, seen_b = [], []
+    bus_a.subscribe(VOUCHERS_CHANGED, seen_a.append)
+    bus_b.subscribe(CATALOG_CHANGED, seen_b.append)
+    await bus_a.start()
+    await bus_b.start()
+    try:
+        assert await wait_until(lambda: bus_a.connected and bus_b.connected)
+        seen_a.clear()
+        seen_b.clear()
+
+        # Cắt kết nối LISTEN của worker B (giống Postgres restart / mạng chập chờn)
+        admin = await asyncpg.connect(SYNC_DATABASE_URL)
+        try:
+            killed = await admin.fetchval(
+                "SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity WHERE application_name = $1",
+                bus_b.application_name,
+            )
+        finally:
+            await admin.close()
+        assert killed == 1
+
+        # B gửi tin lúc kết nối đã chết: không được mất
+        bus_b.publish_nowait(VOUCHERS_CHANGED, {"code": "SALE"})
+        # A gửi tin lúc B không LISTEN: B lỡ tin này => phải tự xóa cache khi kết nối lại
+        await bus_a.publish(CATALOG_CHANGED, {"product_id": 1}, local=False)
+
+        assert await wait_until(lambda: bus_b.reconnects >= 1 and bus_b.connected, timeout=10)
+        assert await wait_until(lambda: {"code": "SALE"} in seen_a)
+        assert {} in seen_b and bus_b.resyncs >= 2
+    finally:
+        await bus_a.stop()
+        await bus_b.stop()
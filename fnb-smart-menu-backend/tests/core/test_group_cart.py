@@ -0,0 +1,136 @@
+# Tệp: tests/core/test_group_cart.py
+import asyncio
+import uuid
+import pytest
+from app.core.event_bus import InMemoryEventBus
+from app.core.websocket import ConnectionManager
+from app.models.models import AsyncSessionLocal
+from app.schemas import schemas
+from app.services.group_cart import GroupCart, GroupCartError, GroupCartStore
+from tests.core.test_event_bus import wait_until
+from tests.core.test_websocket_manager import FakeWebSocket
+
+
+def test_operations_produce_small_versioned_deltas():
+    cart = GroupCart("G1")
+    d1 = cart.apply({"op": "add", "product_id": 5, "quantity": 1, "options": [9, 3], "ordered_by": "An"})
+    assert d1 == {
+        "type": "cart_delta", "version": 1, "op": "add",
+        "line": {"line_id": 1, "product_id": 5, "quantity": 1, "options": [3, 9], "note": None, "ordered_by": "An"},
+    }
+    # Cùng món + cùng topping (khác thứ tự) + cùng người => gộp số lượng, không thêm dòng
+    d2 = cart.apply({"op": "add", "product_id": 5, "quantity": 2, "options": [3, 9], "ordered_by": "An"})
+    assert d2 == {"type": "cart_delta", "version": 2, "op": "update_qty", "line_id": 1, "quantity": 3}
+
+    cart.apply({"op": "add", "product_id": 6, "quantity": 1, "ordered_by": "Bình"})
+    d4 = cart.apply({"op": "update_qty", "line_id": 2, "quantity": 0})
+    assert d4 == {"type": "cart_delta", "version": 4, "op": "remove", "line_id": 2}
+    assert list(cart.lines) == [1]
+
+    # Thao tác sai không làm đổi version
+    for bad in ({"op": "remove", "line_id": 42}, {"op": "add", "product_id": "5"}, {"op": "explode"},
+                {"op": "add", "product_id": 5, "quantity": 1000}):
+        with pytest.raises(GroupCartError):
+            cart.apply(bad)
+    assert cart.version == 4
+
+
+def test_late_joiner_snapshot_and_resync():
+    cart = GroupCart("G1", history=3)
+    for product_id in range(1, 6):
+        cart.apply({"op": "add", "product_id": product_id, "quantity": 1})
+
+    snapshot = cart.snapshot()
+    assert snapshot["version"] == 5
+    assert [line["product_id"] for line in snapshot["lines"]] == [1, 2, 3, 4, 5]
+
+    # Client ở version 3 => chỉ cần 2 delta còn thiếu
+    assert [d["version"] for d in cart.sync_since(3)] == [4, 5]
+    assert cart.sync_since(5) == []
+    # Quá cũ (lịch sử chỉ giữ 3 delta) hoặc version lạ => snapshot đầy đủ
+    assert cart.sync_since(1)[0]["type"] == "cart_snapshot"
+    assert cart.sync_since(99)[0]["type"] == "cart_snapshot"
+
+
+def test_submission_must_match_server_cart():
+    cart = GroupCart("G1")
+    cart.apply({"op": "add", "product_id": 5, "quantity": 2, "options": [3], "ordered_by": "An"})
+    cart.apply({"op": "add", "product_id": 5, "quantity": 1, "options": [3], "ordered_by": "Bình"})
+
+    item = lambda quantity: schemas.OrderItemCreate(product_id=5, quantity=quantity, options=[3])
+    assert cart.matches([item(3)])
+    assert cart.matches([item(1), item(2)])
+    assert not cart.matches([item(2)])
+
+
+class LinkedBus(InMemoryEventBus):
+    """Bus trong bộ nhớ nối thẳng sang các worker giả khác (thay cho Postgres LISTEN/NOTIFY)"""
+
+    def __init__(self):
+        super().__init__()
+        self.peers = []
+
+    def _send_remote(self, channel: str, payload: dict):
+        for peer in self.peers:
+            asyncio.get_running_loop().create_task(peer._dispatch(channel, payload))
+
+
+@pytest.mark.asyncio
+async def test_group_cart_shared_between_workers(db_session):
+    # 2 worker: mỗi worker có ConnectionManager + GroupCartStore riêng, chỉ chung CSDL và event bus
+    bus_a, bus_b = LinkedBus(), LinkedBus()
+    bus_a.peers, bus_b.peers = [bus_b], [bus_a]
+    worker_a, worker_b = ConnectionManager(bus=bus_a), ConnectionManager(bus=bus_b)
+    store_a, store_b = GroupCartStore(), GroupCartStore()
+    member_a, member_b = FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect_group(member_a, "G1")
+    await worker_b.connect_group(member_b, "G1")
+
+    delta = await store_a.apply(db_session, "G1", {"op": "add", "product_id": 5, "quantity": 1, "ordered_by": "An"})
+    await worker_a.broadcast_group("G1", delta)
+    assert await wait_until(lambda: member_b.received)
+    line_id = member_b.received[0]["line"]["line_id"]
+
+    # Người ở worker B sửa dòng do worker A tạo: cùng line_id, version nối tiếp
+    delta = await store_b.apply(db_session, "G1", {"op": "update_qty", "line_id": line_id, "quantity": 3})
+    assert delta == {"type": "cart_delta", "version": 2, "op": "update_qty", "line_id": line_id, "quantity": 3}
+    delta = await store_a.apply(db_session, "G1", {"op": "add", "product_id": 6, "quantity": 1, "ordered_by": "Bình"})
+    assert delta["version"] == 3 and delta["line"]["line_id"] == line_id + 1
+    with pytest.raises(GroupCartError) as error:
+        await store_b.apply(db_session, "G1", {"op": "remove", "line_id": 42})
+    assert error.value.version == 3
+
+    assert (await store_a.get(db_session, "G1")).snapshot() == (await store_b.get(db_session, "G1")).snapshot()
+    assert [d["version"] for d in await store_b.sync_since(db_session, "G1", 1)] == [2, 3]
+    # Đặt đơn ở worker nào cũng đối chiếu được với cùng 1 giỏ
+    items = [schemas.OrderItemCreate(product_id=5, quantity=3, options=[]), schemas.OrderItemCreate(product_id=6, quantity=1, options=[])]
+    assert (await store_b.find(db_session, "G1")).matches(items)
+
+    worker_a.disconnect_group(member_a, "G1")
+    worker_b.disconnect_group(member_b, "G1")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_operations_get_sequential_versions():
+    # Thao tác cùng lúc từ 2 worker (2 kết nối DB) => khóa dòng giữ version / line_id tuần tự, không trùng
+    group_id = f"test-{uuid.uuid4().hex[:8]}"
+    store_a, store_b = GroupCartStore(), GroupCartStore()
+
+    async def add_many(store, product_id):
+        versions = []
+        for _ in range(5):
+            async with AsyncSessionLocal() as db:
+                delta = await store.apply(db, group_id, {"op": "add", "product_id": product_id, "quantity": 1,
+                                                         "note": uuid.uuid4().hex})
+            versions.append(delta["version"])
+        return versions
+
+    try:
+        versions_a, versions_b = await asyncio.gather(add_many(store_a, 1), add_many(store_b, 2))
+        assert sorted(versions_a + versions_b) == list(range(1, 11))
+        async with AsyncSessionLocal() as db:
+            cart = await store_a.get(db, group_id)
+        assert cart.version == 10 and sorted(cart.lines) == list(range(1, 11))
+    finally:
+        async with AsyncSessionLocal() as db:
+            await store_a.discard(db, group_id)
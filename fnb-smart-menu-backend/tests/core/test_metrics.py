@@ -0,0 +1,79 @@
+# Tệp: tests/core/test_metrics.py
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.metrics import (
+    MetricsRegistry, TimedQueuePool, db_pool_checkout_seconds, http_request_duration, http_requests_total,
+)
+from app.models.models import DATABASE_URL, engine, pool_stats, warm_up_pool
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_latency_seconds", "Độ trễ", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, ("/menu",))
+    registry.gauge("test_sockets", "Số kết nối", ("kind",), function=lambda: {("admin",): 2})
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_latency_seconds histogram" in lines
+    # le="0.1" gồm cả giá trị bằng đúng cận trên
+    assert 'test_latency_seconds_bucket{route="/menu",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/menu",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/menu",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/menu"} 4' in lines
+    assert 'test_latency_seconds_sum{route="/menu"} 3.65' in lines
+    assert 'test_sockets{kind="admin"} 2' in lines
+
+
+@pytest.mark.asyncio
+async def test_requests_are_recorded_by_route_template(client: AsyncClient):
+    labels = ("GET", "/admin/orders/{order_id}")
+    before = http_requests_total.get(labels + ("401",))
+    count_before = http_request_duration.count(labels)
+
+    res = await client.get("/admin/orders/123456")
+    assert res.status_code == 401
+
+    assert http_requests_total.get(labels + ("401",)) == before + 1
+    assert http_request_duration.count(labels) == count_before + 1
+
+    res = await client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'fnb_http_requests_total{method="GET",route="/admin/orders/{order_id}",status="401"}' in res.text
+    assert 'fnb_ws_connections{kind="admin"}' in res.text
+    assert 'fnb_db_pool_connections{state="checked_in"}' in res.text
+    assert "fnb_http_requests_in_progress 1" in res.text  # chính request /metrics
+
+
+@pytest.mark.asyncio
+async def test_pool_checkout_wait_is_measured():
+    engine = create_async_engine(DATABASE_URL, poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    before = db_pool_checkout_seconds.count()
+    try:
+        for _ in range(2):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+    assert db_pool_checkout_seconds.count() == before + 2
+
+
+@pytest.mark.asyncio
+async def test_warm_up_fills_pool_and_reports_stats():
+    await engine.dispose()
+    try:
+        assert await warm_up_pool(3) == 3
+        stats = pool_stats()
+        assert stats["checked_in"] == 3 and stats["checked_out"] == 0 and stats["waiting"] == 0
+
+        # Kết nối mở sẵn được dùng lại ngay, không phải mở mới
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats()["checked_out"] == 1
+        assert pool_stats()["checked_in"] == 3
+    finally:
+        # Kết nối asyncpg gắn với event loop của test này
+        await engine.dispose()
@@ -0,0 +1,72 @@
+# Tệp: tests/core/test_query_stats.py
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import query_stats
+from app.core.query_stats import QueryStatsMiddleware, track_queries
+from tests.conftest import assert_max_queries
+
+
+@pytest.mark.asyncio
+async def test_nested_tracking_counts_in_every_scope(db_session: AsyncSession):
+    with track_queries() as outer:
+        await db_session.execute(text("SELECT 1"))
+        with track_queries() as inner:
+            await db_session.execute(text("SELECT 2"))
+
+    assert inner.count == 1 and inner.statements == ["SELECT 2"]
+    assert outer.count == 2
+    assert outer.duration >= inner.duration > 0
+
+    # Ngoài mọi scope => không đo (hook gần như không tốn gì)
+    await db_session.execute(text("SELECT 3"))
+    assert outer.count == 2
+
+
+@pytest.mark.asyncio
+async def test_request_reports_query_count_headers(client: AsyncClient, admin_headers):
+    with track_queries() as stats:
+        res = await client.get("/admin/orders/", headers=admin_headers)
+
+    assert res.status_code == 200
+    # Câu SQL chạy trong request được cộng cả vào scope của test (ContextVar đi theo request)
+    assert int(res.headers["X-DB-Queries"]) == stats.count > 0
+    assert res.headers["Server-Timing"].startswith("db;dur=")
+
+
+@pytest.mark.asyncio
+async def test_assert_max_queries_lists_statements(db_session: AsyncSession):
+    with pytest.raises(AssertionError, match="SELECT 42"):
+        with assert_max_queries(1):
+            await db_session.execute(text("SELECT 41"))
+            await db_session.execute(text("SELECT 42"))
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_stops_tracking_after_headers(db_session: AsyncSession, monkeypatch, capsys):
+    monkeypatch.setattr(query_stats, "QUERY_COUNT_WARN", 10)
+    monkeypatch.setattr(query_stats, "QUERY_STATS_MAX_STATEMENTS", 5)
+
+    async def streaming_app(scope, receive, send):
+        # Giống SSE: 1 câu SQL trước khi gửi header, rồi poll DB mãi trong lúc stream
+        await db_session.execute(text("SELECT 1"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(30):
+            await db_session.execute(text("SELECT 2"))
+            await send({"type": "http.response.body", "body": b"data: {}\n\n", "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    with track_queries() as outer:
+        scope = {"type": "http", "method": "GET", "path": "/admin/orders/changes/stream", "headers": []}
+        await QueryStatsMiddleware(streaming_app)(scope, None, send)
+
+    assert dict(sent[0]["headers"])[b"x-db-queries"] == b"1"
+    assert "🐢" not in capsys.readouterr().out
+    # Scope bên ngoài vẫn đếm đủ, nhưng chỉ giữ số câu SQL giới hạn
+    assert outer.count == 31 and len(outer.statements) == 5
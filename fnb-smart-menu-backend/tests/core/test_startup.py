@@ -0,0 +1,18 @@
+# Tệp: tests/core/test_startup.py
+import pytest
+from app.core.query_stats import track_queries
+from app.core.startup import startup_timer
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_startup_has_no_schema_or_data_side_effects():
+    with track_queries() as stats:
+        # Chạy startup + shutdown như uvicorn (shutdown đóng pool => không giữ kết nối của event loop này)
+        async with app.router.lifespan_context(app):
+            pass
+
+    # Chỉ còn các câu SELECT 1 mở sẵn kết nối cho pool: không CREATE TABLE, không UPDATE products
+    assert stats.count > 0
+    assert set(stats.statements) == {"SELECT 1"}
+    assert {"import", "db_pool", "event_bus"} <= set(startup_timer.phases)
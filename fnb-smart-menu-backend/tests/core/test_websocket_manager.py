@@ -0,0 +1,137 @@
+# Tệp: tests/core/test_websocket_manager.py
+import asyncio
+import pytest
+from starlette.websockets import WebSocketState
+from app.core.websocket import ConnectionManager, WS_CLOSE_TOO_SLOW, manager as ws_manager
+from app.routers.orders import websocket_admin
+
+
+class FakeWebSocket:
+    """WebSocket giả: ghi lại tin đã nhận, có thể gửi chậm hoặc lỗi"""
+
+    def __init__(self, delay: float = 0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.fail:
+            raise RuntimeError("socket đã chết")
+        await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_code = code
+
+
+@pytest.mark.asyncio
+async def test_slow_socket_does_not_delay_others():
+    manager = ConnectionManager(send_queue_size=10)
+    fast, slow = FakeWebSocket(), FakeWebSocket(delay=1)
+    await manager.connect(fast)
+    await manager.connect(slow)
+
+    # broadcast trả về ngay, socket nhanh nhận được trước khi socket chậm gửi xong
+    await asyncio.wait_for(manager.broadcast({"type": "new_order", "order_id": 1}), 0.05)
+    await asyncio.sleep(0.01)
+    assert fast.received == [{"type": "new_order", "order_id": 1}]
+    assert slow.received == []
+    assert slow in manager.active_connections
+
+    manager.disconnect(fast)
+    manager.disconnect(slow)
+
+
+@pytest.mark.asyncio
+async def test_overflowing_and_failing_sockets_are_dropped():
+    manager = ConnectionManager(send_queue_size=2)
+    stuck, dead, healthy = FakeWebSocket(delay=10), FakeWebSocket(fail=True), FakeWebSocket()
+    for ws in (stuck, dead, healthy):
+        await manager.connect_group(ws, "G1")
+
+    for i in range(4):
+        await manager.broadcast_group("G1", {"seq": i})
+        await asyncio.sleep(0.001)  # Nhường event loop cho các task gửi
+    await asyncio.sleep(0.01)
+
+    members = manager.group_connections["G1"]
+    assert healthy in members
+    assert stuck not in members and stuck.closed_code == 1013   # hàng đợi đầy
+    assert dead not in members and dead.closed_code == 1013     # gửi lỗi
+    assert [m["seq"] for m in healthy.received] == [0, 1, 2, 3]
+    assert manager.stats()["dropped_connections"] == 2
+
+    manager.disconnect_group(healthy, "G1")
+    assert manager.group_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_group_batching_sends_one_frame_per_tick():
+    manager = ConnectionManager(group_batch_tick_ms=30, group_batch_max=100)
+    members = [FakeWebSocket() for _ in range(3)]
+    for ws in members:
+        await manager.connect_group(ws, "G1")
+
+    # Mỗi người sửa giỏ 3 lần trong cùng 1 nhịp
+    for seq in range(3):
+        for i, ws in enumerate(members):
+            await manager.broadcast_group("G1", {"from": i, "seq": seq}, sender_socket=ws)
+    await asyncio.sleep(0.01)
+    assert all(ws.received == [] for ws in members)  # chưa hết nhịp
+
+    await asyncio.sleep(0.05)
+    for i, ws in enumerate(members):
+        assert len(ws.received) == 1
+        frame = ws.received[0]
+        assert frame["type"] == "batch"
+        # Đủ 6 tin của 2 người còn lại, đúng thứ tự, không có tin của chính mình
+        assert [(m["from"], m["seq"]) for m in frame["messages"]] == [
+            (j, seq) for seq in range(3) for j in range(3) if j != i
+        ]
+
+    # Đạt max batch => gửi ngay, không chờ nhịp; nhóm khác tắt gộp vẫn gửi từng tin
+    manager.set_group_batching("G1", tick_ms=1000, max_batch=2)
+    await manager.broadcast_group("G1", {"seq": "a"})
+    await manager.broadcast_group("G1", {"seq": "b"})
+    await asyncio.sleep(0.01)
+    assert members[0].received[-1] == {"type": "batch", "messages": [{"seq": "a"}, {"seq": "b"}]}
+
+    for ws in members:
+        manager.disconnect_group(ws, "G1")
+    assert manager._group_batches == {}
+
+
+class ReceivingSocket(FakeWebSocket):
+    """Socket giả cho handler /ws/...: receive_text() ném lỗi cho trước, theo dõi trạng thái như Starlette"""
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+        self.application_state = WebSocketState.CONNECTED
+
+    async def receive_text(self):
+        await asyncio.sleep(0)
+        raise self.error
+
+    async def close(self, code: int = 1000):
+        await super().close(code)
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+@pytest.mark.asyncio
+async def test_admin_socket_handler_only_ignores_server_side_close():
+    # Server đã đóng socket (client quá chậm) => lỗi đọc sau đó được bỏ qua
+    dropped = ReceivingSocket(RuntimeError("socket đã đóng"))
+    await dropped.close(WS_CLOSE_TOO_SLOW)
+    await websocket_admin(dropped)
+    assert dropped not in ws_manager.active_connections
+
+    # RuntimeError khác là bug thật => không được nuốt
+    broken = ReceivingSocket(RuntimeError("Event loop is closed"))
+    with pytest.raises(RuntimeError, match="Event loop is closed"):
+        await websocket_admin(broken)
+    assert broken not in ws_manager.active_connections
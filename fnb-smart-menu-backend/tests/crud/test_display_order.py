@@ -0,0 +1,30 @@
+# Tệp: tests/crud/test_display_order.py
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.models import models
+
+
+@pytest.mark.asyncio
+async def test_fix_display_order_keeps_order_and_appends_unnumbered(db_session: AsyncSession):
+    cat = models.Category(name="Order Fix Cat")
+    cat.products = [
+        models.Product(name="Order Fix B", base_price=1000, display_order=5),
+        models.Product(name="Order Fix New", base_price=1000, display_order=0),
+        models.Product(name="Order Fix A", base_price=1000, display_order=2),
+    ]
+    db_session.add(cat)
+    await db_session.commit()
+
+    assert await crud.fix_product_display_order(db_session) > 0
+    result = await db_session.execute(
+        select(models.Product.name, models.Product.display_order)
+        .where(models.Product.category_id == cat.id)
+        .order_by(models.Product.display_order)
+    )
+    rows = result.all()
+    assert [name for name, _ in rows] == ["Order Fix A", "Order Fix B", "Order Fix New"]
+    assert all(position > 0 for _, position in rows)
+    # Đã đủ thứ tự => lần chạy sau không sửa gì
+    assert await crud.fix_product_display_order(db_session) == 0
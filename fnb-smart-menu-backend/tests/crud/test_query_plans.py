@@ -0,0 +1,140 @@
+# Tệp: tests/crud/test_query_plans.py
+# Chạy EXPLAIN trên các query nóng của crud (với dữ liệu đủ lớn để planner thích index)
+# => fail nếu query nào quay về Seq Scan trên các bảng lớn (thường do thiếu index).
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import crud
+from app.models import models
+from tests.conftest import engine_test
+
+# Các bảng lớn dần theo thời gian / theo Catalog - không được phép quét toàn bộ
+LARGE_TABLES = {
+    "orders", "order_items", "order_item_options", "users", "points_ledger",
+    "products", "option_values", "product_option_association",
+}
+
+SEED_SQL = [
+    "INSERT INTO categories (name, display_order) SELECT 'Plan Cat ' || g, g FROM generate_series(1, 50) g",
+    "INSERT INTO products (name, base_price, category_id, display_order, is_out_of_stock) "
+    "SELECT 'Plan Product ' || g, 30000, (SELECT min(id) FROM categories WHERE name LIKE 'Plan Cat %') + g % 50, g, false "
+    "FROM generate_series(1, 2000) g",
+    "INSERT INTO options (name, type, display_order) SELECT 'Plan Option ' || g, 'CHON_1', g FROM generate_series(1, 500) g",
+    "INSERT INTO option_values (name, price_adjustment, is_out_of_stock, option_id) "
+    "SELECT 'Plan Value ' || g, 1000, false, o.id FROM options o, generate_series(1, 5) g WHERE o.name LIKE 'Plan Option %'",
+    "INSERT INTO product_option_association (product_id, option_id) "
+    "SELECT p.id, o.id FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM products WHERE name LIKE 'Plan Product %') p "
+    "JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM options WHERE name LIKE 'Plan Option %') o "
+    "ON o.n IN (1 + p.n % 500, 1 + (p.n + 1) % 500, 1 + (p.n + 2) % 500)",
+    "INSERT INTO users (full_name, phone, role, points) "
+    "SELECT 'Plan User ' || g, '08' || lpad(g::text, 8, '0'), 'CUSTOMER', 10 FROM generate_series(1, 20000) g",
+    "INSERT INTO points_ledger (user_id, change, balance_after, reason) "
+    "SELECT id, 10, 10, 'MO_SO' FROM users WHERE full_name LIKE 'Plan User %'",
+    "INSERT INTO orders (customer_name, customer_phone, customer_address, sub_total, delivery_fee, discount_amount, "
+    "points_discount, total_amount, status, payment_method, delivery_method_selected, user_id, created_at, updated_at) "
+    "SELECT 'Plan ' || u.n, '08', 'Tai quan', 60000, 0, 0, 0, 60000, "
+    "(ARRAY['MOI','DA_XAC_NHAN','DANG_CHUAN_BI','HOAN_TAT'])[1 + u.n % 4]::orderstatus, 'TIEN_MAT', 'TAI_CHO', "
+    "CASE WHEN u.n % 2 = 0 THEN u.id END, now() - make_interval(mins => u.n::int), now() - make_interval(mins => u.n::int) "
+    "FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM users WHERE full_name LIKE 'Plan User %') u",
+    "INSERT INTO order_items (order_id, product_id, product_name, quantity, item_price) "
+    "SELECT o.id, (SELECT min(id) FROM products WHERE name LIKE 'Plan Product %') + (o.id * 3 + g) % 2000, 'Plan', 1, 20000 "
+    "FROM orders o, generate_series(1, 3) g WHERE o.customer_name LIKE 'Plan %'",
+    "INSERT INTO order_item_options (order_item_id, option_name, value_name, added_price) "
+    "SELECT id, 'Size', 'L', 5000 FROM order_items WHERE product_name = 'Plan'",
+]
+
+
+def seq_scans(plan: dict):
+    """Duyệt cây plan, trả về các bảng lớn bị Seq Scan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+@pytest.fixture
+async def seeded(db_session: AsyncSession):
+    for statement in SEED_SQL:
+        await db_session.execute(text(statement))
+    for table in LARGE_TABLES | {"categories", "options"}:
+        await db_session.execute(text(f"ANALYZE {table}"))
+    return db_session
+
+
+async def capture(run):
+    """Chạy hàm crud và ghi lại đúng các câu SQL (kèm tham số) nó gửi xuống DB"""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", listener)
+    try:
+        await run()
+    finally:
+        event.remove(engine_test.sync_engine, "before_cursor_execute", listener)
+    return statements
+
+
+async def explain(db: AsyncSession, statement: str, parameters) -> dict:
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = result.scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+@pytest.mark.asyncio
+async def test_hot_crud_queries_use_indexes(seeded: AsyncSession):
+    db = seeded
+    order_id = (await db.execute(text("SELECT max(id) FROM orders WHERE customer_name LIKE 'Plan %'"))).scalar()
+    user_id = (await db.execute(text("SELECT max(id) FROM users WHERE full_name LIKE 'Plan User %'"))).scalar()
+    value_ids = (await db.execute(text("SELECT id FROM option_values ORDER BY id DESC LIMIT 5"))).scalars().all()
+    product_ids = (await db.execute(text("SELECT id FROM products ORDER BY id DESC LIMIT 5"))).scalars().all()
+    now = datetime.now(timezone.utc)
+
+    hot_queries = {
+        "order board": lambda: crud.get_orders(db, limit=50),
+        "order board (filter status)": lambda: crud.get_orders(db, limit=50, status=[models.OrderStatus.MOI], after_id=order_id - 5000),
+        "today's open orders": lambda: crud.get_orders(db, limit=50, status=[models.OrderStatus.MOI, models.OrderStatus.DA_XAC_NHAN], created_from=now - timedelta(hours=3)),
+        "order summaries": lambda: crud.get_order_summaries(db, limit=50),
+        "order detail": lambda: crud.get_order_details(db, order_id),
+        "order change feed": lambda: crud.get_order_changes(db, now - timedelta(minutes=30), 0, 100),
+        "customer by phone": lambda: crud.get_user_by_phone(db, "0800001234"),
+        "points balance": lambda: crud.get_ledger_balance(db, user_id),
+        "price lookup": lambda: crud.get_product_prices(db, product_ids),
+        "option price lookup": lambda: crud.get_option_value_prices(db, value_ids),
+    }
+    failures = []
+    for name, run in hot_queries.items():
+        statements = await capture(run)
+        assert statements, name
+        for statement, parameters in statements:
+            tables = seq_scans(await explain(db, statement, parameters))
+            if tables:
+                failures.append(f"{name}: Seq Scan trên {tables}\n  {statement[:200]}")
+    assert not failures, "\n".join(failures)
+
+
+@pytest.mark.asyncio
+async def test_foreign_key_lookups_use_indexes(seeded: AsyncSession):
+    # Xóa khách / đơn / món / option => Postgres phải tìm các dòng con theo khóa ngoại (CASCADE / SET NULL)
+    fk_lookups = [
+        ("orders", "user_id"),
+        ("order_items", "order_id"),
+        ("order_items", "product_id"),
+        ("order_item_options", "order_item_id"),
+        ("option_values", "option_id"),
+        ("product_option_association", "option_id"),
+        ("products", "category_id"),
+        ("points_ledger", "user_id"),
+    ]
+    failures = []
+    for table, column in fk_lookups:
+        plan = await explain(seeded, f"SELECT 1 FROM {table} WHERE {column} = $1", (1,))
+        if seq_scans(plan):
+            failures.append(f"{table}.{column}")
+    assert not failures, f"Thiếu index cho khóa ngoại: {failures}"